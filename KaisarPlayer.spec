@@ -16,12 +16,28 @@ a = Analysis(
     ],
     hiddenimports=[
         'camera_manager',
+        'face_tracker',
+        'emotion_voter',
         'ui',
+        'virtual_list',
         'player',
         'playlist',
+        'song_table',
+        'play_queue',
+        'recommender',
+        'song_vectors',
+        'library_index',
+        'folder_watcher',
+        'pool_job',
+        'metadata',
+        'audio_decode',
+        'loudness',
+        'auto_tagger',
+        'tag_store',
         'history',
         'settings',
         'emotion_manager',
+        'emotion_detector',
         'language_manager',
         'path_utils',
         'cv2',
@@ -0,0 +1,51 @@
+import os
+
+def lower_process_priority():
+    """Run the calling process below normal priority so playback and the UI come first"""
+    try:
+        if hasattr(os, 'nice'):
+            os.nice(10)
+        else:
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+    except Exception as e:
+        print(f"Could not lower process priority: {e}")
+
+def init_decoder(sample_rate, channels):
+    """Initializer for worker processes that decode audio with pygame.
+
+    Decoding needs no audio device, so the mixer is opened on SDL's dummy
+    driver at the rate and channel count the analysis wants; pygame then
+    resamples while decoding. Workers must be started with the 'spawn'
+    method so they do not inherit the player's mixer.
+    """
+    lower_process_priority()
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+    import pygame
+    pygame.mixer.init(frequency=sample_rate, size=-16, channels=channels)
+
+def known_duration(song_path, duration=None):
+    """Length of a song in seconds, read with mutagen when the index has none yet.
+
+    Returns None when it cannot be told; decode_track() holds the whole song
+    in memory, so callers skip such songs instead of decoding them.
+    """
+    if duration:
+        return duration
+    try:
+        from metadata import read_metadata
+        return read_metadata(song_path).get('duration') or None
+    except Exception:
+        return None
+
+def decode_track(song_path):
+    """Decode a whole song to int16 samples; returns ((samples, channels) array, sample rate)"""
+    import pygame
+    sound = pygame.mixer.Sound(song_path)
+    # A view of the decoded buffer, which it keeps alive; no copy
+    samples = pygame.sndarray.samples(sound)
+    sample_rate = pygame.mixer.get_init()[0]
+    return samples.reshape(len(samples), -1), sample_rate
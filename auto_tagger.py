@@ -0,0 +1,238 @@
+import os
+import numpy as np
+from audio_decode import init_decoder, decode_track, known_duration
+from pool_job import PoolJob
+
+# Emotion class numbers
+UNTAGGED = 0
+NEUTRAL = 1
+HAPPY = 2
+SAD = 3
+
+# Features only need the range up to ~5 kHz, so songs are decoded mono at a
+# quarter of CD rate: an hour of audio is ~80 MB in a worker
+SAMPLE_RATE = 11025
+MAX_SECONDS = 60 * 60
+
+FRAME_SIZE = 2048  # 186 ms, fine enough to tell semitones apart above ~200 Hz
+HOP_SIZE = 512     # 21.5 frames per second for the onset envelope
+CHUNK_FRAMES = 1024  # frames transformed at once (~50 s of audio)
+MIN_SECONDS = 10
+
+# Tempo search range and the prior that favours moderate tempos over their
+# double or half (log-normal around PRIOR_BPM)
+MIN_BPM = 60
+MAX_BPM = 180
+PRIOR_BPM = 120
+PRIOR_OCTAVES = 1.0
+
+# Pitch range folded into the chroma vector
+CHROMA_MIN_HZ = 200
+CHROMA_MAX_HZ = 2000
+
+# Krumhansl-Kessler key profiles, starting at the tonic
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+# Classification: a coarse valence/arousal estimate from the features, which
+# is why the result is only ever stored as a suggestion
+NEUTRAL_BAND = 0.6
+SHARPNESS = 4.0
+
+def _key_matrix(profile):
+    """Standardized profile rotated to all 12 tonics, one per row"""
+    rows = np.array([np.roll(profile, tonic) for tonic in range(12)])
+    return (rows - rows.mean(axis=1, keepdims=True)) / rows.std(axis=1, keepdims=True)
+
+MAJOR_KEYS = _key_matrix(MAJOR_PROFILE)
+MINOR_KEYS = _key_matrix(MINOR_PROFILE)
+
+def _chroma_map(freqs):
+    """Bins inside the chroma range and a (bins, 12) one-hot pitch class matrix"""
+    bins = np.flatnonzero((freqs >= CHROMA_MIN_HZ) & (freqs <= CHROMA_MAX_HZ))
+    pitch_classes = (np.round(12 * np.log2(freqs[bins] / 440.0)).astype(int) + 9) % 12  # 0 = C
+    return bins, np.eye(12, dtype=np.float32)[pitch_classes]
+
+def _estimate_tempo(onsets, frame_rate):
+    """Tempo in BPM and pulse clarity (0-1) from the autocorrelation of the onset envelope"""
+    onsets = onsets - onsets.mean()
+    n_fft = 1 << int(2 * len(onsets) - 1).bit_length()
+    spectrum = np.fft.rfft(onsets, n_fft)
+    autocorr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n_fft)[:len(onsets)]
+    if autocorr[0] <= 0:
+        return 0.0, 0.0
+
+    min_lag = max(1, int(60 * frame_rate / MAX_BPM))
+    max_lag = min(len(autocorr) - 2, int(np.ceil(60 * frame_rate / MIN_BPM)))
+    if max_lag <= min_lag:
+        return 0.0, 0.0
+    lags = np.arange(min_lag, max_lag + 1)
+    prior = np.exp(-0.5 * (np.log2(60 * frame_rate / lags / PRIOR_BPM) / PRIOR_OCTAVES) ** 2)
+    best = lags[np.argmax(autocorr[lags] * prior)]
+
+    # Parabolic interpolation between lags for a finer tempo
+    left, center, right = autocorr[best - 1], autocorr[best], autocorr[best + 1]
+    denominator = left - 2 * center + right
+    shift = 0.5 * (left - right) / denominator if denominator else 0.0
+    tempo = 60 * frame_rate / (best + np.clip(shift, -0.5, 0.5))
+    return float(tempo), float(max(center, 0) / autocorr[0])
+
+def extract_features(samples, sample_rate):
+    """Tempo, pulse clarity, spectral centroid, energy and a major/minor proxy.
+
+    samples are int16 (samples, channels). The short-time spectrum is taken
+    one chunk of frames at a time, and only per-frame sums are kept across
+    chunks, so memory does not grow with the length of the song. Returns None
+    for songs shorter than MIN_SECONDS.
+    """
+    if len(samples) < MIN_SECONDS * sample_rate:
+        return None
+    signal = samples.reshape(len(samples), -1)
+    if signal.shape[1] > 1:
+        signal = signal.mean(axis=1)
+    else:
+        signal = signal[:, 0]
+
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / sample_rate).astype(np.float32)
+    chroma_bins, chroma_map = _chroma_map(freqs)
+
+    frame_count = 1 + (len(signal) - FRAME_SIZE) // HOP_SIZE
+    onsets = np.empty(frame_count - 1, dtype=np.float32)
+    chroma = np.zeros(12)
+    weighted_centroid = 0.0
+    total_power = 0.0
+    square_sum = 0.0
+    previous = None
+
+    for start in range(0, frame_count, CHUNK_FRAMES):
+        stop = min(start + CHUNK_FRAMES, frame_count)
+        audio = signal[start * HOP_SIZE:(stop - 1) * HOP_SIZE + FRAME_SIZE].astype(np.float32) / 32768
+        square_sum += float(np.dot(audio[:(stop - start) * HOP_SIZE], audio[:(stop - start) * HOP_SIZE]))
+
+        frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME_SIZE)[::HOP_SIZE]
+        magnitude = np.abs(np.fft.rfft(frames * window, axis=1))
+        power = magnitude ** 2
+        weighted_centroid += float(power.sum(axis=0) @ freqs)
+        total_power += float(power.sum())
+        chroma += power[:, chroma_bins].sum(axis=0) @ chroma_map
+
+        # Spectral flux of the log magnitude: how much louder each bin got
+        log_magnitude = np.log1p(100 * magnitude)
+        if previous is not None:
+            log_magnitude = np.vstack((previous, log_magnitude))
+        flux = np.maximum(np.diff(log_magnitude, axis=0), 0).sum(axis=1)
+        offset = start - 1 if previous is not None else 0
+        onsets[offset:offset + len(flux)] = flux
+        previous = log_magnitude[-1:]
+
+    tempo, pulse = _estimate_tempo(onsets.astype(np.float64), sample_rate / HOP_SIZE)
+
+    # Correlation of the pitch class profile with every major and minor key
+    mode = 0.0
+    if chroma.std() > 0:
+        chroma = (chroma - chroma.mean()) / chroma.std()
+        mode = float((MAJOR_KEYS @ chroma).max() - (MINOR_KEYS @ chroma).max()) / 12
+
+    rms = np.sqrt(square_sum / (frame_count * HOP_SIZE))
+    return {
+        'tempo': tempo,
+        'pulse': pulse,
+        'centroid': weighted_centroid / total_power if total_power else 0.0,
+        'energy': float(20 * np.log10(max(rms, 1e-6))),
+        'mode': mode
+    }
+
+def classify(features):
+    """Guess (emotion number, confidence) from extract_features() output.
+
+    Arousal comes from tempo, energy and brightness, valence mostly from the
+    major/minor proxy. Clearly positive songs are HAPPY, clearly negative ones
+    SAD, and the rest NEUTRAL; the confidence is the softmax probability of
+    the chosen class.
+    """
+    tempo = np.clip((features['tempo'] - 110) / 40, -1, 1) if features['tempo'] else 0.0
+    energy = np.clip((features['energy'] + 18) / 8, -1, 1)
+    brightness = np.clip((features['centroid'] - 1500) / 800, -1, 1)
+    mode = np.clip(features['mode'] * 4, -1, 1)
+
+    arousal = 0.45 * tempo + 0.35 * energy + 0.2 * brightness
+    valence = 0.6 * mode + 0.25 * tempo + 0.15 * brightness
+    mood = valence + 0.5 * arousal
+
+    emotions = (NEUTRAL, HAPPY, SAD)
+    logits = SHARPNESS * np.array([NEUTRAL_BAND - abs(mood), mood, -mood])
+    probabilities = np.exp(logits - logits.max())
+    probabilities /= probabilities.sum()
+    best = int(np.argmax(probabilities))
+    return emotions[best], float(probabilities[best])
+
+def analyze_features_batch(songs):
+    """Extract features of (path, duration) songs; runs in a decoder worker process.
+
+    Returns (path, mtime_ns, size, features, emotion, confidence) tuples. Songs
+    that cannot be analyzed, including songs of unknown length, get None
+    features and UNTAGGED, so they are not retried until they change.
+    """
+    results = []
+    for song_path, duration in songs:
+        try:
+            st = os.stat(song_path)
+        except OSError:
+            continue
+        features = None
+        emotion, confidence = UNTAGGED, 0.0
+        duration = known_duration(song_path, duration)
+        if duration is None:
+            print(f"Skipping feature analysis of {song_path}: unknown length")
+        elif duration > MAX_SECONDS:
+            print(f"Skipping feature analysis of {song_path}: {duration / 60:.0f} minutes long")
+        else:
+            try:
+                samples, sample_rate = decode_track(song_path)
+                features = extract_features(samples, sample_rate)
+                del samples
+                if features is not None:
+                    emotion, confidence = classify(features)
+            except Exception as e:
+                print(f"Error analyzing {song_path}: {e}")
+        results.append((song_path, st.st_mtime_ns, st.st_size, features, emotion, confidence))
+    return results
+
+
+class AutoTagger(PoolJob):
+    """Extract audio features of a library folder and suggest emotions from them.
+
+    Songs are analyzed on a pool of low priority worker processes, one per
+    core but one, untagged songs first. Features and guesses are stored in
+    the library index after every batch, so songs analyzed before are skipped
+    and an interrupted run resumes. Suggestions only ever show for songs
+    without a manual tag. Guesses are put on `queue` as ('suggestions', [(path, emotion,
+    confidence)]) for the UI thread to store in the tag store as suggested
+    tags; ('done', count) follows the last batch.
+    """
+
+    BATCH_SIZE = 4
+    WORKER = staticmethod(analyze_features_batch)
+    DESCRIPTION = "analyzing audio features"
+    INITIALIZER = staticmethod(init_decoder)
+    INITARGS = (SAMPLE_RATE, 1)
+
+    def __init__(self, library_index, folder_path, tag_store, max_workers=None):
+        super().__init__(library_index, folder_path, max_workers)
+        self.tag_store = tag_store
+
+    def get_pending(self):
+        # Tagged songs are analyzed too, for their feature vectors, but
+        # after the untagged ones that are waiting for a guess
+        return sorted(
+            self.library_index.get_paths_missing_features(self.folder_path),
+            key=lambda row: bool(self.tag_store.get_tags(row[0]))
+        )
+
+    def store(self, results):
+        self.library_index.save_features(results)
+        self.queue.put(('suggestions', [
+            (path, emotion, confidence)
+            for path, _, _, _, emotion, confidence in results
+        ]))
@@ -0,0 +1,94 @@
+"""Compare latency and accuracy of the emotion detection modes.
+
+Usage:
+    python benchmarks/detection_benchmark.py [FIXTURES_DIR] [--repeat N]
+
+FIXTURES_DIR holds face images sorted into folders named after the expected
+emotion (neutral, happy, sad, untagged). Images directly inside FIXTURES_DIR
+have no expected emotion and only count towards latency and agreement.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from emotion_detector import EmotionDetector
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "faces")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def load_fixtures(fixtures_dir):
+    """Load (name, image, expected emotion number or None) for every fixture"""
+    fixtures = []
+    for dirpath, _, filenames in os.walk(fixtures_dir):
+        label = os.path.relpath(dirpath, fixtures_dir).split(os.sep)[0]
+        expected = EmotionDetector.UNTAGGED if label == 'untagged' else {
+            'neutral': EmotionDetector.NEUTRAL,
+            'happy': EmotionDetector.HAPPY,
+            'sad': EmotionDetector.SAD
+        }.get(label)
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(dirpath, filename))
+            if image is None:
+                print(f"Skipping unreadable image: {filename}")
+                continue
+            fixtures.append((os.path.join(label, filename), image, expected))
+    return fixtures
+
+def run_mode(detector, fixtures, mode, repeat):
+    """Detect every fixture `repeat` times and return (results, latencies in ms)"""
+    results = {}
+    latencies = []
+    for name, image, _ in fixtures:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[name] = detector.detect_emotion(image, mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="?", default=DEFAULT_FIXTURES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.fixtures):
+        print(f"Fixtures folder not found: {args.fixtures}")
+        return 1
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        print(f"No face images in {args.fixtures}")
+        return 1
+
+    detector = EmotionDetector(verbose=False)
+    labelled = [(name, expected) for name, _, expected in fixtures if expected is not None]
+    print(f"{len(fixtures)} images ({len(labelled)} labelled), {args.repeat} runs each\n")
+
+    results = {}
+    for mode in (EmotionDetector.MODE_ACCURATE, EmotionDetector.MODE_FAST):
+        results[mode], latencies = run_mode(detector, fixtures, mode, args.repeat)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        line = (f"{mode:>8}: mean {statistics.mean(latencies):7.1f} ms, "
+                f"median {statistics.median(latencies):7.1f} ms, p95 {p95:7.1f} ms")
+        if labelled:
+            correct = sum(1 for name, expected in labelled if results[mode][name] == expected)
+            line += f", accuracy {correct}/{len(labelled)} ({correct / len(labelled):.0%})"
+        print(line)
+
+    agree = sum(
+        1 for name, _, _ in fixtures
+        if results[EmotionDetector.MODE_FAST][name] == results[EmotionDetector.MODE_ACCURATE][name]
+    )
+    print(f"\nfast agrees with accurate on {agree}/{len(fixtures)} images")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Measure how long a recommendation takes on a large synthetic library.
+
+Usage:
+    python benchmarks/recommender_benchmark.py [--songs 100000] [--repeat 200]
+
+Builds a library of fake song paths with random emotion tags (in a
+temporary tag store) and a play history, then times Recommender.recommend
+for every detected emotion.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from recommender import Recommender
+from song_table import SongTable
+from tag_store import TagStore
+
+class SyntheticLibrary:
+    """The parts of PlaylistManager the recommender reads"""
+
+    def __init__(self, emotions):
+        self.playlist = SongTable({1: 'neutral', 2: 'happy', 3: 'sad'})
+        for row, emotion in enumerate(emotions):
+            self.playlist.append(
+                row, f"/music/artist{row % 500}/song{row}.mp3", f"song{row}",
+                1 << int(emotion) if emotion else 0
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Three quarters of the songs tagged, the rest untagged
+    emotions = rng.integers(0, 4, args.songs)
+    library = SyntheticLibrary(emotions)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tag_store = TagStore(os.path.join(temp_dir, "tags.db"))
+        with tag_store.batch():
+            for song_path, emotion in zip(library.playlist.paths, emotions):
+                if emotion:
+                    tag_store.set_emotion(song_path, int(emotion))
+
+        recommender = Recommender(library, tag_store=tag_store)
+        now = time.time()
+        for row in rng.integers(0, args.songs, 300):
+            song_path = library.playlist.paths[row]
+            recommender.play_counts[song_path] = int(rng.integers(1, 100))
+            recommender.last_played[song_path] = now - float(rng.uniform(0, 86400))
+
+        start = time.perf_counter()
+        recommender.recommend(Recommender.HAPPY, args.k)
+        print(f"{args.songs} songs, first call (builds the arrays): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for emotion, name in ((0, 'untagged'), (1, 'neutral'), (2, 'happy'), (3, 'sad')):
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                songs = recommender.recommend(emotion, args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{name:>8}: median {statistics.median(latencies):6.3f} ms, p95 {p95:6.3f} ms, {len(songs)} songs")
+        tag_store.conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Measure how long a "more like this" query takes on a large library.
+
+Usage:
+    python benchmarks/similarity_benchmark.py [--songs 100000] [--repeat 200]
+
+Builds feature vectors for random songs (a tenth of them without audio
+features) into a temporary file and times SongVectors.similar over the
+whole library and over a playlist of half the songs.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from song_vectors import SongVectors
+
+class SyntheticIndex:
+    """The part of LibraryIndex the vector store reads"""
+
+    def __init__(self, count, rng):
+        self.rows = []
+        for song_id in range(1, count + 1):
+            if rng.random() < 0.1:
+                continue
+            self.rows.append((
+                song_id,
+                float(rng.uniform(60, 180)),     # tempo
+                float(rng.uniform(0, 1)),        # pulse
+                float(rng.uniform(500, 4000)),   # centroid
+                float(rng.normal(-18, 4)),       # energy
+                float(rng.normal(0, 0.1)),       # mode
+                float(rng.normal(-12, 3)),       # loudness
+                float(rng.uniform(120, 420))     # duration
+            ))
+
+    def get_vector_rows(self):
+        return self.rows
+
+def time_queries(query, song_ids, repeat):
+    latencies = []
+    for song_id in song_ids[:repeat]:
+        start = time.perf_counter()
+        query(int(song_id))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return statistics.median(latencies), p95
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = SyntheticIndex(args.songs, rng)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        vectors = SongVectors(os.path.join(temp_dir, "song_vectors.npy"))
+        start = time.perf_counter()
+        vectors.rebuild(index)
+        print(f"{args.songs} songs, building the matrix: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        vectors = SongVectors(vectors.vectors_path)
+        print(f"Opening the mapped matrix: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        seeds = rng.choice([row[0] for row in index.rows], args.repeat)
+        median, p95 = time_queries(lambda song_id: vectors.similar(song_id, k=args.k), seeds, args.repeat)
+        print(f" library: median {median:6.3f} ms, p95 {p95:6.3f} ms")
+
+        playlist_ids = np.sort(rng.choice(np.arange(1, args.songs + 1), args.songs // 2, replace=False))
+        median, p95 = time_queries(lambda song_id: vectors.similar(song_id, playlist_ids, args.k), seeds, args.repeat)
+        print(f"playlist: median {median:6.3f} ms, p95 {p95:6.3f} ms")
+
+        # Release the mapping before the directory is removed (Windows)
+        vectors.matrix = None
+        vectors.valid = None
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
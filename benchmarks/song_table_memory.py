@@ -0,0 +1,82 @@
+"""Compare the memory per song of the playlist as a list of dicts and as a SongTable.
+
+Usage:
+    python benchmarks/song_table_memory.py [--songs 200000]
+
+Builds the same synthetic library (index rows of id, path and title, three
+quarters of the songs tagged with one emotion) both ways and reports what
+stays allocated afterwards, strings included, with tracemalloc.
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from song_table import SongTable
+
+EMOTION_NAMES = {1: 'neutral', 2: 'happy', 3: 'sad'}
+
+def index_rows(count):
+    """Rows as LibraryIndex.get_songs returns them, with fresh strings like SQLite's"""
+    return [
+        (row, f"/home/user/Music/Artist {row % 2000}/Album {row % 7}/{row:06d} Song title {row}.mp3", f"{row:06d} Song title {row}")
+        for row in range(count)
+    ]
+
+def song_tags(row):
+    return [row % 4] if row % 4 else []
+
+def build_dicts(rows):
+    """The playlist as it was: a dict per song and a path to row dict"""
+    playlist = []
+    song_rows = {}
+    for song_id, song_path, title in rows:
+        emotion_numbers = song_tags(song_id)
+        playlist.append({
+            'id': song_id,
+            'path': song_path,
+            'title': title,
+            'emotion_numbers': list(emotion_numbers),
+            'emotions': [EMOTION_NAMES[number] for number in emotion_numbers]
+        })
+        song_rows[song_path] = len(playlist) - 1
+    return playlist, song_rows
+
+def build_table(rows):
+    table = SongTable(EMOTION_NAMES)
+    for song_id, song_path, title in rows:
+        mask = 0
+        for number in song_tags(song_id):
+            mask |= 1 << number
+        table.append(song_id, song_path, title, mask)
+    return table
+
+def measure(build, count):
+    tracemalloc.start()
+    rows = index_rows(count)
+    result = build(rows)
+    del rows
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=200000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, build in (('list of dicts', build_dicts), ('SongTable', build_table)):
+        current, peak = measure(build, args.songs)
+        results[name] = current
+        print(f"{name:>13}: {current / 2**20:7.1f} MB, {current / args.songs:6.0f} bytes per song (peak {peak / 2**20:.1f} MB)")
+
+    saved = results['list of dicts'] - results['SongTable']
+    print(f"{args.songs} songs: SongTable saves {saved / 2**20:.1f} MB, {saved / args.songs:.0f} bytes per song")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Report what importing the application costs, module by module.
+
+Usage:
+    python benchmarks/startup_imports.py [--module main] [--top 15]
+
+Imports the module in a fresh interpreter with `python -X importtime` and
+prints the slowest top-level imports, the cost of every application module,
+and whether the heavy vision and metadata libraries were deferred.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should not load before the first frame is painted
+DEFERRED = ('cv2', 'mutagen', 'emotion_detector', 'camera_manager', 'face_tracker')
+# Libraries pulled in by Tk or pygame themselves
+EXPECTED = ('customtkinter', 'pygame', 'numpy', 'PIL', 'PIL.ImageTk', 'sqlite3')
+
+def run_importtime(module):
+    """Import module in a fresh interpreter and parse its -X importtime output"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    entries = []  # (name, level, self_us, cumulative_us), in completion order
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), level, int(self_us), int(cumulative_us)))
+    return entries
+
+def top_level_parent(entries, index):
+    """Find the direct import of the module that pulled in entries[index]"""
+    level = entries[index][1]
+    if level <= 1:
+        return entries[index][0]
+    for name, entry_level, _, _ in entries[index:]:
+        if entry_level < level:
+            level = entry_level
+            if level <= 1:
+                return name
+    return entries[index][0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    entries = run_importtime(args.module)
+    by_name = {name: index for index, (name, _, _, _) in enumerate(entries)}
+    target = by_name.get(args.module)
+    total_us = entries[target][3] if target is not None else sum(e[2] for e in entries)
+    print(f"import {args.module}: {total_us / 1000:.1f} ms, {len(entries)} modules\n")
+
+    # Direct imports of the module, slowest first
+    print(f"Slowest imports of {args.module}:")
+    direct = sorted((e for e in entries if e[1] == 1), key=lambda e: e[3], reverse=True)
+    for name, _, _, cumulative_us in direct[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    # Application modules: everything that lives next to main.py
+    app_modules = sorted(
+        (e for e in entries if os.path.exists(os.path.join(APP_DIR, e[0] + ".py"))),
+        key=lambda e: e[3],
+        reverse=True
+    )
+    print("\nApplication modules (self / cumulative):")
+    for name, _, self_us, cumulative_us in app_modules:
+        print(f"  {self_us / 1000:8.1f} / {cumulative_us / 1000:8.1f} ms  {name}")
+
+    print("\nHeavy libraries:")
+    deferred_ok = True
+    for name in DEFERRED + EXPECTED:
+        index = by_name.get(name)
+        if index is None:
+            print(f"  {'deferred':>18}  {name}")
+            continue
+        if name in DEFERRED:
+            deferred_ok = False
+        cumulative_us = entries[index][3]
+        print(f"  {cumulative_us / 1000:15.1f} ms  {name} (via {top_level_parent(entries, index)})")
+
+    if not deferred_ok:
+        print("\nSome libraries that should be deferred are imported at startup")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,32 +5,139 @@ import threading
 import time
 import os
 from tkinter import messagebox
+from face_tracker import FaceTracker
+from emotion_voter import EmotionVoter
+from emotion_detector import get_cascade
+
+class FrameBuffer:
+    """Single-slot buffer between the capture thread and its consumers.
+
+    put() always replaces the slot, so a slow consumer never makes the
+    producer wait and never sees a stale backlog; every frame overwritten
+    before anyone took it is counted as dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._taken_seq = 0
+        self._timestamp = 0.0
+        self.dropped = 0
+
+    def put(self, frame, timestamp):
+        with self._lock:
+            if self._seq > self._taken_seq:
+                self.dropped += 1
+            self._frame = frame
+            self._timestamp = timestamp
+            self._seq += 1
+            self._lock.notify_all()
+
+    def take(self, timeout=None):
+        """Get (frame, seq, timestamp) for a frame not taken yet, or None"""
+        with self._lock:
+            if self._seq == self._taken_seq:
+                self._lock.wait(timeout)
+                if self._seq == self._taken_seq:
+                    return None
+            self._taken_seq = self._seq
+            return self._frame, self._seq, self._timestamp
+
+    def latest(self):
+        """Get the newest frame whether or not it was taken"""
+        with self._lock:
+            return self._frame
+
+    def wake(self):
+        """Release consumers blocked in take()"""
+        with self._lock:
+            self._lock.notify_all()
+
+
+class PipelineStats:
+    """Per-stage latency of the camera pipeline"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}  # {stage: [count, total_seconds, max_seconds]}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def report(self):
+        with self._lock:
+            return ", ".join(
+                f"{stage} {total / count * 1000:.1f}ms avg/{peak * 1000:.1f}ms max ({count})"
+                for stage, (count, total, peak) in self.stages.items()
+            )
+
 
 class CameraManager(ctk.CTkToplevel):
+    """Camera preview and capture window.
+
+    One thread reads frames from the camera into a single-slot FrameBuffer.
+    The Tk thread polls that buffer with after(), scales the newest frame with
+    a cheap interpolation and shows it; frames it was too slow for are
+    dropped instead of queued. Every DETECT_EVERY-th frame also goes to a
+    detection thread that follows the face with a FaceTracker and classifies
+    only the tracked box; the preview draws its last result.
+
+    Those live results are voted on by an EmotionVoter while the countdown
+    runs, and the window closes as soon as the vote is confident. When the
+    countdown ends first, the vote so far is used, and only without any
+    face votes is the newest frame classified on its own.
+    """
+
+    DISPLAY_SIZE = (600, 400)
+    DISPLAY_INTERVAL_MS = 30
+    DETECT_EVERY = 2
+
     def __init__(self, root_window, parent_ui, playlist_manager, language_manager):
         # Initialize parent class first
         super().__init__()
-        
+
         # Store references
         self.root = root_window
         self.parent_ui = parent_ui
         self.playlist_manager = playlist_manager
         self.language_manager = language_manager
-        
+
         # Initialize variables
         self.cap = None
         self.is_running = False
         self.capture_timer = 3
         self.current_frame = None
         self.camera_thread = None
-        self.countdown_thread = None
-        
+        self.detect_thread = None
+        self.capture_error = None
+        self.display_job = None
+        self.countdown_job = None
+
+        # Pipeline state
+        self.frame_buffer = FrameBuffer()
+        self.detect_buffer = FrameBuffer()
+        self.stats = PipelineStats()
+        self.frames_captured = 0
+        self.frames_displayed = 0
+        self.last_faces = []  # Face boxes in full frame coordinates
+        self.live_emotion = None
+        self.voter = EmotionVoter()
+        self.finishing = False
+        self.emotion_manager = getattr(parent_ui, 'emotion_manager', None)
+        self.face_cascade = self._load_face_cascade()
+        self.face_tracker = FaceTracker(self.face_cascade) if self.face_cascade is not None else None
+
         # Configure window
         self._setup_window()
-        
+
         # Initialize camera
         self.initialize_camera()
-        
+
     def _setup_window(self):
         """Setup window properties and UI elements"""
         try:
@@ -38,19 +145,19 @@ class CameraManager(ctk.CTkToplevel):
             self.title(self.language_manager.get_text("emotion_detection"))
             self.geometry("640x520")
             self.resizable(False, False)
-            
+
             # Create main frame
             self.main_frame = ctk.CTkFrame(self)
             self.main_frame.pack(padx=20, pady=20, fill="both", expand=True)
-            
+
             # Create camera frame
             self.camera_frame = ctk.CTkFrame(self.main_frame)
             self.camera_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
-            
+
             # Create camera label
             self.camera_label = ctk.CTkLabel(self.camera_frame, text="")
             self.camera_label.pack(fill="both", expand=True)
-            
+
             # Create timer label
             self.timer_label = ctk.CTkLabel(
                 self.main_frame,
@@ -58,22 +165,22 @@ class CameraManager(ctk.CTkToplevel):
                 font=("Helvetica", 24, "bold")
             )
             self.timer_label.pack(pady=5)
-            
+
             # Make window modal
             self.transient(self.root)
             self.grab_set()
-            
+
             # Center window
             self.center_window()
-            
+
             # Bind window close event
             self.protocol("WM_DELETE_WINDOW", self.on_closing)
-            
+
         except Exception as e:
             print(f"Error setting up window: {e}")
             messagebox.showerror("Error", f"Could not setup window: {e}")
             self.destroy()
-            
+
     def center_window(self):
         """Center window on screen"""
         try:
@@ -85,7 +192,29 @@ class CameraManager(ctk.CTkToplevel):
             self.geometry(f'{width}x{height}+{x}+{y}')
         except Exception as e:
             print(f"Error centering window: {e}")
-            
+
+    @staticmethod
+    def verify_camera_access():
+        """Check that the default camera can be opened and delivers a frame"""
+        cap = None
+        try:
+            cap = cv2.VideoCapture(0)
+            if not cap.isOpened():
+                return False
+            ret, _ = cap.read()
+            return bool(ret)
+        except Exception as e:
+            print(f"Error checking camera access: {e}")
+            return False
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def _load_face_cascade(self):
+        """Get the process-wide face cascade; it is only parsed once"""
+        cascade = get_cascade('face', verbose=False)[1]
+        return None if cascade.empty() else cascade
+
     def initialize_camera(self):
         """Initialize the camera capture"""
         try:
@@ -93,135 +222,283 @@ class CameraManager(ctk.CTkToplevel):
             self.cap = cv2.VideoCapture(0)
             if not self.cap.isOpened():
                 raise Exception("Could not open camera")
-                
+
             # Set camera resolution
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            
-            # Start camera thread
+
+            # Start capture and detection threads
             self.is_running = True
             self.camera_thread = threading.Thread(target=self.update_camera)
             self.camera_thread.daemon = True
             self.camera_thread.start()
-            
-            # Start countdown
-            self.countdown_thread = threading.Thread(target=self.start_countdown)
-            self.countdown_thread.daemon = True
-            self.countdown_thread.start()
-            
+
+            if self.face_cascade is not None:
+                self.detect_thread = threading.Thread(target=self._detect_faces)
+                self.detect_thread.daemon = True
+                self.detect_thread.start()
+
+            # Display and countdown run on the Tk thread
+            self.display_job = self.after(self.DISPLAY_INTERVAL_MS, self._display_frame)
+            self.start_countdown()
+
         except Exception as e:
             print(f"Error initializing camera: {e}")
             messagebox.showerror("Error", f"Could not initialize camera: {e}")
-            self.destroy()
-            
+            self.cleanup_camera()
+
     def update_camera(self):
-        """Update camera feed"""
-        while self.is_running:
-            try:
-                if self.cap is None or not self.cap.isOpened():
-                    break
-                    
-                ret, frame = self.cap.read()
+        """Capture thread: read frames into the single-slot buffer"""
+        cap = self.cap
+        try:
+            while self.is_running:
+                start = time.perf_counter()
+                ret, frame = cap.read()
                 if not ret:
+                    self.capture_error = "Could not read from camera"
                     break
-                
-                # Store current frame for capture
-                self.current_frame = frame.copy()
-                    
-                # Convert frame to RGB for display
-                display_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # Convert to PIL Image
-                image = Image.fromarray(display_frame)
-                
-                # Resize to fit window
-                image = image.resize((600, 400), Image.Resampling.LANCZOS)
-                
+                captured = time.perf_counter()
+                self.stats.record("capture", captured - start)
+
+                self.frames_captured += 1
+                self.frame_buffer.put(frame, captured)
+                if self.frames_captured % self.DETECT_EVERY == 0:
+                    self.detect_buffer.put(frame, captured)
+
+        except Exception as e:
+            print(f"Error updating camera: {e}")
+            self.capture_error = str(e)
+        finally:
+            # The capture thread owns the device
+            cap.release()
+            self.detect_buffer.wake()
+
+    def _detect_faces(self):
+        """Detection thread: follow the face in every DETECT_EVERY-th frame"""
+        tracker = self.face_tracker
+        while self.is_running:
+            item = self.detect_buffer.take(timeout=0.5)
+            if item is None:
+                continue
+            frame, _, captured = item
+            try:
+                start = time.perf_counter()
+                if self.emotion_manager is not None:
+                    # Eye and smile cascades only run inside the tracked box
+                    self.live_emotion = self.emotion_manager.detect_emotion_tracked(frame, tracker)
+                    self.voter.add(self.live_emotion)
+                else:
+                    tracker.update(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+                self.last_faces = [tracker.box] if tracker.box is not None else []
+                done = time.perf_counter()
+                self.stats.record("detect", done - start)
+                self.stats.record("detect_lag", done - captured)
+            except Exception as e:
+                print(f"Error detecting faces: {e}")
+
+    def _display_frame(self):
+        """Tk thread: show the newest frame, if there is one"""
+        self.display_job = None
+        if not self.is_running:
+            return
+
+        if self.capture_error is not None:
+            messagebox.showerror("Error", self.capture_error)
+            self.cleanup_camera()
+            return
+
+        item = self.frame_buffer.take(timeout=0)
+        if item is not None:
+            frame, _, captured = item
+            try:
+                start = time.perf_counter()
+                # Scale with a cheap interpolation, then convert only the small frame
+                display_frame = cv2.resize(frame, self.DISPLAY_SIZE, interpolation=cv2.INTER_LINEAR)
+                scale_x = self.DISPLAY_SIZE[0] / frame.shape[1]
+                scale_y = self.DISPLAY_SIZE[1] / frame.shape[0]
+                for x, y, w, h in self.last_faces:
+                    cv2.rectangle(
+                        display_frame,
+                        (int(x * scale_x), int(y * scale_y)),
+                        (int((x + w) * scale_x), int((y + h) * scale_y)),
+                        (0, 200, 0),
+                        2
+                    )
+                    if self.live_emotion:
+                        cv2.putText(
+                            display_frame,
+                            self.emotion_manager.get_emotion_name(self.live_emotion).capitalize(),
+                            (int(x * scale_x), max(15, int(y * scale_y) - 8)),
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            0.6,
+                            (0, 200, 0),
+                            2
+                        )
+                display_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
+
                 # Convert to PhotoImage
-                photo = ImageTk.PhotoImage(image=image)
-                
+                photo = ImageTk.PhotoImage(image=Image.fromarray(display_frame))
+
                 # Update label
                 self.camera_label.configure(image=photo)
                 self.camera_label.image = photo
-                
-                # Small delay to reduce CPU usage
-                time.sleep(0.03)
-                
+
+                done = time.perf_counter()
+                self.frames_displayed += 1
+                self.stats.record("display", done - start)
+                self.stats.record("frame_age", done - captured)
+
             except Exception as e:
-                print(f"Error updating camera: {e}")
-                break
-                
-        # Cleanup
-        self.cleanup_camera()
-        
-    def start_countdown(self):
-        """Start countdown timer"""
+                print(f"Error displaying frame: {e}")
+
+        # Stop early once the frames agree
+        if not self.finishing and self.voter.is_confident():
+            self.finish_detection()
+            return
+
+        self.display_job = self.after(self.DISPLAY_INTERVAL_MS, self._display_frame)
+
+    def start_countdown(self, remaining=None):
+        """Count down on the Tk thread, then capture"""
         try:
-            for i in range(self.capture_timer, 0, -1):
-                if not self.is_running:
-                    break
-                self.timer_label.configure(text=str(i))
-                time.sleep(1)
-                
-            if self.is_running:
-                self.capture_image()
-                
+            self.countdown_job = None
+            if not self.is_running:
+                return
+            if remaining is None:
+                remaining = self.capture_timer
+            if remaining > 0:
+                self.timer_label.configure(text=str(remaining))
+                self.countdown_job = self.after(1000, self.start_countdown, remaining - 1)
+            else:
+                self.finish_detection()
+
         except Exception as e:
             print(f"Error in countdown: {e}")
             self.cleanup_camera()
-            
+
+    def finish_detection(self):
+        """Use the vote if there is one, otherwise classify the newest frame"""
+        if self.finishing:
+            return
+        self.finishing = True
+
+        emotion_number, confidence = self.voter.result()
+        if emotion_number == EmotionVoter.UNTAGGED:
+            self.capture_image()
+            return
+
+        print(f"Emotion vote: {emotion_number} with {confidence:.0%} of "
+              f"{self.voter.frames_seen} frames")
+        self.timer_label.configure(text=self.language_manager.get_text("processing"))
+        # Let the label redraw before the recommendations window opens
+        self.after(10, self.process_detected_emotion, emotion_number)
+
     def capture_image(self):
         """Capture frame and process it"""
         try:
-            if self.cap is None or not self.cap.isOpened() or self.current_frame is None:
+            self.finishing = True
+            self.current_frame = self.frame_buffer.latest()
+            if self.cap is None or self.current_frame is None:
                 raise Exception("Camera not initialized or no frame available")
-            
+
             # Update UI
             self.timer_label.configure(text=self.language_manager.get_text("processing"))
-            
-            # Process captured frame after delay
-            self.after(1000, self.process_captured_frame)
-            
+
+            # Let the label redraw before the full detection blocks the Tk thread
+            self.after(10, self.process_captured_frame)
+
         except Exception as e:
             print(f"Error capturing image: {e}")
             messagebox.showerror("Error", str(e))
             self.cleanup_camera()
-            
+
+    def process_detected_emotion(self, emotion_number):
+        """Hand the voted emotion to the UI and cleanup"""
+        try:
+            self._stop_pipeline()
+            self.parent_ui.process_detected_emotion(emotion_number)
+
+        except Exception as e:
+            print(f"Error processing emotion: {e}")
+            messagebox.showerror("Error", str(e))
+
+        finally:
+            # Cleanup and close
+            self.cleanup_camera()
+
     def process_captured_frame(self):
         """Process captured frame and cleanup"""
         try:
+            # Stop the preview before running the full detection
+            self._stop_pipeline()
             if self.current_frame is not None:
                 # Process frame directly
                 self.parent_ui.process_captured_frame(self.current_frame)
-            
+
         except Exception as e:
             print(f"Error processing frame: {e}")
             messagebox.showerror("Error", str(e))
-            
+
         finally:
             # Cleanup and close
             self.cleanup_camera()
-            
+
+    def get_stats(self):
+        """Describe frame counts and per-stage latency of this session"""
+        stats = (
+            f"{self.frames_captured} frames captured, {self.frames_displayed} displayed, "
+            f"{self.frame_buffer.dropped} dropped; {self.stats.report()}"
+        )
+        tracker = self.face_tracker
+        if tracker is not None:
+            stats += (
+                f"; tracker: {tracker.full_scans} full scans, {tracker.local_scans} local, "
+                f"{tracker.template_matches} template, {tracker.losses} lost"
+            )
+        return stats
+
+    def _stop_pipeline(self):
+        """Stop the threads and scheduled callbacks"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        for job in (self.display_job, self.countdown_job):
+            if job is not None:
+                try:
+                    self.after_cancel(job)
+                except Exception:
+                    pass
+        self.display_job = None
+        self.countdown_job = None
+        self.detect_buffer.wake()
+
+        # The capture thread releases the camera once its read returns, and
+        # the detection thread must be done with the shared cascades
+        for thread in (self.camera_thread, self.detect_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        print(f"Camera pipeline: {self.get_stats()}")
+
     def cleanup_camera(self):
         """Clean up camera resources"""
         try:
             # Stop camera thread
-            self.is_running = False
-            
-            # Release camera
-            if self.cap is not None:
+            self._stop_pipeline()
+
+            # Release camera if the capture thread never started
+            if self.cap is not None and (self.camera_thread is None or not self.camera_thread.is_alive()):
                 self.cap.release()
-                self.cap = None
-                
+            self.cap = None
+
             # Destroy window if it exists
             try:
                 self.destroy()
             except:
                 pass
-                
+
         except Exception as e:
             print(f"Error cleaning up camera: {e}")
-            
+
     def on_closing(self):
         """Handle window close event"""
         self.cleanup_camera()
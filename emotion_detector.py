@@ -0,0 +1,450 @@
+"""Headless emotion detection with OpenCV Haar cascades.
+
+EmotionDetector has no Tk dependency, so it can be used from the camera
+window, from worker processes and from the command line. Run this module to
+classify a folder or list of images on a process pool and write one JSON line
+per image:
+
+    python emotion_detector.py IMAGES... [--output results.jsonl] [--workers N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import cv2
+from path_utils import get_data_directory
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+CASCADE_FILES = {
+    'face': 'haarcascade_frontalface_default.xml',
+    'eye': 'haarcascade_eye.xml',
+    'smile': 'haarcascade_smile.xml'
+}
+
+# Loaded cascades are shared by every detector in the process
+_cascades = {}  # {name: (path, classifier)}
+_cascade_lock = threading.Lock()
+cascade_load_seconds = {}
+
+def _load_cascade(name, verbose=True):
+    """Load a cascade from Emotion_Data, falling back to OpenCV's built-in one"""
+    filename = CASCADE_FILES[name]
+    emotion_data_dir = os.path.join(get_data_directory(), "Emotion_Data")
+
+    # Create Emotion_Data directory if it doesn't exist
+    os.makedirs(emotion_data_dir, exist_ok=True)
+
+    cascade_path = os.path.join(emotion_data_dir, filename)
+    builtin_path = cv2.data.haarcascades + filename
+
+    # Check if the file exists, if not, use OpenCV's built-in cascade as fallback
+    if not os.path.exists(cascade_path):
+        if verbose:
+            print(f"Warning: {cascade_path} not found, using OpenCV's built-in cascade")
+        cascade_path = builtin_path
+
+    if verbose:
+        print(f"Loading {name} cascade from: {cascade_path}")
+    cascade = cv2.CascadeClassifier(cascade_path)
+
+    # Verify cascade loaded correctly
+    if cascade.empty():
+        print(f"Error: {name.capitalize()} cascade failed to load")
+        cascade_path = builtin_path
+        cascade = cv2.CascadeClassifier(cascade_path)
+    return cascade_path, cascade
+
+def get_cascade(name, verbose=True):
+    """Get the (path, classifier) of the 'face', 'eye' or 'smile' cascade.
+
+    The XML is parsed once per process, on first use.
+    """
+    with _cascade_lock:
+        if name not in _cascades:
+            start = time.perf_counter()
+            _cascades[name] = _load_cascade(name, verbose)
+            cascade_load_seconds[name] = time.perf_counter() - start
+        return _cascades[name]
+
+def warm_up_cascades(background=True, verbose=True):
+    """Load every cascade ahead of first use, in a daemon thread by default"""
+    def load_all():
+        start = time.perf_counter()
+        for name in CASCADE_FILES:
+            get_cascade(name, verbose)
+        if verbose:
+            loads = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in cascade_load_seconds.items())
+            print(f"Haar cascades ready after {(time.perf_counter() - start) * 1000:.0f} ms ({loads})")
+
+    if not background:
+        load_all()
+        return None
+    thread = threading.Thread(target=load_all, daemon=True)
+    thread.start()
+    return thread
+
+class EmotionDetector:
+    # Emotion class numbers
+    UNTAGGED = 0
+    NEUTRAL = 1
+    HAPPY = 2
+    SAD = 3
+
+    EMOTION_NAMES = {
+        UNTAGGED: 'untagged',
+        NEUTRAL: 'neutral',
+        HAPPY: 'happy',
+        SAD: 'sad'
+    }
+
+    # Detection modes for detect_emotion. Accurate stays the default until
+    # benchmarks/detection_benchmark.py shows that fast agrees with it on a
+    # labelled fixture set
+    MODE_ACCURATE = 'accurate'
+    MODE_FAST = 'fast'
+    # Fast mode looks for faces in frames scaled down to this width
+    FAST_WORKING_WIDTH = 320
+    # Fast mode scales face regions to this width before eye and smile detection
+    FAST_FACE_WIDTH = 160
+
+    def __init__(self, detection_mode=MODE_ACCURATE, verbose=True):
+        # Cascades are loaded on first use, see get_cascade
+        self.detection_mode = detection_mode
+        self.verbose = verbose
+
+    @property
+    def face_cascade(self):
+        return get_cascade('face', self.verbose)[1]
+
+    @property
+    def eye_cascade(self):
+        return get_cascade('eye', self.verbose)[1]
+
+    @property
+    def smile_cascade(self):
+        return get_cascade('smile', self.verbose)[1]
+
+    def _log(self, message, verbose=None):
+        if self.verbose if verbose is None else verbose:
+            print(message)
+
+    @classmethod
+    def get_emotion_name(cls, emotion_number):
+        return cls.EMOTION_NAMES.get(emotion_number, 'unknown')
+
+    def detect_emotion(self, image, mode=None):
+        """Detect emotion from image and return emotion class number"""
+        return self.detect(image, mode)['emotion']
+
+    def detect(self, image, mode=None, verbose=None):
+        """Detect emotion from image.
+
+        Returns a dict with the emotion class number and the number of faces,
+        eyes and smiles found.
+        """
+        result = {'emotion': self.UNTAGGED, 'faces': 0, 'eyes': 0, 'smiles': 0}
+        try:
+            self._log("Starting emotion detection", verbose)
+
+            if image is None:
+                self._log("Input image is None", verbose)
+                return result
+
+            mode = mode or self.detection_mode
+            if mode == self.MODE_FAST:
+                faces, face_roi = self._find_face_fast(image, verbose)
+            else:
+                faces, face_roi = self._find_face_accurate(image, verbose)
+            result['faces'] = len(faces)
+
+            if face_roi is None:
+                self._log("No faces detected after multiple attempts", verbose)
+                return result
+
+            result.update(self._classify_face(faces, face_roi, verbose))
+
+        except Exception as e:
+            print(f"Emotion detection error: {e}")
+        return result
+
+    def detect_emotion_tracked(self, image, tracker):
+        """Detect emotion on a live frame, following the face with a FaceTracker.
+
+        Only the tracked face box goes through the eye and smile cascades; the
+        full frame is only scanned when the tracker has to find the face again.
+        """
+        try:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            box = tracker.update(gray)
+            if box is None:
+                return self.UNTAGGED
+            face_roi = self._face_region(gray, box)
+            if face_roi is None:
+                return self.UNTAGGED
+            return self._classify_face([box], face_roi, verbose=False)['emotion']
+
+        except Exception as e:
+            print(f"Emotion tracking error: {e}")
+            return self.UNTAGGED
+
+    @staticmethod
+    def _enhance(gray):
+        """Blend in an adaptive threshold for better detection in low light"""
+        thresh = cv2.adaptiveThreshold(
+            gray,
+            255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY,
+            11,
+            2
+        )
+        return cv2.addWeighted(gray, 0.7, thresh, 0.3, 0)
+
+    def _find_face_fast(self, image, verbose=None):
+        """Find a face on a downscaled frame with a single cascade pyramid.
+
+        Returns the faces and the first face region cut from the full
+        resolution frame, scaled to FAST_FACE_WIDTH and equalized.
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        # Work on a fixed resolution, whatever the camera delivers
+        scale = min(1.0, self.FAST_WORKING_WIDTH / gray.shape[1])
+        small = gray
+        if scale < 1.0:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        small = cv2.equalizeHist(small)
+
+        faces = self.face_cascade.detectMultiScale(
+            small,
+            scaleFactor=1.1,
+            minNeighbors=4,
+            minSize=(20, 20)
+        )
+
+        # The enhanced image is only worth computing when the plain pass failed
+        if len(faces) == 0:
+            self._log("Trying enhanced image detection", verbose)
+            enhanced = self._enhance(cv2.GaussianBlur(small, (3, 3), 0))
+            faces = self.face_cascade.detectMultiScale(
+                enhanced,
+                scaleFactor=1.1,
+                minNeighbors=3,
+                minSize=(20, 20)
+            )
+
+        if len(faces) == 0:
+            return faces, None
+
+        # Map the first face back to full resolution
+        box = tuple(int(round(v / scale)) for v in faces[0])
+        return faces, self._face_region(gray, box)
+
+    def _face_region(self, gray, box):
+        """Cut a face box from a full resolution frame, scaled to FAST_FACE_WIDTH"""
+        x, y, w, h = box
+        face_roi = gray[max(0, y):y+h, max(0, x):x+w]
+        if face_roi.size == 0:
+            return None
+
+        face_height = max(1, int(round(face_roi.shape[0] * self.FAST_FACE_WIDTH / face_roi.shape[1])))
+        face_roi = cv2.resize(face_roi, (self.FAST_FACE_WIDTH, face_height), interpolation=cv2.INTER_AREA)
+        return cv2.equalizeHist(face_roi)
+
+    def _find_face_accurate(self, image, verbose=None):
+        """Find a face with up to three full resolution passes"""
+        # Convert to grayscale for face detection
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        # Apply preprocessing to improve detection in various lighting conditions
+        # 1. Apply histogram equalization to improve contrast
+        gray = cv2.equalizeHist(gray)
+
+        # 2. Apply Gaussian blur to reduce noise
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        # First attempt with standard parameters
+        faces = self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor=1.05,
+            minNeighbors=4,
+            minSize=(20, 20)
+        )
+
+        # If no faces found, try with enhanced image
+        if len(faces) == 0:
+            self._log("Trying enhanced image detection", verbose)
+            # 3. Combine original and thresholded image for better detection
+            enhanced = self._enhance(gray)
+            faces = self.face_cascade.detectMultiScale(
+                enhanced,
+                scaleFactor=1.03,
+                minNeighbors=3,
+                minSize=(20, 20)
+            )
+
+        # If still no faces, try with more aggressive parameters
+        if len(faces) == 0:
+            self._log("Trying more aggressive detection parameters", verbose)
+            faces = self.face_cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.01,
+                minNeighbors=2,
+                minSize=(15, 15)
+            )
+
+        if len(faces) == 0:
+            return faces, None
+
+        # Process the first face found
+        x, y, w, h = faces[0]
+        face_roi = gray[y:y+h, x:x+w]
+
+        # Apply contrast enhancement to face region
+        return faces, cv2.equalizeHist(face_roi)
+
+    def _classify_face(self, faces, face_roi, verbose=None):
+        """Classify a face region by its eyes and smile"""
+        # Detect eyes with multiple parameter sets
+        eyes = self.eye_cascade.detectMultiScale(
+            face_roi,
+            scaleFactor=1.1,
+            minNeighbors=4,
+            minSize=(10, 10)
+        )
+
+        if len(eyes) < 2:
+            # Try again with different parameters
+            eyes = self.eye_cascade.detectMultiScale(
+                face_roi,
+                scaleFactor=1.05,
+                minNeighbors=3,
+                minSize=(8, 8)
+            )
+
+        # Detect smile with multiple parameter sets
+        smile = self.smile_cascade.detectMultiScale(
+            face_roi,
+            scaleFactor=1.5,
+            minNeighbors=15,
+            minSize=(20, 20)
+        )
+
+        if len(smile) == 0:
+            # Try again with different parameters
+            smile = self.smile_cascade.detectMultiScale(
+                face_roi,
+                scaleFactor=1.3,
+                minNeighbors=10,
+                minSize=(15, 15)
+            )
+
+        # Determine emotion based on facial features with improved logic
+        if len(smile) > 0:
+            # Smile detected - likely happy
+            emotion, reason = self.HAPPY, "Smile detected - classifying as HAPPY"
+        elif len(eyes) >= 2:
+            # Eyes detected but no smile - likely neutral
+            emotion, reason = self.NEUTRAL, "Two eyes detected, no smile - classifying as NEUTRAL"
+        elif len(eyes) > 0:
+            # At least one eye detected - still neutral
+            emotion, reason = self.NEUTRAL, "At least one eye detected - classifying as NEUTRAL"
+        else:
+            # Eyes not clearly detected - might be sad or eyes closed
+            emotion, reason = self.SAD, "No eyes clearly detected - classifying as SAD"
+
+        self._log(f"Detection results: {len(faces)} faces, {len(eyes)} eyes, {len(smile)} smiles", verbose)
+        self._log(reason, verbose)
+        return {'emotion': emotion, 'faces': len(faces), 'eyes': len(eyes), 'smiles': len(smile)}
+
+
+# Batch detection: each worker process loads the cascades once
+_worker_detector = None
+
+def _init_worker(detection_mode):
+    global _worker_detector
+    _worker_detector = EmotionDetector(detection_mode, verbose=False)
+    # Load the cascades before the first image so its timing stays honest
+    warm_up_cascades(background=False, verbose=False)
+
+def detect_file(image_path):
+    """Classify one image file in a worker and return its JSON record"""
+    record = {'path': image_path}
+    start = time.perf_counter()
+    image = cv2.imread(image_path)
+    loaded = time.perf_counter()
+    if image is None:
+        record['error'] = "Could not read image"
+    else:
+        result = _worker_detector.detect(image)
+        record.update(result)
+        record['emotion_name'] = EmotionDetector.get_emotion_name(result['emotion'])
+        record['width'] = image.shape[1]
+        record['height'] = image.shape[0]
+    done = time.perf_counter()
+    record['load_ms'] = round((loaded - start) * 1000, 3)
+    record['detect_ms'] = round((done - loaded) * 1000, 3)
+    return record
+
+def find_images(paths):
+    """Expand files and directories (recursively) into image paths"""
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+def detect_batch(image_paths, detection_mode=EmotionDetector.MODE_ACCURATE, workers=None, chunksize=16):
+    """Yield one record per image, in input order, detected on a process pool"""
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(detection_mode,)) as pool:
+        yield from pool.imap(detect_file, image_paths, chunksize=chunksize)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect emotions in images without a display")
+    parser.add_argument("paths", nargs="+", help="image files or directories")
+    parser.add_argument("--output", "-o", help="JSON Lines output file (default: stdout)")
+    parser.add_argument("--mode", choices=[EmotionDetector.MODE_FAST, EmotionDetector.MODE_ACCURATE],
+                        default=EmotionDetector.MODE_ACCURATE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    image_paths = list(find_images(args.paths))
+    if not image_paths:
+        print("No images found", file=sys.stderr)
+        return 1
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    counts = {}
+    errors = 0
+    start = time.perf_counter()
+    try:
+        for record in detect_batch(image_paths, args.mode, args.workers, args.chunksize):
+            output.write(json.dumps(record) + "\n")
+            if 'error' in record:
+                errors += 1
+            else:
+                counts[record['emotion_name']] = counts.get(record['emotion_name'], 0) + 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{name} {count}" for name, count in sorted(counts.items()))
+    print(f"{len(image_paths)} images in {elapsed:.1f}s ({len(image_paths) / elapsed:.1f}/s): "
+          f"{summary or 'none'}, {errors} errors", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import threading
+from collections import Counter, deque
+
+class EmotionVoter:
+    """Majority vote over the emotions detected in the last few frames.
+
+    Each add() is one frame's result; UNTAGGED (no face found) fills a slot
+    in the window without voting for any emotion, so frames without a face
+    lower the confidence instead of being ignored. The result is confident
+    once at least MIN_VOTES frames were seen and the leading emotion holds
+    CONFIDENCE of the window, so a single blink cannot flip it.
+    """
+
+    UNTAGGED = 0
+    WINDOW = 15
+    MIN_VOTES = 8
+    CONFIDENCE = 0.7
+
+    def __init__(self, window=WINDOW, min_votes=MIN_VOTES, confidence=CONFIDENCE):
+        self.min_votes = min_votes
+        self.confidence = confidence
+        self._lock = threading.Lock()
+        self._votes = deque(maxlen=window)
+        self._counts = Counter()
+        self.frames_seen = 0
+
+    def add(self, emotion_number):
+        with self._lock:
+            if len(self._votes) == self._votes.maxlen:
+                oldest = self._votes[0]
+                self._counts[oldest] -= 1
+            self._votes.append(emotion_number)
+            self._counts[emotion_number] += 1
+            self.frames_seen += 1
+
+    def reset(self):
+        with self._lock:
+            self._votes.clear()
+            self._counts.clear()
+            self.frames_seen = 0
+
+    def result(self):
+        """Get (emotion number, share of the window) of the leading emotion"""
+        with self._lock:
+            votes = [(count, emotion) for emotion, count in self._counts.items()
+                     if emotion != self.UNTAGGED and count > 0]
+            if not votes:
+                return self.UNTAGGED, 0.0
+            count, emotion = max(votes)
+            return emotion, count / len(self._votes)
+
+    def is_confident(self):
+        with self._lock:
+            if len(self._votes) < self.min_votes:
+                return False
+        return self.result()[1] >= self.confidence
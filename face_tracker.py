@@ -0,0 +1,158 @@
+import cv2
+
+class FaceTracker:
+    """Follow one face across camera frames.
+
+    A full-frame face cascade scan only runs to (re-)acquire the face. After
+    that, each frame is searched in a padded box around the last position,
+    scaled so the face is about LOCAL_FACE_WIDTH pixels wide and restricted
+    to nearby face sizes. If the cascade misses there, the last face patch is
+    template matched in the same box. The face counts as lost after a failed
+    match or after MAX_TEMPLATE_FRAMES frames in a row on template matching
+    alone, and the next update scans the full frame again.
+
+    Boxes are (x, y, w, h) in the coordinates of the frames passed to update().
+    """
+
+    # Full-frame scans work on frames scaled down to this width
+    WORKING_WIDTH = 320
+    # Padding around the last box, as a fraction of its size
+    SEARCH_PADDING = 0.5
+    # Local searches scale the face to this width
+    LOCAL_FACE_WIDTH = 64
+    MATCH_THRESHOLD = 0.6
+    MAX_TEMPLATE_FRAMES = 10
+
+    def __init__(self, face_cascade):
+        self.face_cascade = face_cascade
+        self.box = None
+        self.template = None
+        self.template_frames = 0
+
+        # How each update found the face
+        self.full_scans = 0
+        self.local_scans = 0
+        self.template_matches = 0
+        self.losses = 0
+
+    def reset(self):
+        """Forget the tracked face; the next update scans the full frame"""
+        self.box = None
+        self.template = None
+        self.template_frames = 0
+
+    def update(self, gray):
+        """Locate the face in a grayscale frame and return its box or None"""
+        if self.box is not None:
+            box = self._search_local(gray)
+            if box is not None:
+                self.local_scans += 1
+                self.template_frames = 0
+            elif self.template_frames < self.MAX_TEMPLATE_FRAMES:
+                box = self._match_template(gray)
+                if box is not None:
+                    self.template_matches += 1
+                    self.template_frames += 1
+            if box is not None:
+                self._remember(gray, box)
+                return box
+            self.losses += 1
+            self.reset()
+
+        box = self._acquire(gray)
+        if box is not None:
+            self._remember(gray, box)
+        return box
+
+    def _acquire(self, gray):
+        """Scan the whole (downscaled) frame and keep the largest face"""
+        self.full_scans += 1
+        scale = min(1.0, self.WORKING_WIDTH / gray.shape[1])
+        small = gray
+        if scale < 1.0:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        faces = self.face_cascade.detectMultiScale(
+            cv2.equalizeHist(small),
+            scaleFactor=1.1,
+            minNeighbors=4,
+            minSize=(20, 20)
+        )
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        return tuple(int(round(v / scale)) for v in (x, y, w, h))
+
+    def _search_region(self, gray):
+        """Get the padded search box around the last face, clipped to the frame"""
+        x, y, w, h = self.box
+        pad_x = int(w * self.SEARCH_PADDING)
+        pad_y = int(h * self.SEARCH_PADDING)
+        x0 = max(0, x - pad_x)
+        y0 = max(0, y - pad_y)
+        x1 = min(gray.shape[1], x + w + pad_x)
+        y1 = min(gray.shape[0], y + h + pad_y)
+        return x0, y0, x1, y1
+
+    def _scaled_region(self, gray):
+        """Cut the search box and scale it so the face is LOCAL_FACE_WIDTH wide"""
+        x0, y0, x1, y1 = self._search_region(gray)
+        scale = min(1.0, self.LOCAL_FACE_WIDTH / self.box[2])
+        region = gray[y0:y1, x0:x1]
+        if region.size == 0:
+            return None, scale, x0, y0
+        if scale < 1.0:
+            region = cv2.resize(region, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return region, scale, x0, y0
+
+    def _search_local(self, gray):
+        """Run the face cascade around the last box, for similar face sizes only"""
+        region, scale, x0, y0 = self._scaled_region(gray)
+        if region is None:
+            return None
+        face_width = self.box[2] * scale
+        faces = self.face_cascade.detectMultiScale(
+            cv2.equalizeHist(region),
+            scaleFactor=1.1,
+            minNeighbors=3,
+            minSize=(max(20, int(face_width * 0.75)),) * 2,
+            maxSize=(int(face_width * 1.35) + 1,) * 2
+        )
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        return (
+            x0 + int(round(x / scale)),
+            y0 + int(round(y / scale)),
+            int(round(w / scale)),
+            int(round(h / scale))
+        )
+
+    def _match_template(self, gray):
+        """Find the last face patch around the last box"""
+        if self.template is None:
+            return None
+        region, scale, x0, y0 = self._scaled_region(gray)
+        if region is None:
+            return None
+        template = self.template
+        if template.shape[0] > region.shape[0] or template.shape[1] > region.shape[1]:
+            return None
+        result = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        if score < self.MATCH_THRESHOLD:
+            return None
+        _, _, w, h = self.box
+        return x0 + int(round(x / scale)), y0 + int(round(y / scale)), w, h
+
+    def _remember(self, gray, box):
+        """Keep the box and its patch, at the local search scale"""
+        self.box = box
+        x, y, w, h = box
+        patch = gray[y:y+h, x:x+w]
+        if patch.size == 0:
+            self.template = None
+            return
+        scale = min(1.0, self.LOCAL_FACE_WIDTH / w)
+        if scale < 1.0:
+            patch = cv2.resize(patch, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        self.template = patch
@@ -0,0 +1,225 @@
+import ctypes
+import ctypes.util
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+
+class Inotify:
+    """Minimal ctypes binding of the Linux inotify API"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+
+    IN_CLOEXEC = 0o2000000
+    IN_NONBLOCK = 0o4000
+
+    # struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+    EVENT_HEADER = struct.Struct('iIII')
+    READ_SIZE = 64 * 1024
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise_errno("inotify_init1")
+
+    def _raise_errno(self, what):
+        error = ctypes.get_errno()
+        raise OSError(error, f"{what}: {os.strerror(error)}")
+
+    def add_watch(self, path, mask):
+        """Watch a directory and return its watch descriptor"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask | self.IN_ONLYDIR))
+        if wd < 0:
+            self._raise_errno(f"inotify_add_watch {path}")
+        return wd
+
+    def remove_watch(self, wd):
+        # Fails harmlessly when the directory is already gone
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout):
+        """Wait up to timeout seconds and return (wd, mask, cookie, name) events"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, self.READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FolderWatcher:
+    """Follow changes to a library folder and apply them to the index as deltas.
+
+    On Linux every indexed directory gets an inotify watch, and only the
+    directories that events point at are listed again. Elsewhere, or when the
+    system runs out of watches, the directory mtimes are compared every
+    POLL_SECONDS instead, which is the check a rescan does. Events are
+    coalesced until the folder has been quiet for COALESCE_SECONDS (at most
+    MAX_DELAY_SECONDS after the first), so copying an album is one update.
+    Changes are put on `queue` as ('changes', (added, removed)) with the
+    (id, path, title) rows of new songs and the paths of deleted ones; a
+    renamed song is removed under its old path and added under the new one.
+    """
+
+    COALESCE_SECONDS = 0.5
+    MAX_DELAY_SECONDS = 2.0
+    POLL_SECONDS = 5.0
+
+    WATCH_MASK = (
+        Inotify.IN_CREATE | Inotify.IN_DELETE | Inotify.IN_MOVED_FROM | Inotify.IN_MOVED_TO
+        | Inotify.IN_CLOSE_WRITE | Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF
+    )
+
+    def __init__(self, library_index, folder_path):
+        self.library_index = library_index
+        self.folder_path = folder_path
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.watches = {}  # wd -> directory
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def _run(self):
+        try:
+            try:
+                inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                print(f"Watching {self.folder_path} by polling: {e}")
+                self._run_polling()
+                return
+
+            try:
+                self._run_inotify(inotify)
+            except OSError as e:
+                # Most likely out of watches (fs.inotify.max_user_watches)
+                print(f"Watching {self.folder_path} by polling: {e}")
+                inotify.close()
+                self._run_polling()
+            finally:
+                inotify.close()
+
+        except Exception as e:
+            print(f"Error watching folder: {e}")
+            self.queue.put(('error', str(e)))
+        finally:
+            self.library_index.close()
+
+    def _run_polling(self):
+        while not self.cancel_event.wait(self.POLL_SECONDS):
+            self._apply()
+
+    def _run_inotify(self, inotify):
+        self._sync_watches(inotify)
+        print(f"Watching {len(self.watches)} directories of {self.folder_path}")
+        # Catch anything that changed between the scan and the first watch
+        self._apply()
+
+        dirty = set()
+        full = False
+        first_event = last_event = 0.0
+        while not self.cancelled:
+            events = inotify.read_events(0.2)
+            now = time.monotonic()
+            for wd, mask, cookie, name in events:
+                if mask & Inotify.IN_Q_OVERFLOW:
+                    # Events were dropped; fall back to comparing mtimes once
+                    full = True
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & Inotify.IN_IGNORED:
+                    del self.watches[wd]
+                    continue
+                if mask & (Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF):
+                    dirty.add(directory)
+                elif mask & Inotify.IN_ISDIR or name.lower().endswith(self.library_index.supported_formats):
+                    dirty.add(directory)
+                else:
+                    continue
+                if not first_event:
+                    first_event = now
+                last_event = now
+
+            if (dirty or full) and (
+                now - last_event >= self.COALESCE_SECONDS or now - first_event >= self.MAX_DELAY_SECONDS
+            ):
+                self._apply(None if full else dirty)
+                self._sync_watches(inotify)
+                dirty = set()
+                full = False
+                first_event = last_event = 0.0
+
+    def _sync_watches(self, inotify):
+        """Watch the directories the index knows and drop watches of removed ones"""
+        directories = set(self.library_index.get_directories(self.folder_path))
+        watched = set(self.watches.values())
+        for wd, directory in list(self.watches.items()):
+            if directory not in directories:
+                inotify.remove_watch(wd)
+                del self.watches[wd]
+        for directory in directories - watched:
+            try:
+                self.watches[inotify.add_watch(directory, self.WATCH_MASK)] = directory
+            except FileNotFoundError:
+                continue
+
+    def _apply(self, directories=None):
+        """Rescan changed directories and hand the differences to the UI thread.
+
+        A refresh stopped by cancel() stores no directory mtime whose subtree
+        it did not finish, so the next watcher finds those directories
+        changed; nothing is queued.
+        """
+        added = []
+        removed = []
+        self.library_index.refresh(
+            self.folder_path,
+            cancel_event=self.cancel_event,
+            on_added=added.extend,
+            on_removed=removed.extend,
+            directories=directories
+        )
+        if (added or removed) and not self.cancelled:
+            self.queue.put(('changes', (added, removed)))
@@ -1,94 +1,265 @@
 import json
 import os
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 class HistoryManager:
-    def __init__(self):
+    """Play history backed by an append-only journal.
+
+    Every play appends one JSON line to history.jsonl, so a play costs O(1)
+    I/O no matter how much history has been kept. Play counts live in a
+    separate aggregate (history_counts.json) that compaction rewrites every
+    COMPACT_EVERY plays together with the journal offset it covers; at startup
+    only the journal lines after that offset are replayed into the counts.
+    The aggregate keeps per-day counts for the last ROLLING_DAYS days only and
+    folds older days into per-song totals, so it grows with the library, not
+    with the years of history.
+    """
+
+    # Plays between aggregate compactions
+    COMPACT_EVERY = 200
+    # Days kept as per-day counts before they are folded into the totals
+    ROLLING_DAYS = 90
+    # Recent entries (one per song per day) kept in memory for the history tab
+    RECENT_LIMIT = 500
+    # Bytes read from the end of the journal to rebuild the recent entries
+    RECENT_TAIL_BYTES = 256 * 1024
+
+    def __init__(self, data_dir=None):
         # Get application directory
         app_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Define history file path in Data folder
-        data_dir = os.path.join(app_dir, "Data")
-        self.history_file = os.path.join(data_dir, "history.json")
-        
+
+        # Define history file paths in Data folder
+        data_dir = data_dir or os.path.join(app_dir, "Data")
+        self.journal_file = os.path.join(data_dir, "history.jsonl")
+        self.counts_file = os.path.join(data_dir, "history_counts.json")
+        self.legacy_file = os.path.join(data_dir, "history.json")
+
         # Create Data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
-        
-        self.history = []
-        self.play_counts = {}  # Track play counts for today
+
+        self.daily_counts = {}  # {date: {path: plays}}, last ROLLING_DAYS days
+        self.total_counts = {}  # {path: plays} of the days before
+        self.recent = OrderedDict()  # {(path, date): entry}, oldest first
+        self.journal_offset = 0
+        self.appends_since_compaction = 0
+        self.journal_line_checked = False
+        self._listeners = []
+
+        self._migrate_legacy_history()
         self.load_history()
-        self._clean_old_counts()
+
+    @property
+    def play_counts(self):
+        """Play counts for today"""
+        return self.daily_counts.get(datetime.now().strftime('%Y-%m-%d'), {})
 
     def load_history(self):
-        if os.path.exists(self.history_file):
+        """Load the count aggregate, replay newer plays and read recent entries"""
+        self.daily_counts = {}
+        self.total_counts = {}
+        self.journal_offset = 0
+        if os.path.exists(self.counts_file):
             try:
-                with open(self.history_file, 'r') as f:
+                with open(self.counts_file, 'r') as f:
                     data = json.load(f)
-                    self.history = data.get('history', [])
-                    self.play_counts = data.get('play_counts', {})
+                self.daily_counts = data.get('daily_counts', {})
+                self.total_counts = data.get('total_counts', {})
+                self.journal_offset = data.get('journal_offset', 0)
             except Exception as e:
-                print(f"Error loading history: {e}")
-                # Initialize empty if error
-                self.history = []
-                self.play_counts = {}
+                print(f"Error loading history counts: {e}")
+                # Rebuild the counts from the whole journal
+                self.daily_counts = {}
+                self.total_counts = {}
+                self.journal_offset = 0
+
+        if not os.path.exists(self.journal_file):
+            return
+
+        try:
+            # Plays after the last compaction are not in the aggregate yet
+            size = os.path.getsize(self.journal_file)
+            if self.journal_offset > size:
+                self.daily_counts = {}
+                self.total_counts = {}
+                self.journal_offset = 0
+            with open(self.journal_file, 'rb') as f:
+                f.seek(self.journal_offset)
+                for entry in self._parse_lines(f.read().splitlines()):
+                    self._count_play(entry)
+                    self.appends_since_compaction += 1
+
+                # Recent entries come from the tail of the journal only
+                f.seek(max(0, size - self.RECENT_TAIL_BYTES))
+                lines = f.read().splitlines()
+                if size > self.RECENT_TAIL_BYTES:
+                    lines = lines[1:]  # First line may be cut in half
+                for entry in self._parse_lines(lines):
+                    self._remember(entry)
+        except Exception as e:
+            print(f"Error loading history: {e}")
+
+        self._fold_old_days()
+        if self.appends_since_compaction >= self.COMPACT_EVERY:
+            self.compact()
+
+    @staticmethod
+    def _parse_lines(lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A torn write at the end of the journal
+                continue
+
+    def _count_play(self, entry):
+        counts = self.daily_counts.setdefault(entry['date'], {})
+        counts[entry['path']] = counts.get(entry['path'], 0) + 1
+
+    def _fold_old_days(self):
+        """Move per-day counts older than ROLLING_DAYS into the per-song totals"""
+        cutoff = (datetime.now() - timedelta(days=self.ROLLING_DAYS)).strftime('%Y-%m-%d')
+        for date in [date for date in self.daily_counts if date < cutoff]:
+            for song_path, plays in self.daily_counts.pop(date).items():
+                self.total_counts[song_path] = self.total_counts.get(song_path, 0) + plays
+
+    def get_total_counts(self):
+        """Get how often every song was played over the whole history, as {path: plays}"""
+        totals = dict(self.total_counts)
+        for counts in self.daily_counts.values():
+            for song_path, plays in counts.items():
+                totals[song_path] = totals.get(song_path, 0) + plays
+        return totals
+
+    def _remember(self, entry):
+        """Keep one entry per song per day, most recent last"""
+        key = (entry['path'], entry['date'])
+        self.recent.pop(key, None)
+        self.recent[key] = entry
+        while len(self.recent) > self.RECENT_LIMIT:
+            self.recent.popitem(last=False)
+
+    def _append(self, entries):
+        os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+        if not self.journal_line_checked:
+            self._end_torn_line()
+            self.journal_line_checked = True
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def _end_torn_line(self):
+        """End a line left half written by a crash, so the next entry gets its own line"""
+        try:
+            with open(self.journal_file, 'rb+') as f:
+                if f.seek(0, os.SEEK_END) == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        except FileNotFoundError:
+            pass
 
     def save_history(self):
+        """Plays are written as they happen; this only compacts the aggregate"""
+        self.compact()
+
+    def compact(self):
+        """Write the play counts with the journal offset they cover"""
         try:
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-            
-            with open(self.history_file, 'w') as f:
+            self._fold_old_days()
+            offset = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+            temp_file = f"{self.counts_file}.tmp"
+            with open(temp_file, 'w') as f:
                 json.dump({
-                    'history': self.history,
-                    'play_counts': self.play_counts
-                }, f, indent=4)
+                    'daily_counts': self.daily_counts,
+                    'total_counts': self.total_counts,
+                    'journal_offset': offset
+                }, f)
+            os.replace(temp_file, self.counts_file)
+            self.journal_offset = offset
+            self.appends_since_compaction = 0
         except Exception as e:
             print(f"Error saving history: {e}")
 
-    def _clean_old_counts(self):
-        today = datetime.now().strftime('%Y-%m-%d')
-        # Reset play counts if it's a new day
-        if not any(entry.get('date') == today for entry in self.history):
-            self.play_counts = {}
-            self.save_history()
+    def _migrate_legacy_history(self):
+        """Import history.json from older versions into the journal once"""
+        if os.path.exists(self.journal_file) or not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, 'r') as f:
+                legacy = json.load(f).get('history', [])
+            entries = []
+            for entry in legacy:
+                # Old files kept one row per song per day with its play count
+                for _ in range(max(1, int(entry.get('play_count', 1)))):
+                    entries.append({
+                        'path': entry['path'],
+                        'title': entry.get('title', os.path.basename(entry['path'])),
+                        'date': entry.get('date', ''),
+                        'time': entry.get('time', '')
+                    })
+            self._append(entries)
+            print(f"Migrated {len(legacy)} history entries into {self.journal_file}")
+        except Exception as e:
+            print(f"Error migrating history: {e}")
+
+    def add_listener(self, callback):
+        """Call callback(entry) after every play, and callback(None) when history is cleared"""
+        self._listeners.append(callback)
+
+    def _notify(self, entry):
+        for callback in self._listeners:
+            try:
+                callback(entry)
+            except Exception as e:
+                print(f"Error in history listener: {e}")
 
     def add_to_history(self, song_path, title):
         current_time = datetime.now()
-        date_str = current_time.strftime('%Y-%m-%d')
-        time_str = current_time.strftime('%H:%M:%S')
-        
-        # Update play count for today
-        if song_path not in self.play_counts:
-            self.play_counts[song_path] = 0
-        self.play_counts[song_path] += 1
-
-        # Create new entry
         entry = {
             'path': song_path,
             'title': title,
-            'date': date_str,
-            'time': time_str,
-            'play_count': self.play_counts[song_path]
+            'date': current_time.strftime('%Y-%m-%d'),
+            'time': current_time.strftime('%H:%M:%S')
         }
-        
-        # Remove old entries of the same song from today
-        self.history = [h for h in self.history if not (
-            h['path'] == song_path and h['date'] == date_str
-        )]
-        
-        # Add new entry
-        self.history.append(entry)
-        
-        # Keep only last 100 entries
-        if len(self.history) > 100:
-            self.history = self.history[-100:]
-            
-        self.save_history()
+
+        try:
+            self._append([entry])
+        except Exception as e:
+            print(f"Error saving history: {e}")
+            return
+
+        self._count_play(entry)
+        self._remember(entry)
+        self._notify(entry)
+
+        self.appends_since_compaction += 1
+        if self.appends_since_compaction >= self.COMPACT_EVERY:
+            self.compact()
+
+    def get_play_count(self, song_path, date=None):
+        """Get how often a song was played on a day (today by default)"""
+        date = date or datetime.now().strftime('%Y-%m-%d')
+        return self.daily_counts.get(date, {}).get(song_path, 0)
 
     def get_history(self):
-        return self.history
+        """Get recent entries, one per song per day, oldest first"""
+        return [
+            dict(entry, play_count=self.get_play_count(entry['path'], entry['date']))
+            for entry in self.recent.values()
+        ]
 
     def clear_history(self):
-        self.history = []
-        self.play_counts = {}
-        self.save_history()
+        self.recent.clear()
+        self.daily_counts = {}
+        self.total_counts = {}
+        try:
+            # Truncate rather than delete so the legacy file is not migrated again
+            open(self.journal_file, 'w').close()
+        except Exception as e:
+            print(f"Error clearing history: {e}")
+        self.compact()
+        self._notify(None)
@@ -39,6 +39,8 @@ class LanguageManager:
                 "tag_emotion": "Tag Emotion",
                 "confirm": "Confirm",
                 "clear_history": "Clear History",
+                "play_next": "Play Next",
+                "accept_suggestion": "Accept Suggested Emotion",
                 "no_folder_selected": "No folder selected",
                 "select_emotion": "Select an emotion:",
                 "select_songs": "Select songs to tag:",
@@ -50,6 +52,7 @@ class LanguageManager:
                 "capturing_in": "Capturing in...",
                 "recommendations": "Recommended Songs",
                 "recommended_songs": "Recommended Songs For You",
+                "more_like_this": "More like {title}",
                 "camera_error": "Camera error occurred",
                 "no_face_detected": "No face detected",
                 "close": "Close",
@@ -61,7 +64,9 @@ class LanguageManager:
                 "start_capture": "Start Capture",
                 "processing_image": "Processing image...",
                 "detecting_emotion": "Detecting emotion...",
-                "getting_recommendations": "Getting song recommendations..."
+                "getting_recommendations": "Getting song recommendations...",
+                "scanning_songs": "Scanning... {count} songs",
+                "songs_in_library": "{count} songs"
             },
             "id_ID": {
                 "settings": "Pengaturan",
@@ -86,6 +91,8 @@ class LanguageManager:
                 "tag_emotion": "Tag Emosi",
                 "confirm": "Konfirmasi",
                 "clear_history": "Hapus Riwayat",
+                "play_next": "Putar Berikutnya",
+                "accept_suggestion": "Terima Saran Emosi",
                 "no_folder_selected": "Belum ada folder dipilih",
                 "select_emotion": "Pilih emosi:",
                 "select_songs": "Pilih lagu untuk ditag:",
@@ -97,6 +104,7 @@ class LanguageManager:
                 "capturing_in": "Mengambil gambar dalam...",
                 "recommendations": "Rekomendasi Lagu",
                 "recommended_songs": "Rekomendasi Lagu Untuk Anda",
+                "more_like_this": "Mirip dengan {title}",
                 "camera_error": "Terjadi kesalahan kamera",
                 "no_face_detected": "Wajah tidak terdeteksi",
                 "close": "Tutup",
@@ -108,7 +116,9 @@ class LanguageManager:
                 "start_capture": "Mulai Ambil Gambar",
                 "processing_image": "Memproses gambar...",
                 "detecting_emotion": "Mendeteksi emosi...",
-                "getting_recommendations": "Mendapatkan rekomendasi lagu..."
+                "getting_recommendations": "Mendapatkan rekomendasi lagu...",
+                "scanning_songs": "Memindai... {count} lagu",
+                "songs_in_library": "{count} lagu"
             }
         }
         self.load_language()
@@ -0,0 +1,540 @@
+import os
+import queue
+import sqlite3
+import threading
+from path_utils import get_library_index_path
+
+class LibraryIndex:
+    """Persistent SQLite index of the music library.
+
+    Songs are keyed by path and stored with their mtime and size, and every
+    scanned directory is stored with its own mtime. A refresh only lists the
+    directories whose mtime changed since the last scan, so a warm start costs
+    one stat per directory instead of a full filesystem walk.
+
+    A library folder is everything whose path lies below it, so a subfolder
+    indexed as its own library shares rows with its parent; the root column
+    only records which refresh wrote a row.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY,
+            root TEXT NOT NULL,
+            parent TEXT,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS directories_root ON directories(root);
+        CREATE INDEX IF NOT EXISTS directories_parent ON directories(parent);
+
+        CREATE TABLE IF NOT EXISTS songs (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            root TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            title TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS songs_root_title ON songs(root, title COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS songs_directory ON songs(directory);
+
+        CREATE TABLE IF NOT EXISTS metadata (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            artist TEXT,
+            album TEXT,
+            duration REAL,
+            bitrate INTEGER,
+            track_gain REAL,
+            track_peak REAL
+        );
+
+        CREATE TABLE IF NOT EXISTS loudness (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            integrated REAL,
+            peak REAL
+        );
+
+        CREATE TABLE IF NOT EXISTS features (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            tempo REAL,
+            pulse REAL,
+            centroid REAL,
+            energy REAL,
+            mode REAL,
+            emotion INTEGER,
+            confidence REAL
+        );
+    """
+
+    METADATA_COLUMNS = ('artist', 'album', 'duration', 'bitrate', 'track_gain', 'track_peak')
+    FEATURE_COLUMNS = ('tempo', 'pulse', 'centroid', 'energy', 'mode')
+    # Tables with one row per song, cleaned up when the song leaves the library
+    SONG_TABLES = ('metadata', 'loudness', 'features')
+
+    def __init__(self, index_path=None, supported_formats=('.mp3', '.wav', '.ogg', '.flac')):
+        self.index_path = index_path or get_library_index_path()
+        self.supported_formats = tuple(ext.lower() for ext in supported_formats)
+
+        # Create Data directory if it doesn't exist
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+
+        # SQLite connections cannot be shared between threads
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        """Get the connection for the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the connection of the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _path_range(root):
+        """(low, high) bounds of the paths below a folder, for range queries on path"""
+        prefix = os.path.join(root, "")
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def get_songs(self, root):
+        """Get (id, path, title) rows for a library folder sorted by title"""
+        conn = self._connect()
+        return conn.execute(
+            "SELECT id, path, title FROM songs WHERE path >= ? AND path < ? ORDER BY title COLLATE NOCASE",
+            self._path_range(root)
+        ).fetchall()
+
+    def count_songs(self, root):
+        """Get the number of indexed songs for a library folder"""
+        conn = self._connect()
+        return conn.execute(
+            "SELECT COUNT(*) FROM songs WHERE path >= ? AND path < ?", self._path_range(root)
+        ).fetchone()[0]
+
+    def get_metadata(self, root):
+        """Get cached metadata for a library folder as {path: {field: value}}"""
+        conn = self._connect()
+        columns = ", ".join(f"m.{column}" for column in self.METADATA_COLUMNS)
+        metadata = {}
+        for row in conn.execute(
+            f"SELECT m.path, {columns} FROM metadata m JOIN songs s ON s.path = m.path WHERE s.path >= ? AND s.path < ?",
+            self._path_range(root)
+        ):
+            metadata[row[0]] = {
+                column: value
+                for column, value in zip(self.METADATA_COLUMNS, row[1:])
+                if value is not None
+            }
+        return metadata
+
+    def get_paths_missing_metadata(self, root):
+        """Get songs with no metadata or metadata older than the file"""
+        conn = self._connect()
+        return [row[0] for row in conn.execute(
+            """SELECT s.path FROM songs s LEFT JOIN metadata m ON m.path = s.path
+               WHERE s.path >= ? AND s.path < ? AND (m.path IS NULL OR m.mtime_ns != s.mtime_ns OR m.size != s.size)""",
+            self._path_range(root)
+        )]
+
+    def save_metadata(self, results):
+        """Store (path, mtime_ns, size, metadata) tuples"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO metadata (path, mtime_ns, size, %s) VALUES (?, ?, ?, %s)" % (
+                    ", ".join(self.METADATA_COLUMNS), ", ".join("?" * len(self.METADATA_COLUMNS))
+                ),
+                [
+                    (path, mtime_ns, size) + tuple(metadata.get(column) for column in self.METADATA_COLUMNS)
+                    for path, mtime_ns, size, metadata in results
+                ]
+            )
+
+    def get_loudness(self, root):
+        """Get measured loudness for a library folder as {path: (integrated LUFS, peak)}"""
+        conn = self._connect()
+        return {
+            path: (integrated, peak)
+            for path, integrated, peak in conn.execute(
+                """SELECT l.path, l.integrated, l.peak FROM loudness l JOIN songs s ON s.path = l.path
+                   WHERE s.path >= ? AND s.path < ? AND l.integrated IS NOT NULL""",
+                self._path_range(root)
+            )
+        }
+
+    def get_paths_missing_loudness(self, root):
+        """Get (path, duration) of songs never analyzed or changed since"""
+        conn = self._connect()
+        return conn.execute(
+            """SELECT s.path, m.duration FROM songs s
+               LEFT JOIN loudness l ON l.path = s.path
+               LEFT JOIN metadata m ON m.path = s.path
+               WHERE s.path >= ? AND s.path < ? AND (l.path IS NULL OR l.mtime_ns != s.mtime_ns OR l.size != s.size)""",
+            self._path_range(root)
+        ).fetchall()
+
+    def save_loudness(self, results):
+        """Store (path, mtime_ns, size, integrated, peak) tuples"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO loudness (path, mtime_ns, size, integrated, peak) VALUES (?, ?, ?, ?, ?)",
+                results
+            )
+
+    def get_paths_missing_features(self, root):
+        """Get (path, duration) of songs without audio features or changed since"""
+        conn = self._connect()
+        return conn.execute(
+            """SELECT s.path, m.duration FROM songs s
+               LEFT JOIN features f ON f.path = s.path
+               LEFT JOIN metadata m ON m.path = s.path
+               WHERE s.path >= ? AND s.path < ? AND (f.path IS NULL OR f.mtime_ns != s.mtime_ns OR f.size != s.size)""",
+            self._path_range(root)
+        ).fetchall()
+
+    def save_features(self, results):
+        """Store (path, mtime_ns, size, features, emotion, confidence) tuples"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO features (path, mtime_ns, size, %s, emotion, confidence) VALUES (?, ?, ?, %s, ?, ?)" % (
+                    ", ".join(self.FEATURE_COLUMNS), ", ".join("?" * len(self.FEATURE_COLUMNS))
+                ),
+                [
+                    (path, mtime_ns, size) + tuple((features or {}).get(column) for column in self.FEATURE_COLUMNS)
+                    + (emotion, confidence)
+                    for path, mtime_ns, size, features, emotion, confidence in results
+                ]
+            )
+
+    def get_vector_rows(self):
+        """Get (id, tempo, pulse, centroid, energy, mode, loudness, duration) of every analyzed song"""
+        conn = self._connect()
+        columns = ", ".join(f"f.{column}" for column in self.FEATURE_COLUMNS)
+        return conn.execute(
+            f"""SELECT s.id, {columns}, l.integrated, m.duration FROM songs s
+                JOIN features f ON f.path = s.path
+                LEFT JOIN loudness l ON l.path = s.path
+                LEFT JOIN metadata m ON m.path = s.path
+                WHERE f.tempo IS NOT NULL"""
+        ).fetchall()
+
+    def get_directories(self, root):
+        """Get the paths of the indexed directories of a library folder"""
+        conn = self._connect()
+        return [row[0] for row in conn.execute(
+            "SELECT path FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+            (root,) + self._path_range(root)
+        )]
+
+    def refresh(self, root, cancel_event=None, on_added=None, on_removed=None, directories=None):
+        """Bring the index for a library folder up to date with the filesystem.
+
+        Only directories whose mtime changed are listed again, and only files
+        in those directories that were added, removed or changed in size or
+        mtime are written. `on_added` is called with the (id, path, title) rows
+        of new songs after each directory and `on_removed` with the paths of
+        songs that are gone. Returns a dict of change counts.
+
+        Every directory is committed as soon as it is listed, so an interrupted
+        scan keeps what it found. A directory's mtime is only stored once its
+        whole subtree has been scanned; until then the next refresh lists it
+        again and finds the subdirectories a cancelled scan did not get to.
+
+        With `directories` (e.g. the ones a file watcher saw change) only those
+        are listed, whatever their mtime, plus subdirectories new to the
+        index; the rest of the folder is not touched.
+        """
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'dirs_scanned': 0, 'cancelled': False}
+        conn = self._connect()
+
+        # Snapshot of what the index knows about this folder
+        known_dirs = {}
+        children = {}
+        for path, mtime_ns in conn.execute(
+            "SELECT path, mtime_ns FROM directories WHERE path = ? OR (path >= ? AND path < ?)",
+            (root,) + self._path_range(root)
+        ):
+            known_dirs[path] = mtime_ns
+            if path != root:
+                children.setdefault(os.path.dirname(path), []).append(path)
+
+        seen_dirs = set()
+        if directories is None:
+            stack = [root]
+        else:
+            targets = set(directories)
+            stack = [
+                directory for directory in targets
+                if directory == root or directory.startswith(os.path.join(root, ""))
+            ]
+            gone_dirs = set()
+
+        # Directories whose subtree is still being scanned: {path: [mtime_ns to
+        # store or None, subdirectories not done yet]}
+        pending = {}
+        done_dirs = set()
+
+        def finish(directory):
+            """Store a directory whose subtree is done, then check its parent"""
+            while True:
+                mtime_ns, waiting = pending[directory]
+                if waiting:
+                    return
+                del pending[directory]
+                done_dirs.add(directory)
+                parent = os.path.dirname(directory) if directory != root else None
+                if mtime_ns is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO directories (path, root, parent, mtime_ns) VALUES (?, ?, ?, ?)",
+                        (directory, root, parent, mtime_ns)
+                    )
+                    conn.commit()
+                if parent not in pending:
+                    return
+                pending[parent][1].discard(directory)
+                directory = parent
+
+        def wait_for(directory, mtime_ns, subdirectories):
+            pending[directory] = [mtime_ns, {path for path in subdirectories if path not in done_dirs}]
+            finish(directory)
+
+        with conn:
+            while stack:
+                if cancel_event is not None and cancel_event.is_set():
+                    stats['cancelled'] = True
+                    break
+
+                directory = stack.pop()
+                if directory in seen_dirs:
+                    continue
+                seen_dirs.add(directory)
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    if directories is not None and directory in known_dirs:
+                        gone_dirs.add(directory)
+                    wait_for(directory, None, ())
+                    continue
+
+                # Unchanged directory: trust the index and descend into known children
+                if known_dirs.get(directory) == mtime_ns:
+                    if directories is None:
+                        stack.extend(children.get(directory, ()))
+                        wait_for(directory, None, children.get(directory, ()))
+                        continue
+                    if directory not in targets:
+                        wait_for(directory, None, ())
+                        continue
+
+                stats['dirs_scanned'] += 1
+                listed = len(stack)
+                result = self._rescan_directory(conn, root, directory, stack, stats)
+                if result is None:
+                    # Not listed: keep the old mtime so the next refresh tries again
+                    del stack[listed:]
+                    known = children.get(directory, ()) if directories is None else ()
+                    stack.extend(known)
+                    wait_for(directory, None, known)
+                    continue
+                added, removed = result
+                subdirectories = stack[listed:]
+                if directories is not None:
+                    # Known subdirectories that were not listed are gone
+                    gone_dirs.update(child for child in children.get(directory, ()) if child not in subdirectories)
+                conn.commit()
+                if removed and on_removed is not None:
+                    on_removed(removed)
+                if added and on_added is not None:
+                    on_added([
+                        row for row in conn.execute(
+                            "SELECT id, path, title FROM songs WHERE directory = ?", (directory,)
+                        )
+                        if row[1] in added
+                    ])
+                wait_for(directory, mtime_ns, subdirectories)
+
+            # Directories that vanished since the last scan take their songs with them
+            if not stats['cancelled']:
+                if directories is None:
+                    gone = [(path,) for path in known_dirs if path not in seen_dirs]
+                else:
+                    # Everything below a vanished directory went with it
+                    pending_gone = list(gone_dirs)
+                    while pending_gone:
+                        for child in children.get(pending_gone.pop(), ()):
+                            if child not in gone_dirs:
+                                gone_dirs.add(child)
+                                pending_gone.append(child)
+                    gone = [(path,) for path in gone_dirs]
+                if gone:
+                    if on_removed is not None:
+                        removed = [
+                            row[0] for path in gone
+                            for row in conn.execute("SELECT path FROM songs WHERE directory = ?", path)
+                        ]
+                        if removed:
+                            on_removed(removed)
+                    for table in self.SONG_TABLES:
+                        conn.executemany(
+                            f"DELETE FROM {table} WHERE path IN (SELECT path FROM songs WHERE directory = ?)", gone
+                        )
+                    cursor = conn.executemany("DELETE FROM songs WHERE directory = ?", gone)
+                    stats['removed'] += max(cursor.rowcount, 0)
+                    conn.executemany("DELETE FROM directories WHERE path = ?", gone)
+
+        if directories is None or stats['dirs_scanned']:
+            print(f"Library index refresh for {root}: {stats}")
+        return stats
+
+    def _rescan_directory(self, conn, root, directory, stack, stats):
+        """List one changed directory and apply the file-level differences.
+
+        Returns the set of added paths and the list of removed ones, or None
+        when the directory could not be listed.
+        """
+        indexed = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in conn.execute(
+                "SELECT path, mtime_ns, size FROM songs WHERE directory = ?", (directory,)
+            )
+        }
+
+        upserts = []
+        added = set()
+        present = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            # Match os.walk, which does not follow directory symlinks
+                            if not entry.is_symlink():
+                                stack.append(entry.path)
+                            continue
+                        if not entry.name.lower().endswith(self.supported_formats):
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+
+                    present.add(entry.path)
+                    previous = indexed.get(entry.path)
+                    if previous == (st.st_mtime_ns, st.st_size):
+                        continue
+                    if previous is None:
+                        stats['added'] += 1
+                        added.add(entry.path)
+                    else:
+                        stats['updated'] += 1
+                    upserts.append((
+                        entry.path, root, directory, os.path.splitext(entry.name)[0],
+                        st.st_mtime_ns, st.st_size
+                    ))
+        except OSError as e:
+            print(f"Error scanning {directory}: {e}")
+            return None
+
+        if upserts:
+            conn.executemany(
+                """INSERT INTO songs (path, root, directory, title, mtime_ns, size)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(path) DO UPDATE SET
+                       root = excluded.root,
+                       directory = excluded.directory,
+                       title = excluded.title,
+                       mtime_ns = excluded.mtime_ns,
+                       size = excluded.size""",
+                upserts
+            )
+
+        removed = [path for path in indexed if path not in present]
+        if removed:
+            conn.executemany("DELETE FROM songs WHERE path = ?", [(path,) for path in removed])
+            for table in self.SONG_TABLES:
+                conn.executemany(f"DELETE FROM {table} WHERE path = ?", [(path,) for path in removed])
+            stats['removed'] += len(removed)
+
+        return added, removed
+
+
+class FolderScan:
+    """Background scan of a library folder that streams songs to the UI thread.
+
+    The worker first streams the songs already in the index, so a known library
+    becomes playable immediately, then runs an incremental refresh and streams
+    newly discovered songs directory by directory. Messages are put on `queue`
+    as (kind, payload) tuples:
+
+        ('songs', rows)  - (id, path, title) rows to append
+        ('done', rows)   - final sorted rows when the refresh changed anything, else None
+        ('error', str)   - the scan failed
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, library_index, folder_path):
+        self.library_index = library_index
+        self.folder_path = folder_path
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        """Ask the worker to stop; pending messages should be ignored"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def _put_batches(self, rows):
+        for start in range(0, len(rows), self.BATCH_SIZE):
+            if self.cancelled:
+                return
+            self.queue.put(('songs', rows[start:start + self.BATCH_SIZE]))
+
+    def _run(self):
+        try:
+            # Songs the index already knows about are playable right away
+            self._put_batches(self.library_index.get_songs(self.folder_path))
+
+            # Stream songs found by the refresh as each directory is written
+            stats = self.library_index.refresh(
+                self.folder_path,
+                cancel_event=self.cancel_event,
+                on_added=self._put_batches
+            )
+            if self.cancelled:
+                return
+
+            changed = stats['added'] or stats['updated'] or stats['removed']
+            final_rows = self.library_index.get_songs(self.folder_path) if changed else None
+            self.queue.put(('done', final_rows))
+
+        except Exception as e:
+            print(f"Error scanning folder: {e}")
+            self.queue.put(('error', str(e)))
+        finally:
+            self.library_index.close()
@@ -0,0 +1,152 @@
+import os
+import numpy as np
+from audio_decode import init_decoder, decode_track, known_duration
+from pool_job import PoolJob
+
+# ReplayGain 2.0 reference level
+TARGET_LOUDNESS = -18.0
+
+# Decoding rate of the analysis workers; K-weighting only cuts below 100 Hz
+# and lifts above 1.5 kHz, so 22.05 kHz keeps what matters for loudness
+SAMPLE_RATE = 22050
+
+# Longer songs are skipped so a worker never holds more than
+# MAX_SECONDS * SAMPLE_RATE * 2 channels * 2 bytes of decoded audio (~250 MB)
+MAX_SECONDS = 50 * 60
+
+# BS.1770 gating blocks are 400 ms long and start every 100 ms, so the power
+# of each block is the mean of four 100 ms sub-blocks
+SUB_BLOCK_SECONDS = 0.1
+# Sub-blocks converted and transformed at once (one minute of audio)
+CHUNK_SUB_BLOCKS = 600
+
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+
+# BS.1770 K-weighting biquads at 48 kHz (high shelf, then high pass) as (b, a)
+K_WEIGHTING_48K = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621))
+)
+
+def k_weighting(n_fft, sample_rate):
+    """Power response of the K-weighting filter at the rfft bins of n_fft samples.
+
+    The reference biquads are defined at 48 kHz; every bin below 24 kHz is
+    evaluated on that filter, so the weighting holds at any rate up to 48 kHz
+    without designing new coefficients.
+    """
+    freqs = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+    z = np.exp(-2j * np.pi * freqs / 48000)  # z^-1 of the reference filter
+    response = np.ones_like(z)
+    for b, a in K_WEIGHTING_48K:
+        response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    weights = np.abs(response) ** 2
+
+    # Parseval for a one-sided spectrum: every bin but DC and Nyquist counts twice
+    weights[1:] *= 2
+    if n_fft % 2 == 0:
+        weights[-1] /= 2
+    return (weights / (n_fft * n_fft)).astype(np.float32)
+
+def measure_loudness(samples, sample_rate):
+    """Integrated loudness in LUFS and sample peak (0-1) of int16 (samples, channels).
+
+    The K-weighted mean square of every 100 ms sub-block comes from its FFT,
+    one chunk of sub-blocks at a time, so temporary arrays stay a minute long.
+    Loudness is None for silence or songs shorter than one gating block.
+    """
+    peak = max(int(samples.max()), -int(samples.min())) / 32768 if len(samples) else 0.0
+
+    hop = int(sample_rate * SUB_BLOCK_SECONDS)
+    sub_blocks = len(samples) // hop
+    if sub_blocks < 4:
+        return None, peak
+
+    weights = k_weighting(hop, sample_rate)
+    powers = np.empty(sub_blocks)
+    for start in range(0, sub_blocks, CHUNK_SUB_BLOCKS):
+        stop = min(start + CHUNK_SUB_BLOCKS, sub_blocks)
+        chunk = samples[start * hop:stop * hop].astype(np.float32) / 32768
+        spectrum = np.fft.rfft(chunk.reshape(stop - start, hop, -1), axis=1)
+        # Sum over bins and channels (all channel weights are 1 for stereo)
+        powers[start:stop] = np.einsum('bfc,f->b', spectrum.real ** 2 + spectrum.imag ** 2, weights)
+
+    blocks = (powers[:-3] + powers[1:-2] + powers[2:-1] + powers[3:]) / 4
+    gated = blocks[blocks > 10 ** ((ABSOLUTE_GATE + 0.691) / 10)]
+    if not len(gated):
+        return None, peak
+    gated = gated[gated > gated.mean() * 10 ** (RELATIVE_GATE / 10)]
+    return float(-0.691 + 10 * np.log10(gated.mean())), peak
+
+def track_gain(loudness, peak):
+    """Linear gain that brings a song to TARGET_LOUDNESS without clipping its peak"""
+    gain = 10 ** ((TARGET_LOUDNESS - loudness) / 20)
+    if peak:
+        gain = min(gain, 1 / peak)
+    return gain
+
+def analyze_loudness_batch(songs):
+    """Measure a batch of (path, duration) songs; runs in a decoder worker process.
+
+    Returns (path, mtime_ns, size, loudness, peak) tuples. Songs that cannot
+    be decoded, are too long or have no known length get None, so they are
+    not retried until they change.
+    """
+    results = []
+    for song_path, duration in songs:
+        try:
+            st = os.stat(song_path)
+        except OSError:
+            continue
+        loudness = peak = None
+        duration = known_duration(song_path, duration)
+        if duration is None:
+            print(f"Skipping loudness analysis of {song_path}: unknown length")
+        elif duration > MAX_SECONDS:
+            print(f"Skipping loudness analysis of {song_path}: {duration / 60:.0f} minutes long")
+        else:
+            try:
+                samples, sample_rate = decode_track(song_path)
+                loudness, peak = measure_loudness(samples, sample_rate)
+                del samples
+            except Exception as e:
+                print(f"Error analyzing loudness of {song_path}: {e}")
+        results.append((song_path, st.st_mtime_ns, st.st_size, loudness, peak))
+    return results
+
+
+class LoudnessAnalyzer(PoolJob):
+    """Measure the loudness of a library folder on low priority worker processes.
+
+    Every song is decoded once; the result is stored in the library index
+    after each batch, so a cancelled or interrupted analysis resumes where it
+    stopped. Gains already in the index are put on `queue` first, then every
+    finished batch, both as ('gains', {path: linear gain}); ('done', count)
+    follows the last batch.
+    """
+
+    BATCH_SIZE = 4
+    WORKER = staticmethod(analyze_loudness_batch)
+    DESCRIPTION = "analyzing loudness"
+    INITIALIZER = staticmethod(init_decoder)
+    INITARGS = (SAMPLE_RATE, 2)
+
+    def __init__(self, library_index, folder_path, max_workers=None):
+        # Half the cores: this runs while music plays
+        super().__init__(library_index, folder_path, max_workers or max(1, (os.cpu_count() or 2) // 2))
+
+    def get_pending(self):
+        self.queue.put(('gains', {
+            path: track_gain(loudness, peak)
+            for path, (loudness, peak) in self.library_index.get_loudness(self.folder_path).items()
+        }))
+        return self.library_index.get_paths_missing_loudness(self.folder_path)
+
+    def store(self, results):
+        self.library_index.save_loudness(results)
+        self.queue.put(('gains', {
+            path: track_gain(loudness, peak)
+            for path, _, _, loudness, peak in results
+            if loudness is not None
+        }))
@@ -2,7 +2,8 @@ import customtkinter as ctk
 import tkinter as tk
 import os
 import shutil
-import json
+import time
+import multiprocessing
 from tkinter import messagebox
 from player import MusicPlayer
 from playlist import PlaylistManager
@@ -11,11 +12,12 @@ from settings import SettingsManager
 from emotion_manager import EmotionManager
 from language_manager import LanguageManager
 from ui import PlayerUI
-from camera_manager import CameraManager
 
 class MusicPlayerApp:
     def __init__(self):
         try:
+            start = time.perf_counter()
+            
             # Set up the application
             ctk.set_appearance_mode("dark")
             ctk.set_default_color_theme("dark-blue")
@@ -32,44 +34,56 @@ class MusicPlayerApp:
             self.settings_manager = SettingsManager()
             self.emotion_manager = EmotionManager()
             self.language_manager = LanguageManager()
-            self.playlist_manager = PlaylistManager()
             self.history_manager = HistoryManager()
+            self.playlist_manager = PlaylistManager(self.history_manager)
             self.player = MusicPlayer(self.playlist_manager, self.history_manager)
             
             # Initialize UI
             self.ui = PlayerUI(self.root, self.player, self.playlist_manager, 
                              self.history_manager, self.settings_manager, 
                              self.emotion_manager, self.language_manager)
+            print(f"Startup took {(time.perf_counter() - start) * 1000:.0f} ms")
+            
+            # Face detection is only needed for the camera; import OpenCV and
+            # load its cascades once the window is up instead of before it
+            self.root.after(1000, self.emotion_manager.warm_up)
             
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
             
     def run(self):
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self.root.mainloop()
         
+    def _on_close(self):
+        """Flush write-behind state before the window goes away"""
+        # Background jobs resume from the library index on the next start
+        self.playlist_manager.cancel_folder_watch()
+        self.playlist_manager.cancel_metadata_ingest()
+        self.playlist_manager.cancel_loudness_analysis()
+        self.playlist_manager.cancel_auto_tagging()
+        try:
+            self.settings_manager.close()
+        except Exception as e:
+            print(f"Error saving settings on exit: {e}")
+        self.root.destroy()
+        
     def _create_data_folders(self):
         """Create necessary Data folder structure"""
         try:
             # Use path_utils to get directory paths
-            from path_utils import get_data_directory, get_languages_directory, get_temp_image_directory, get_emotions_file_path
+            from path_utils import get_data_directory, get_languages_directory, get_temp_image_directory
             
             # Get directory paths
             data_dir = get_data_directory()
             languages_dir = get_languages_directory()
             temp_image_dir = get_temp_image_directory()
-            emotions_file = get_emotions_file_path()
             
             # Create directories if they don't exist
             os.makedirs(data_dir, exist_ok=True)
             os.makedirs(languages_dir, exist_ok=True)
             os.makedirs(temp_image_dir, exist_ok=True)
             
-            # Create emotions.json file if it doesn't exist
-            if not os.path.exists(emotions_file):
-                with open(emotions_file, 'w') as f:
-                    json.dump({}, f, indent=4)
-                print(f"Created emotions file at {emotions_file}")
-            
             # Copy language files if they don't exist in Data/Languages
             # For PyInstaller, the languages folder is included in the executable directory
             import sys
@@ -92,5 +106,7 @@ class MusicPlayerApp:
             messagebox.showerror("Error", f"Failed to create Data folders: {e}")
 
 if __name__ == "__main__":
+    # Metadata extraction uses a process pool, which needs this in frozen builds
+    multiprocessing.freeze_support()
     app = MusicPlayerApp()
     app.run()
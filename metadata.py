@@ -0,0 +1,86 @@
+import os
+from pool_job import PoolJob
+
+def _first_tag(tags, key):
+    """Get the first value of a tag from an easy tag mapping"""
+    try:
+        values = tags.get(key) if tags is not None else None
+    except Exception:
+        return None
+    if not values:
+        return None
+    value = values[0] if isinstance(values, list) else values
+    return str(value).strip() or None
+
+def _parse_gain(value):
+    """Parse a ReplayGain value such as '-6.54 dB' or '0.98765'"""
+    if value is None:
+        return None
+    try:
+        return float(value.lower().replace('db', '').strip())
+    except ValueError:
+        return None
+
+def read_metadata(song_path):
+    """Read tags and stream info for one audio file with mutagen"""
+    # Imported here so the UI process only loads mutagen when it needs it
+    from mutagen import File as MutagenFile
+    audio = MutagenFile(song_path, easy=True)
+    if audio is None:
+        raise ValueError(f"Unsupported audio file: {song_path}")
+
+    info = audio.info
+    tags = audio.tags
+    metadata = {
+        'artist': _first_tag(tags, 'artist'),
+        'album': _first_tag(tags, 'album'),
+        'duration': float(getattr(info, 'length', 0.0) or 0.0),
+        'bitrate': int(getattr(info, 'bitrate', 0) or 0),
+        'track_gain': _parse_gain(_first_tag(tags, 'replaygain_track_gain')),
+        'track_peak': _parse_gain(_first_tag(tags, 'replaygain_track_peak'))
+    }
+    return {key: value for key, value in metadata.items() if value is not None}
+
+def read_metadata_batch(song_paths):
+    """Read metadata for a batch of files; runs in a worker process.
+
+    Returns (path, mtime_ns, size, metadata) tuples. Files that cannot be
+    parsed get empty metadata so they are not retried until they change.
+    """
+    results = []
+    for song_path in song_paths:
+        try:
+            st = os.stat(song_path)
+        except OSError:
+            continue
+        try:
+            metadata = read_metadata(song_path)
+        except Exception as e:
+            print(f"Error reading metadata for {song_path}: {e}")
+            metadata = {}
+        results.append((song_path, st.st_mtime_ns, st.st_size, metadata))
+    return results
+
+
+class MetadataIngestor(PoolJob):
+    """Extract metadata for a library folder on a process pool.
+
+    Paths without up-to-date metadata are read from the library index and sent
+    to the pool in fixed-size batches (see PoolJob). The metadata already in
+    the index is put on `queue` first, then every finished batch is written to
+    the index and queued, both as ('metadata', {path: metadata}); ('done', count)
+    follows the last batch.
+    """
+
+    BATCH_SIZE = 64
+    WORKER = staticmethod(read_metadata_batch)
+    DESCRIPTION = "extracting metadata"
+
+    def get_pending(self):
+        # Cached metadata is usable right away
+        self.queue.put(('metadata', self.library_index.get_metadata(self.folder_path)))
+        return self.library_index.get_paths_missing_metadata(self.folder_path)
+
+    def store(self, results):
+        self.library_index.save_metadata(results)
+        self.queue.put(('metadata', {path: metadata for path, _, _, metadata in results}))
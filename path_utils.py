@@ -58,4 +58,32 @@ def get_emotions_file_path():
     Returns:
         str: The emotions.json file path
     """
-    return os.path.join(get_data_directory(), "emotions.json")
\ No newline at end of file
+    return os.path.join(get_data_directory(), "emotions.json")
+
+def get_library_index_path():
+    """
+    Get the library.db file path within the Data directory.
+    
+    Returns:
+        str: The library index database path
+    """
+    return os.path.join(get_data_directory(), "library.db")
+
+
+def get_tag_store_path():
+    """
+    Get the tags.db file path within the Data directory.
+    
+    Returns:
+        str: The emotion tag store database path
+    """
+    return os.path.join(get_data_directory(), "tags.db")
+
+def get_song_vectors_path():
+    """
+    Get the song_vectors.npy file path within the Data directory.
+    
+    Returns:
+        str: The song feature vector matrix path
+    """
+    return os.path.join(get_data_directory(), "song_vectors.npy")
@@ -0,0 +1,191 @@
+import random
+import numpy as np
+from collections import deque
+
+class PlayQueue:
+    """Order in which the library is played, with O(1) next and previous.
+
+    Songs are identified by path, like everywhere else in the player. `paths`
+    holds the library order and `positions` maps a path to its index there;
+    `order` is the play order as indexes into `paths` (a precomputed
+    permutation while shuffling) and `slots` is its inverse, so the current
+    song is found without scanning. Songs inserted with play_next() are
+    played before the order continues, and previous() walks back through the
+    songs actually played.
+    """
+
+    REPEAT_OFF = 'off'
+    REPEAT_ALL = 'all'
+    REPEAT_ONE = 'one'
+    REPEAT_MODES = (REPEAT_OFF, REPEAT_ALL, REPEAT_ONE)
+
+    HISTORY_LIMIT = 200
+
+    def __init__(self):
+        self.paths = []
+        self.positions = {}  # path -> index in paths
+        self.order = []      # slot -> index in paths
+        self.slots = []      # index in paths -> slot
+        self.cursor = -1     # slot of the last song played from the order
+        self.shuffle = False
+        self.repeat = self.REPEAT_OFF
+        self.up_next = deque()
+        self.history = deque(maxlen=self.HISTORY_LIMIT)
+        self._current = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def set_songs(self, song_paths):
+        """Replace the library, keeping the current song and history"""
+        self.paths = list(song_paths)
+        self.positions = {song_path: index for index, song_path in enumerate(self.paths)}
+        self.up_next = deque(p for p in self.up_next if p in self.positions)
+        self._build_order()
+
+    def append(self, song_paths):
+        """Add songs at the end of the library, e.g. while a folder is scanned"""
+        for song_path in song_paths:
+            if song_path in self.positions:
+                continue
+            index = len(self.paths)
+            self.paths.append(song_path)
+            self.positions[song_path] = index
+            self.order.append(index)
+            self.slots.append(index)
+            if self.shuffle and self.cursor + 1 < index:
+                # Swap into a random slot that has not been played yet
+                self._swap(index, random.randint(self.cursor + 1, index))
+
+    def remove(self, song_paths):
+        """Drop songs that left the library, keeping the order of the rest"""
+        removed = np.array(sorted(self.positions[p] for p in set(song_paths) if p in self.positions), dtype=np.int64)
+        if not len(removed):
+            return
+
+        # Every index after a removed one moves down by one per removed index before it
+        order = np.array(self.order, dtype=np.int64)
+        kept = ~np.isin(order, removed)
+        played = int(kept[:self.cursor + 1].sum())
+        order = order[kept] - np.searchsorted(removed, order[kept])
+        self.order = order.tolist()
+        slots = np.empty(len(order), dtype=np.int64)
+        slots[order] = np.arange(len(order))
+        self.slots = slots.tolist()
+        self.cursor = played - 1
+
+        first = int(removed[0])
+        gone = {self.paths[index] for index in removed.tolist()}
+        for song_path in gone:
+            del self.positions[song_path]
+        self.paths = [song_path for song_path in self.paths if song_path not in gone]
+        for index in range(first, len(self.paths)):
+            self.positions[self.paths[index]] = index
+        self.up_next = deque(p for p in self.up_next if p not in gone)
+
+    def _swap(self, slot_a, slot_b):
+        order = self.order
+        order[slot_a], order[slot_b] = order[slot_b], order[slot_a]
+        self.slots[order[slot_a]] = slot_a
+        self.slots[order[slot_b]] = slot_b
+
+    def _build_order(self):
+        """Recompute the play order with the current song in its place"""
+        self.order = list(range(len(self.paths)))
+        current_index = self.positions.get(self._current)
+        if self.shuffle:
+            random.shuffle(self.order)
+            if current_index is not None:
+                # Start the permutation with the current song
+                first = self.order.index(current_index)
+                self.order[0], self.order[first] = self.order[first], self.order[0]
+        self.slots = [0] * len(self.order)
+        for slot, index in enumerate(self.order):
+            self.slots[index] = slot
+        self.cursor = self.slots[current_index] if current_index is not None else -1
+
+    def current(self):
+        return self._current
+
+    def set_current(self, song_path):
+        """Make song_path the current song, e.g. when it was picked by hand"""
+        if song_path == self._current:
+            return
+        if self._current is not None:
+            self.history.append(self._current)
+        self._current = song_path
+        index = self.positions.get(song_path)
+        if index is not None:
+            self.cursor = self.slots[index]
+
+    def _next_slot(self):
+        if self.cursor + 1 < len(self.order):
+            return self.cursor + 1
+        if self.repeat == self.REPEAT_ALL and self.order:
+            return 0
+        return None
+
+    def peek_next(self):
+        """Get the song that plays when the current one ends, without moving.
+
+        This is the song next() would return, except that repeat-one plays
+        the current song again; next() is a skip and always moves on.
+        """
+        if self.repeat == self.REPEAT_ONE and self._current is not None:
+            return self._current
+        if self.up_next:
+            return self.up_next[0]
+        slot = self._next_slot()
+        return self.paths[self.order[slot]] if slot is not None else None
+
+    def next(self):
+        """Move to the next song and return its path, or None at the end"""
+        if self.up_next:
+            # Queued songs play outside the order, which goes on from the cursor
+            song_path = self.up_next.popleft()
+            cursor = self.cursor
+            self.set_current(song_path)
+            self.cursor = cursor
+            return song_path
+        slot = self._next_slot()
+        if slot is None:
+            return None
+        song_path = self.paths[self.order[slot]]
+        self.set_current(song_path)
+        self.cursor = slot
+        return song_path
+
+    def previous(self):
+        """Go back to the song played before the current one"""
+        while self.history:
+            song_path = self.history.pop()
+            if song_path in self.positions:
+                self._current = song_path
+                self.cursor = self.slots[self.positions[song_path]]
+                return song_path
+        # Nothing played before in this session: step back in the order
+        if self.cursor > 0:
+            self.cursor -= 1
+            self._current = self.paths[self.order[self.cursor]]
+            return self._current
+        return None
+
+    def play_next(self, song_path):
+        """Play song_path after the current song, before the order continues"""
+        if song_path in self.positions:
+            self.up_next.append(song_path)
+
+    def set_shuffle(self, shuffle):
+        if shuffle != self.shuffle:
+            self.shuffle = shuffle
+            self._build_order()
+
+    def set_repeat(self, repeat):
+        if repeat in self.REPEAT_MODES:
+            self.repeat = repeat
+
+    def cycle_repeat(self):
+        """Switch to the next repeat mode and return it"""
+        index = self.REPEAT_MODES.index(self.repeat)
+        self.repeat = self.REPEAT_MODES[(index + 1) % len(self.REPEAT_MODES)]
+        return self.repeat
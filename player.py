@@ -1,9 +1,133 @@
+import io
+import os
+import sys
 import pygame
-from mutagen.mp3 import MP3
 import time
 import threading
 
+class TrackPrefetch:
+    """Read the next song off disk on a worker thread.
+
+    Songs up to max_bytes are read into memory, so the mixer can decode them
+    without touching a slow (e.g. network) disk at the track change. Larger
+    songs only have their first head_bytes read to warm the OS cache.
+    """
+
+    def __init__(self, song, max_bytes, head_bytes):
+        self.song = song
+        self.data = None
+        self.elapsed = 0.0
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(max_bytes, head_bytes), daemon=True)
+        self.thread.start()
+
+    def _run(self, max_bytes, head_bytes):
+        start = time.perf_counter()
+        song_path = self.song['path']
+        try:
+            with open(song_path, 'rb') as f:
+                if os.path.getsize(song_path) <= max_bytes:
+                    self.data = f.read()
+                else:
+                    f.read(head_bytes)
+        except OSError as e:
+            print(f"Error prefetching {song_path}: {e}")
+        self.elapsed = time.perf_counter() - start
+        self.ready.set()
+
+    def source(self):
+        """Get a fresh file object for the mixer, or the path if not in memory"""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return self.song['path']
+
+
+def _audio_data_offset(f):
+    """Get the size of the ID3v2 tag at the start of an MP3 file, if any"""
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    # Syncsafe integer: 7 bits per byte
+    size = ((header[6] & 0x7f) << 21) | ((header[7] & 0x7f) << 14) | ((header[8] & 0x7f) << 7) | (header[9] & 0x7f)
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+class PositionTracker:
+    """Position in the current song that survives seeks, pauses and resumes.
+
+    pygame.mixer.music.get_pos() only counts the milliseconds played since
+    the last play(): it restarts at 0 after play(start=...), after a byte seek
+    and when a queued song starts. The tracker remembers that get_pos()
+    `origin` corresponds to `base` seconds into the song, and holds the
+    position still while paused or stopped.
+    """
+
+    def __init__(self):
+        self.base = 0.0
+        self.origin = 0
+        self.running = False
+
+    def start(self, base=0.0, origin=0):
+        """The mixer is playing from base seconds; get_pos() reads origin now"""
+        self.base = base
+        self.origin = origin
+        self.running = True
+
+    def freeze(self):
+        self.base = self.position()
+        self.running = False
+
+    def resume(self):
+        self.start(self.base, max(pygame.mixer.music.get_pos(), 0))
+
+    def reset(self):
+        self.base = 0.0
+        self.running = False
+
+    def position(self):
+        if not self.running:
+            return self.base
+        pos = pygame.mixer.music.get_pos()
+        return self.base + max(pos - self.origin, 0) / 1000
+
+
 class MusicPlayer:
+    """Playback on pygame.mixer.music with gapless track changes.
+
+    next_song_provider(current_path) predicts the song after the current one.
+    That song is prefetched on a worker thread and handed to
+    pygame.mixer.music.queue, so the mixer opens its decoder ahead of time and
+    starts it the moment the current song ends.
+
+    The mixer posts END_EVENT whenever a song ends (except on macOS, where
+    song ends are read from get_busy() and get_pos()). poll() must be called from
+    the UI thread every POLL_INTERVAL_MS; it drains those events and reports
+    what happened to the callbacks registered with subscribe():
+
+        TRACK_CHANGED(song_path, song_title)  a song started playing
+        TRACK_ENDED(song_path)                the last song ended, nothing follows
+        POSITION_CHANGED(seconds, length)     once per poll while playing
+        ERROR(song_path, message)             a song could not be played
+    """
+
+    POLL_INTERVAL_MS = 100
+    PREFETCH_MAX_BYTES = 64 * 1024 * 1024
+    PREFETCH_HEAD_BYTES = 1024 * 1024
+
+    # Reopened at a byte offset to seek: play(start=...) makes the decoder
+    # index every frame before the target, which is slow on long files and
+    # network drives
+    BYTE_SEEK_FORMATS = ('mp3',)
+
+    END_EVENT = pygame.USEREVENT + 1
+
+    # Callback events
+    TRACK_CHANGED = 'track_changed'
+    TRACK_ENDED = 'track_ended'
+    POSITION_CHANGED = 'position_changed'
+    ERROR = 'error'
+
     def __init__(self, playlist_manager, history_manager):
         pygame.mixer.init()
         self.playlist_manager = playlist_manager
@@ -12,68 +136,302 @@ class MusicPlayer:
         self.current_song_title = None
         self.paused = False
         self.volume = 0.5
+        # Per-song loudness normalization from the library's loudness analysis
+        self.normalize = True
+        self._track_gain = 1.0
         pygame.mixer.music.set_volume(self.volume)
         self.playing = False
-        self._position = 0
-        
+        self.position_tracker = PositionTracker()
+
+        # Gapless playback state
+        self.next_song_provider = None
+        self._prefetch = None
+        self._queued_song = None
+        self._current_source = None  # The mixer reads from this while playing
+        self._queued_source = None
+        self._last_pos = 0
+        self.gapless_transitions = 0
+        self.cold_transitions = 0
+
+        self._listeners = {
+            self.TRACK_CHANGED: [],
+            self.TRACK_ENDED: [],
+            self.POSITION_CHANGED: [],
+            self.ERROR: []
+        }
+        self._song_length = None
+        self._end_events = self._init_end_event()
+
+    def _init_end_event(self):
+        """Have the mixer post END_EVENT when a song ends, if events are available"""
+        if sys.platform == 'darwin':
+            # SDL's Cocoa video init sets up its own NSApplication, which can
+            # clash with Tk's in the same process; poll() watches get_busy()
+            # and get_pos() instead
+            return False
+        try:
+            # The event queue lives in SDL's video subsystem; no window is opened
+            pygame.display.init()
+            pygame.event.set_blocked(None)
+            pygame.event.set_allowed(self.END_EVENT)
+            pygame.mixer.music.set_endevent(self.END_EVENT)
+            return True
+        except pygame.error as e:
+            # poll() falls back to watching get_busy() and get_pos()
+            print(f"Song end events unavailable: {e}")
+            return False
+
+    def subscribe(self, event, callback):
+        """Call callback(*args) whenever the player reports event"""
+        self._listeners[event].append(callback)
+
+    def unsubscribe(self, event, callback):
+        if callback in self._listeners[event]:
+            self._listeners[event].remove(callback)
+
+    def _emit(self, event, *args):
+        for callback in list(self._listeners[event]):
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in {event} callback: {e}")
+
+    def _clear_end_events(self):
+        if self._end_events:
+            pygame.event.clear(self.END_EVENT)
+
+    @staticmethod
+    def _namehint(song_path):
+        return os.path.splitext(song_path)[1].lstrip('.').lower()
+
+    def _source_for(self, song_path):
+        """Use prefetched data for song_path if it is ready"""
+        prefetch = self._prefetch
+        if prefetch is not None and prefetch.song['path'] == song_path and prefetch.ready.is_set():
+            return prefetch.source()
+        return song_path
+
     def play(self, song_path=None, song_title=None):
         if song_path:
             try:
-                pygame.mixer.music.load(song_path)
+                source = self._source_for(song_path)
+                pygame.mixer.music.load(source, self._namehint(song_path))
+                self._apply_track_gain(song_path)
                 pygame.mixer.music.play()
-                self.current_song = song_path
-                self.current_song_title = song_title
-                self.playing = True
-                self.paused = False
-                if song_title:
-                    self.history_manager.add_to_history(song_path, song_title)
-                return True
-            except pygame.error:
+            except pygame.error as e:
                 print(f"Error playing {song_path}")
+                self._emit(self.ERROR, song_path, str(e))
                 return False
-        elif self.paused:
-            pygame.mixer.music.unpause()
-            self.paused = False
+            self._clear_end_events()
+            self._current_source = source
+            self.current_song = song_path
+            self.current_song_title = song_title
+            self._song_length = None
             self.playing = True
+            self.paused = False
+            if song_title:
+                self.history_manager.add_to_history(song_path, song_title)
+
+            # load() dropped anything queued; line up the next song again
+            self._queued_song = None
+            self._queued_source = None
+            self._last_pos = 0
+            self.position_tracker.start()
+            self.update_next()
+            self._emit(self.TRACK_CHANGED, song_path, song_title)
+            return True
+        elif self.paused:
+            self.resume()
             return True
         return False
 
+    def update_next(self):
+        """Predict the next song again, e.g. after the playlist changed"""
+        if self.current_song is None or self.next_song_provider is None:
+            return
+        next_song = self.next_song_provider(self.current_song)
+        if next_song is None:
+            self._prefetch = None
+            return
+        if self._prefetch is None or self._prefetch.song['path'] != next_song['path']:
+            self._prefetch = TrackPrefetch(next_song, self.PREFETCH_MAX_BYTES, self.PREFETCH_HEAD_BYTES)
+        if self._queued_song is not None and self._queued_song['path'] != next_song['path']:
+            # queue() replaces the queued song once the new prefetch is ready
+            self._queued_song = None
+
+    def _song_finished(self):
+        """Check whether the current song ended since the last poll"""
+        if self._end_events:
+            return bool(pygame.event.get(self.END_EVENT))
+        # Without end events: get_pos() restarts when a queued song starts,
+        # and the mixer goes idle when nothing follows
+        pos = pygame.mixer.music.get_pos()
+        if self._queued_song is not None and 0 <= pos < self._last_pos:
+            return True
+        self._last_pos = max(pos, 0)
+        return self.playing and not pygame.mixer.music.get_busy()
+
+    def poll(self):
+        """Follow track changes and report them to the subscribed callbacks"""
+        if self.current_song is None or self.paused:
+            return
+
+        if self._song_finished():
+            if self._queued_song is not None and pygame.mixer.music.get_busy():
+                # The mixer started the queued song without a gap
+                song = self._queued_song
+                self._current_source = self._queued_source
+                self._queued_song = None
+                self._queued_source = None
+                self.current_song = song['path']
+                self.current_song_title = song['title']
+                self._apply_track_gain(song['path'])
+                self._song_length = None
+                self._last_pos = 0
+                # get_pos() restarted with the queued song
+                self.position_tracker.start()
+                self.history_manager.add_to_history(song['path'], song['title'])
+                self.gapless_transitions += 1
+                self.update_next()
+                self._emit(self.TRACK_CHANGED, song['path'], song['title'])
+            else:
+                # Ended before the next song could be queued
+                ended_song = self.current_song
+                next_song = self.next_song_provider(ended_song) if self.next_song_provider else None
+                if next_song is not None and self.play(next_song['path'], next_song['title']):
+                    self.cold_transitions += 1
+                else:
+                    self.playing = False
+                    self.position_tracker.reset()
+                    self._emit(self.TRACK_ENDED, ended_song)
+                    return
+
+        # Hand a finished prefetch to the mixer
+        prefetch = self._prefetch
+        if (self.playing and self._queued_song is None and prefetch is not None
+                and prefetch.ready.is_set()):
+            try:
+                source = prefetch.source()
+                pygame.mixer.music.queue(source, self._namehint(prefetch.song['path']))
+                self._queued_song = prefetch.song
+                self._queued_source = source
+            except pygame.error as e:
+                print(f"Error queueing {prefetch.song['path']}: {e}")
+                self._prefetch = None
+
+        if self.playing:
+            self._emit(self.POSITION_CHANGED, self.get_current_time(), self.get_song_length())
+
     def pause(self):
         if self.playing and not self.paused:
             pygame.mixer.music.pause()
+            self.position_tracker.freeze()
             self.paused = True
             self.playing = False
 
     def resume(self):
         if self.paused:
             pygame.mixer.music.unpause()
+            self.position_tracker.resume()
             self.paused = False
             self.playing = True
 
     def stop(self):
         pygame.mixer.music.stop()
+        # stop() posts END_EVENT, but nothing ended on its own
+        self._clear_end_events()
+        self.position_tracker.reset()
         self.playing = False
         self.paused = False
         self.current_song = None
         self.current_song_title = None
+        self._queued_song = None
+        self._queued_source = None
+        self._prefetch = None
 
     def set_volume(self, volume):
-        self.volume = float(volume)
-        pygame.mixer.music.set_volume(self.volume)
+        """Set the volume in percent, as shown on the volume slider"""
+        self.volume = float(volume) / 100
+        pygame.mixer.music.set_volume(min(self.volume * self._track_gain, 1.0))
+
+    def _apply_track_gain(self, song_path):
+        # A dict lookup; the gain was measured by the background loudness analysis
+        self._track_gain = self.playlist_manager.get_track_gain(song_path) if self.normalize else 1.0
+        pygame.mixer.music.set_volume(min(self.volume * self._track_gain, 1.0))
+
+    def update_track_gain(self):
+        """Apply a gain that arrived while the current song was playing"""
+        if self.current_song:
+            self._apply_track_gain(self.current_song)
 
     def get_current_time(self):
-        if self.playing:
-            return pygame.mixer.music.get_pos() / 1000
+        if self.current_song:
+            return self.position_tracker.position()
         return 0
 
     def get_song_length(self):
         if self.current_song:
-            audio = MP3(self.current_song)
-            return audio.info.length
+            if self._song_length is None:
+                # Cached by the metadata ingestor; only parsed here if not ingested yet
+                metadata = self.playlist_manager.get_song_metadata(self.current_song)
+                self._song_length = metadata.get('duration') or 0
+            return self._song_length
         return 0
 
     def seek(self, position):
-        if self.current_song:
-            pygame.mixer.music.play(start=position)
-            self.playing = True
-            self.paused = False
+        """Jump to position seconds into the current song"""
+        if not self.current_song:
+            return False
+        length = self.get_song_length()
+        position = max(0.0, position)
+        if length and position >= length:
+            # Past the end: stopping posts END_EVENT and poll() moves on
+            pygame.mixer.music.stop()
+            return True
+
+        song_path = self.current_song
+        try:
+            if length and self._namehint(song_path) in self.BYTE_SEEK_FORMATS:
+                self._seek_bytes(position, length)
+            else:
+                pygame.mixer.music.play(start=position)
+        except (pygame.error, OSError) as e:
+            print(f"Error seeking in {song_path}: {e}")
+            self._emit(self.ERROR, song_path, str(e))
+            return False
+        self._clear_end_events()
+        self.playing = True
+        self.paused = False
+        # get_pos() restarts at 0, which is not a track change
+        self._last_pos = 0
+        self.position_tracker.start(position)
+        self._emit(self.POSITION_CHANGED, position, length)
+        return True
+
+    def _seek_bytes(self, position, length):
+        """Reopen the current song at the byte where position should be.
+
+        MP3 frames resynchronise on their own, so decoding can start at any
+        byte. The offset is interpolated over the audio after the ID3v2 tag,
+        which puts VBR files close to the target too.
+        """
+        song_path = self.current_song
+        if isinstance(self._current_source, io.BytesIO):
+            # Prefetched into memory; the new BytesIO shares the same bytes
+            source = io.BytesIO(self._current_source.getvalue())
+            size = len(source.getbuffer())
+        else:
+            source = open(song_path, 'rb')
+            size = os.fstat(source.fileno()).st_size
+        try:
+            audio_start = _audio_data_offset(source)
+            source.seek(audio_start + int((size - audio_start) * position / length))
+            pygame.mixer.music.load(source, self._namehint(song_path))
+            pygame.mixer.music.play()
+        except (pygame.error, OSError):
+            source.close()
+            raise
+        self._current_source = source
+        # load() dropped the queued song; poll() queues it again
+        self._queued_song = None
+        self._queued_source = None
@@ -1,9 +1,19 @@
 import os
-import json
-import random
-from mutagen import File
+import heapq
+import threading
+import numpy as np
 import customtkinter as ctk
 from tkinter import ttk
+from library_index import LibraryIndex, FolderScan
+from metadata import MetadataIngestor, read_metadata_batch
+from loudness import LoudnessAnalyzer
+from auto_tagger import AutoTagger
+from folder_watcher import FolderWatcher
+from tag_store import get_tag_store
+from play_queue import PlayQueue
+from recommender import Recommender
+from song_vectors import SongVectors
+from song_table import SongTable, emotion_mask
 
 class PlaylistManager:
     # Emotion class numbers
@@ -12,23 +22,7 @@ class PlaylistManager:
     HAPPY = 2
     SAD = 3
 
-    def __init__(self):
-        self.current_folder = None
-        self.playlist = []
-        self.supported_formats = ['.mp3', '.wav', '.ogg']
-        
-        # Get application directory
-        app_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # Define tags file path in Data folder
-        data_dir = os.path.join(app_dir, "Data")
-        self.tags_file = os.path.join(data_dir, "song_tags.json")
-        
-        # Create Data directory if it doesn't exist
-        os.makedirs(data_dir, exist_ok=True)
-        
-        self.song_tags = self.load_song_tags()
-        
+    def __init__(self, history_manager=None):
         # Emotion mapping
         self.emotion_map = {
             'neutral': self.NEUTRAL,
@@ -40,57 +34,59 @@ class PlaylistManager:
             self.HAPPY: 'happy',
             self.SAD: 'sad'
         }
+        
+        self.current_folder = None
+        # One column per field with a row per song; see SongTable
+        self.playlist = SongTable(self.emotion_names)
+        self.supported_formats = ['.mp3', '.wav', '.ogg', '.flac']
+        self.metadata = {}  # Cached tags and stream info by path
+        self.track_gains = {}  # Linear normalization gain by path
+        
+        # Emotion tags live in the shared tag store (Data/tags.db)
+        self.tag_store = get_tag_store()
+        self.tag_store.add_listener(self._on_tags_changed)
+        
+        # Play order over the whole library, independent of the shown filter
+        self.play_queue = PlayQueue()
+        
+        # Scores songs for a detected emotion using tags and play history
+        self.recommender = Recommender(self, history_manager)
+        
+        # Feature vector of every analyzed song (Data/song_vectors.npy)
+        self.song_vectors = SongVectors()
+        self.song_ids = None  # Library index id of each playlist row, built on demand
+        self.vector_build = None
+        
+        # Persistent library index (Data/library.db)
+        self.library_index = LibraryIndex(supported_formats=self.supported_formats)
+        self.folder_scan = None
+        self.folder_watcher = None
+        self.metadata_ingestor = None
+        self.loudness_analyzer = None
+        self.auto_tagger = None
 
-    def load_song_tags(self):
-        """Load saved song tags from file"""
-        if os.path.exists(self.tags_file):
-            try:
-                with open(self.tags_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading song tags: {e}")
-        return {}
-
-    def save_song_tags(self):
-        """Save song tags to file"""
-        try:
-            with open(self.tags_file, 'w') as f:
-                json.dump(self.song_tags, f, indent=4)
-        except Exception as e:
-            print(f"Error saving song tags: {e}")
-
-    def load_folder(self, folder_path):
-        """Load music files from folder"""
+    def load_folder(self, folder_path, rescan=True):
+        """Load music files from folder through the persistent library index"""
         try:
             if not os.path.exists(folder_path):
                 print(f"Folder not found: {folder_path}")
                 return False
                 
-            # Clear existing playlist
-            self.playlist.clear()
-            
-            # Load saved emotion tags
-            saved_tags = self.load_song_tags()
-            
-            # Walk through directory
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(('.mp3', '.wav', '.ogg', '.flac')):
-                        file_path = os.path.join(root, file)
-                        
-                        # Create song entry
-                        song = {
-                            'path': file_path,
-                            'title': os.path.splitext(file)[0],
-                            'emotions': saved_tags.get(file_path, {'emotions': [], 'emotion_numbers': []})['emotions'],
-                            'emotion_numbers': saved_tags.get(file_path, {'emotions': [], 'emotion_numbers': []})['emotion_numbers']
-                        }
-                        
-                        self.playlist.append(song)
-                        
-            # Sort playlist by title
-            self.playlist.sort(key=lambda x: x['title'].lower())
+            self.cancel_folder_scan()
+            self.cancel_folder_watch()
+            self.cancel_metadata_ingest()
+            self.cancel_loudness_analysis()
+            self.cancel_auto_tagging()
             
+            # Bring the index up to date; only changed directories are listed
+            if rescan:
+                self.library_index.refresh(folder_path)
+                
+            # Index rows come back already sorted by title
+            self.replace_songs(self.library_index.get_songs(folder_path))
+            self.metadata = self.library_index.get_metadata(folder_path)
+                
+            self.current_folder = folder_path
             print(f"Loaded {len(self.playlist)} songs from {folder_path}")
             return True
             
@@ -98,98 +94,260 @@ class PlaylistManager:
             print(f"Error loading folder: {e}")
             return False
 
+    def start_folder_scan(self, folder_path):
+        """Scan a folder on a worker thread, cancelling any scan in progress.
+
+        The playlist is cleared immediately; the caller drains the returned
+        scan's queue on the UI thread and feeds it to append_songs/replace_songs.
+        """
+        self.cancel_folder_scan()
+        self.cancel_folder_watch()
+        self.cancel_metadata_ingest()
+        self.cancel_loudness_analysis()
+        self.cancel_auto_tagging()
+        self._clear_songs()
+        self.metadata = {}
+        self.track_gains = {}
+        # A rescan of the same folder keeps the play queue; replace_songs
+        # updates it if the library changed
+        if folder_path != self.current_folder:
+            self.play_queue.set_songs(())
+        self.current_folder = folder_path
+        self.folder_scan = FolderScan(self.library_index, folder_path)
+        self.folder_scan.start()
+        return self.folder_scan
+
+    def cancel_folder_scan(self):
+        """Cancel the background folder scan if one is running"""
+        if self.folder_scan is not None:
+            self.folder_scan.cancel()
+            self.folder_scan = None
+
+    def start_folder_watch(self):
+        """Follow changes to the current folder on a worker thread.
+
+        The caller drains the returned watcher's queue on the UI thread and
+        feeds its changes to apply_library_changes.
+        """
+        self.cancel_folder_watch()
+        if not self.current_folder:
+            return None
+        self.folder_watcher = FolderWatcher(self.library_index, self.current_folder)
+        self.folder_watcher.start()
+        return self.folder_watcher
+
+    def cancel_folder_watch(self):
+        """Stop watching the current folder"""
+        if self.folder_watcher is not None:
+            self.folder_watcher.cancel()
+            self.folder_watcher = None
+
+    def start_metadata_ingest(self):
+        """Extract metadata for the current folder on a process pool"""
+        self.cancel_metadata_ingest()
+        if not self.current_folder:
+            return None
+        self.metadata_ingestor = MetadataIngestor(self.library_index, self.current_folder)
+        self.metadata_ingestor.start()
+        return self.metadata_ingestor
+
+    def cancel_metadata_ingest(self):
+        """Cancel the background metadata extraction if one is running"""
+        if self.metadata_ingestor is not None:
+            self.metadata_ingestor.cancel()
+            self.metadata_ingestor = None
+
+    def start_loudness_analysis(self):
+        """Measure the loudness of the current folder on low priority worker processes"""
+        self.cancel_loudness_analysis()
+        if not self.current_folder:
+            return None
+        self.loudness_analyzer = LoudnessAnalyzer(self.library_index, self.current_folder)
+        self.loudness_analyzer.start()
+        return self.loudness_analyzer
+
+    def cancel_loudness_analysis(self):
+        """Cancel the background loudness analysis if one is running"""
+        if self.loudness_analyzer is not None:
+            self.loudness_analyzer.cancel()
+            self.loudness_analyzer = None
+
+    def start_auto_tagging(self):
+        """Guess emotions for the untagged songs of the current folder in the background"""
+        self.cancel_auto_tagging()
+        if not self.current_folder:
+            return None
+        self.auto_tagger = AutoTagger(self.library_index, self.current_folder, self.tag_store)
+        self.auto_tagger.start()
+        return self.auto_tagger
+
+    def cancel_auto_tagging(self):
+        """Cancel the background auto-tagging if it is running"""
+        if self.auto_tagger is not None:
+            self.auto_tagger.cancel()
+            self.auto_tagger = None
+
+    def start_vector_build(self):
+        """Rebuild the song feature vectors from the library index on a worker thread"""
+        if self.vector_build is not None and self.vector_build.is_alive():
+            return self.vector_build
+
+        def build():
+            try:
+                self.song_vectors.rebuild(self.library_index)
+            except Exception as e:
+                print(f"Error building song vectors: {e}")
+            finally:
+                self.library_index.close()
+
+        self.vector_build = threading.Thread(target=build, daemon=True)
+        self.vector_build.start()
+        return self.vector_build
+
+    def apply_suggestions(self, suggestions):
+        """Store a (path, emotion, confidence) batch from the auto-tagger as suggested tags"""
+        self.tag_store.set_suggestions(suggestions)
+
+    def accept_suggestion(self, song_path):
+        """Make the suggested emotion of a song its tag"""
+        self.tag_store.accept_suggestion(song_path)
+
+    def update_track_gains(self, gains):
+        """Merge a {path: linear gain} batch from the loudness analyzer"""
+        self.track_gains.update(gains)
+
+    def get_track_gain(self, song_path):
+        """Get the linear gain that normalizes a song's loudness, 1.0 if unknown"""
+        gain = self.track_gains.get(song_path)
+        if gain is None:
+            # Not analyzed yet: fall back to the file's own ReplayGain tag
+            tag_gain = self.metadata.get(song_path, {}).get('track_gain')
+            gain = 10 ** (tag_gain / 20) if tag_gain is not None else 1.0
+        return gain
+
+    def update_metadata(self, metadata):
+        """Merge a {path: metadata} batch from the ingestor into the cache"""
+        self.metadata.update(metadata)
+
+    def get_cached_metadata(self, song_path):
+        """Get cached metadata without touching the file"""
+        return self.metadata.get(song_path, {})
+
+    def get_song_metadata(self, song_path):
+        """Get metadata for a song, reading and caching it if not ingested yet"""
+        if song_path in self.metadata:
+            return self.metadata[song_path]
+        results = read_metadata_batch([song_path])
+        if not results:
+            return {}
+        self.library_index.save_metadata(results)
+        self.metadata[song_path] = results[0][3]
+        return self.metadata[song_path]
+
+    def _clear_songs(self):
+        """Start a new, empty song table; views of the old one stay valid"""
+        self.playlist = SongTable(self.emotion_names)
+        self.recommender.reset()
+        self.song_ids = None
+
+    def _on_tags_changed(self, song_path):
+        """Keep the emotion mask column in sync when any manager changes a tag"""
+        row = self.playlist.get_row(song_path)
+        if row is not None:
+            self.playlist.set_mask(row, emotion_mask(self.tag_store.get_tags(song_path)))
+
+    def append_songs(self, rows):
+        """Append (id, path, title) index rows and return the new entries"""
+        table = self.playlist
+        start = len(table)
+        for song_id, song_path, title in rows:
+            table.append(song_id, song_path, title, emotion_mask(self.tag_store.get_tags(song_path)))
+        self.play_queue.append(table.paths[start:])
+        return table[start:]
+
+    def apply_library_changes(self, added, removed):
+        """Apply (id, path, title) rows of new songs and paths of deleted ones.
+
+        Returns the first playlist row that changed, or None if nothing did.
+        """
+        table, first_changed = self.playlist.edited(removed, [
+            (song_id, song_path, title, emotion_mask(self.tag_store.get_tags(song_path)))
+            for song_id, song_path, title in added
+        ])
+        if first_changed >= len(self.playlist) and len(table) == len(self.playlist):
+            return None
+        self.playlist = table
+        self.recommender.reset()
+        self.song_ids = None
+        self.play_queue.remove(removed)
+        self.play_queue.append(song_path for _, song_path, _ in added)
+        for song_path in removed:
+            self.metadata.pop(song_path, None)
+            self.track_gains.pop(song_path, None)
+        return first_changed
+
+    def replace_songs(self, rows):
+        """Replace the playlist with (id, path, title) index rows"""
+        self._clear_songs()
+        self.append_songs(rows)
+        self.play_queue.set_songs(self.playlist.paths)
+
+    def get_song(self, song_path):
+        """Get the playlist entry for a path, or None"""
+        return self.playlist.get(song_path)
+
+    def get_songs_by_paths(self, song_paths, limit=None):
+        """Get the playlist entries for paths, in playlist order.
+
+        Paths outside the current playlist are skipped. Costs time in the
+        number of paths given, not in the size of the playlist.
+        """
+        song_rows = self.playlist.rows
+        rows = [song_rows[path] for path in song_paths if path in song_rows]
+        if limit is not None:
+            rows = heapq.nsmallest(limit, rows)
+        else:
+            rows.sort()
+        return [self.playlist[row] for row in rows]
+
     def add_tag(self, song_path, emotion):
         """Add an emotion tag to a song"""
-        if song_path not in self.song_tags:
-            self.song_tags[song_path] = {'emotions': [], 'emotion_numbers': []}
-            
-        tags = self.song_tags[song_path]
-        
-        # Add emotion name if not present
-        if emotion not in tags['emotions']:
-            tags['emotions'].append(emotion)
-            
-        # Add emotion number if not present
-        emotion_number = self.emotion_map.get(emotion, self.UNTAGGED)
-        if emotion_number not in tags['emotion_numbers']:
-            tags['emotion_numbers'].append(emotion_number)
-            
-        self.save_song_tags()
-            
-        # Update playlist entry
-        for song in self.playlist:
-            if song['path'] == song_path:
-                if emotion not in song['emotions']:
-                    song['emotions'].append(emotion)
-                if emotion_number not in song['emotion_numbers']:
-                    song['emotion_numbers'].append(emotion_number)
-                break
+        self.tag_store.add_tag(song_path, emotion)
 
     def remove_tag(self, song_path, emotion):
         """Remove an emotion tag from a song"""
-        if song_path in self.song_tags:
-            tags = self.song_tags[song_path]
-            emotion_number = self.emotion_map.get(emotion, self.UNTAGGED)
-            
-            if emotion in tags['emotions']:
-                tags['emotions'].remove(emotion)
-            if emotion_number in tags['emotion_numbers']:
-                tags['emotion_numbers'].remove(emotion_number)
-                
-            self.save_song_tags()
-            
-            # Update playlist entry
-            for song in self.playlist:
-                if song['path'] == song_path:
-                    if emotion in song['emotions']:
-                        song['emotions'].remove(emotion)
-                    if emotion_number in song['emotion_numbers']:
-                        song['emotion_numbers'].remove(emotion_number)
-                    break
+        self.tag_store.remove_tag(song_path, emotion)
 
     def get_songs_by_tag(self, emotion):
         """Get all songs with a specific emotion tag"""
         emotion_number = self.emotion_map.get(emotion, self.UNTAGGED)
-        return [song for song in self.playlist if emotion_number in song.get('emotion_numbers', [])]
+        return self.get_songs_by_paths(self.tag_store.get_paths(emotion_number))
 
     def search_songs(self, query):
         """Search songs by title"""
         query = query.lower()
-        return [song for song in self.playlist if query in song['title'].lower()]
+        return [self.playlist[row] for row, title in enumerate(self.playlist.titles) if query in title.lower()]
 
-    def get_recommendations(self, emotion):
-        """Get song recommendations based on emotion"""
+    def get_recommendations(self, emotion, k=10):
+        """Get the k best songs for an emotion name or number, best first"""
         try:
-            print(f"Getting recommendations for emotion: {emotion}")  # Debug
-            
-            # Get songs matching the emotion
-            matching_songs = self.get_songs_by_tag(emotion)
-            print(f"Found {len(matching_songs)} songs with {emotion} tag")  # Debug
-            
-            # If no songs found for the emotion, use happy songs as fallback
-            if not matching_songs and emotion != 'happy':
-                print("No matching songs found, falling back to happy songs")  # Debug
-                matching_songs = self.get_songs_by_tag('happy')
-            
-            # If still no songs, return empty list
-            if not matching_songs:
-                print("No recommendations found")  # Debug
+            return self.recommender.recommend(self.tag_store.emotion_number(emotion), k)
+        except Exception as e:
+            print(f"Error getting recommendations: {str(e)}")
+            return []
+
+    def get_similar_songs(self, song_path, k=10):
+        """Get the k playlist songs that sound most like a song, best first"""
+        try:
+            song = self.get_song(song_path)
+            if song is None:
                 return []
-            
-            # Get the song titles
-            recommendations = [song['title'] for song in matching_songs]
-            
-            # Shuffle the recommendations
-            random.shuffle(recommendations)
-            
-            # Return at most 10 recommendations
-            recommendations = recommendations[:10]
-            print(f"Returning {len(recommendations)} recommendations")  # Debug
-            
-            return recommendations
-            
+            if self.song_ids is None or len(self.song_ids) != len(self.playlist):
+                self.song_ids = np.array(self.playlist.ids, dtype=np.int64)
+            rows = self.song_vectors.similar(song['id'], self.song_ids, k)
+            return [self.playlist[row] for row in rows]
         except Exception as e:
-            print(f"Error getting recommendations: {str(e)}")  # Debug
+            print(f"Error finding similar songs: {str(e)}")
             return []
 
     def get_playlist(self):
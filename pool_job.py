@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+class PoolJob:
+    """Background job that runs a worker function over batches of songs on a process pool.
+
+    A thread takes the pending songs of a library folder from get_pending(),
+    sends them to WORKER in BATCH_SIZE batches with at most `max_pending`
+    batches in flight, so memory stays bounded on large libraries, and hands
+    every finished batch to store(). Workers are spawned, not forked: the
+    player process holds Tk, SDL's audio thread and SQLite connections.
+    Messages for the UI thread go on `queue` as (kind, payload) tuples;
+    ('done', count) follows the last batch and ('error', str) a failure.
+
+    Subclasses set WORKER (staticmethod of a module level function taking a
+    batch), BATCH_SIZE and DESCRIPTION, and implement get_pending() and
+    store(). get_pending() may queue what the index already has first.
+    """
+
+    BATCH_SIZE = 64
+    # staticmethod of the module level function run on every batch
+    WORKER = None
+    # What the job does, for log lines ("extracting metadata")
+    DESCRIPTION = "processing"
+    # Worker process initializer and its arguments
+    INITIALIZER = None
+    INITARGS = ()
+
+    def __init__(self, library_index, folder_path, max_workers=None):
+        self.library_index = library_index
+        self.folder_path = folder_path
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending = self.max_workers * 2
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def get_pending(self):
+        """Get the songs to process, in order; runs on the job thread"""
+        raise NotImplementedError
+
+    def store(self, results):
+        """Persist the results of one batch and queue them for the UI thread"""
+        raise NotImplementedError
+
+    def _run(self):
+        done_count = 0
+        try:
+            pending = self.get_pending()
+            if not pending:
+                self.queue.put(('done', 0))
+                return
+
+            print(f"{self.DESCRIPTION.capitalize()} for {len(pending)} songs")
+            batches = (
+                pending[start:start + self.BATCH_SIZE]
+                for start in range(0, len(pending), self.BATCH_SIZE)
+            )
+
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=self.INITIALIZER,
+                initargs=self.INITARGS
+            ) as pool:
+                in_flight = set()
+                for batch in batches:
+                    if self.cancelled:
+                        break
+                    in_flight.add(pool.submit(self.WORKER, batch))
+                    if len(in_flight) >= self.max_pending:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        done_count += self._store(finished)
+
+                for future in in_flight:
+                    if self.cancelled:
+                        future.cancel()
+                done_count += self._store(f for f in in_flight if not f.cancelled())
+
+            self.queue.put(('done', done_count))
+
+        except Exception as e:
+            print(f"Error {self.DESCRIPTION}: {e}")
+            self.queue.put(('error', str(e)))
+        finally:
+            self.library_index.close()
+
+    def _store(self, futures):
+        """Store finished batches and count their songs"""
+        count = 0
+        for future in futures:
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"Error {self.DESCRIPTION} in a worker: {e}")
+                continue
+            self.store(results)
+            count += len(results)
+        return count
@@ -0,0 +1,169 @@
+import math
+import time
+from datetime import datetime
+import numpy as np
+from tag_store import get_tag_store
+
+class Recommender:
+    """Score every song in the library for a detected emotion and pick the best.
+
+    Per-song state lives in NumPy arrays aligned with the playlist rows: the
+    emotion bit masks of the song table and a static score for play count
+    and novelty, both kept up to date when a tag changes or a song is played. A recommendation
+    adds the emotion match (one table lookup per song), a penalty for the few
+    recently played songs and random exploration, then takes the top k with
+    argpartition, so only k songs are ever sorted.
+    """
+
+    UNTAGGED = 0
+    NEUTRAL = 1
+    HAPPY = 2
+    SAD = 3
+
+    # Tags wanted for each detected emotion and how well they match. Sad
+    # listeners get happy songs to lift the mood; tagged songs with none of
+    # these tags are never recommended
+    PREFERENCES = {
+        UNTAGGED: {NEUTRAL: 1.0, HAPPY: 1.0, SAD: 1.0},
+        NEUTRAL: {NEUTRAL: 1.0, HAPPY: 0.8},
+        HAPPY: {HAPPY: 1.0},
+        SAD: {HAPPY: 1.0}
+    }
+
+    # Untagged songs can be recommended for any emotion, below good matches
+    NOVELTY = 0.3
+    # Up to this much for songs played PLAY_COUNT_SCALE times or more
+    PLAY_COUNT_WEIGHT = 0.2
+    PLAY_COUNT_SCALE = 50
+    # A song played just now loses this much, decaying over RECENCY_SECONDS
+    RECENCY_WEIGHT = 1.0
+    RECENCY_SECONDS = 6 * 60 * 60
+    # Random score added so the same songs do not come up every time
+    EXPLORATION = 0.25
+
+    def __init__(self, playlist_manager, history_manager=None, tag_store=None):
+        self.playlist_manager = playlist_manager
+        self.history_manager = history_manager
+        self.tag_store = tag_store or get_tag_store()
+        self.tag_store.add_listener(self._on_tags_changed)
+        if history_manager is not None:
+            history_manager.add_listener(self._on_play)
+
+        self.rng = np.random.default_rng()
+        self.match_tables = {
+            emotion: self._match_table(preferences)
+            for emotion, preferences in self.PREFERENCES.items()
+        }
+
+        self.reset()
+        self._load_history()
+
+    def _match_table(self, preferences):
+        """Map every tag bit mask to the best match among its tags"""
+        table = np.zeros(1 << 4, dtype=np.float32)
+        for mask in range(1, len(table)):
+            matches = [weight for emotion, weight in preferences.items() if mask & (1 << emotion)]
+            table[mask] = max(matches) if matches else -np.inf
+        return table
+
+    def _load_history(self):
+        """Total play counts and last play times by path from the history"""
+        self.play_counts = {}
+        self.last_played = {}
+        if self.history_manager is None:
+            return
+        self.play_counts = self.history_manager.get_total_counts()
+        for entry in self.history_manager.recent.values():
+            try:
+                played = datetime.strptime(f"{entry['date']} {entry['time']}", '%Y-%m-%d %H:%M:%S').timestamp()
+            except (KeyError, ValueError):
+                continue
+            self.last_played[entry['path']] = max(played, self.last_played.get(entry['path'], 0))
+
+    def _base_score(self, song_path, mask):
+        plays = self.play_counts.get(song_path, 0)
+        score = self.PLAY_COUNT_WEIGHT * min(math.log1p(plays) / math.log1p(self.PLAY_COUNT_SCALE), 1.0)
+        if not mask:
+            score += self.NOVELTY
+        return score
+
+    def reset(self):
+        """Forget the rows; call when the playlist is replaced"""
+        self.size = 0
+        self.tag_bits = np.zeros(0, dtype=np.uint8)
+        self.base_scores = np.zeros(0, dtype=np.float32)
+        self.noise = np.zeros(0, dtype=np.float32)
+
+    def _sync(self):
+        """Add arrays for songs appended to the playlist since the last call"""
+        playlist = self.playlist_manager.playlist
+        if len(playlist) < self.size:
+            self.reset()
+        if len(playlist) == self.size:
+            return
+        masks = np.frombuffer(playlist.emotion_bits[self.size:], dtype=np.uint8)
+        self.tag_bits = np.concatenate((self.tag_bits, masks))
+        self.base_scores = np.concatenate((self.base_scores, np.array(
+            [self._base_score(song_path, mask) for song_path, mask in zip(playlist.paths[self.size:], masks.tolist())],
+            dtype=np.float32
+        )))
+        self.size = len(playlist)
+        # Drawing fresh random numbers for every song costs more than the rest
+        # of a recommendation; each call adds a window at a random offset
+        self.noise = self.rng.random(2 * self.size, dtype=np.float32) * np.float32(self.EXPLORATION)
+
+    def _update_row(self, song_path):
+        playlist = self.playlist_manager.playlist
+        row = playlist.get_row(song_path)
+        if row is not None and row < self.size:
+            # The playlist updates its mask first; it registered its listener first
+            mask = playlist.emotion_bits[row]
+            self.tag_bits[row] = mask
+            self.base_scores[row] = self._base_score(song_path, mask)
+
+    def _on_tags_changed(self, song_path):
+        self._update_row(song_path)
+
+    def _on_play(self, entry):
+        if entry is None:
+            # History cleared
+            self.play_counts = {}
+            self.last_played = {}
+            self.reset()
+            return
+        song_path = entry['path']
+        self.play_counts[song_path] = self.play_counts.get(song_path, 0) + 1
+        self.last_played[song_path] = time.time()
+        self._update_row(song_path)
+
+    def recommend(self, emotion_number, k=10):
+        """Get the k best songs for a detected emotion, best first"""
+        self._sync()
+        if not self.size or k <= 0:
+            return []
+
+        table = self.match_tables.get(emotion_number, self.match_tables[self.UNTAGGED])
+        scores = table.take(self.tag_bits)
+        scores += self.base_scores
+        offset = int(self.rng.integers(0, self.size + 1))
+        scores += self.noise[offset:offset + self.size]
+
+        # Only songs played in the last few hours are penalized; older plays
+        # are dropped so this loop stays short
+        now = time.time()
+        song_rows = self.playlist_manager.playlist.rows
+        for song_path, played in list(self.last_played.items()):
+            age = now - played
+            if age > 4 * self.RECENCY_SECONDS:
+                del self.last_played[song_path]
+                continue
+            row = song_rows.get(song_path)
+            if row is not None and row < self.size:
+                scores[row] -= self.RECENCY_WEIGHT * math.exp(-age / self.RECENCY_SECONDS)
+
+        k = min(k, self.size)
+        top = np.argpartition(scores, self.size - k)[self.size - k:]
+        top = top[np.argsort(-scores[top])]
+        playlist = self.playlist_manager.playlist
+        # Excluded songs score -inf and are dropped, so fewer than k may be returned
+        return [playlist[row] for row in top if scores[row] > -np.inf]
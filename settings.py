@@ -1,13 +1,20 @@
 import json
 import os
 import shutil
+import atexit
+import threading
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
-from camera_manager import CameraManager
 from path_utils import get_data_directory
+from tag_store import get_tag_store
 
 class SettingsManager:
-    def __init__(self):
+    # Seconds to wait after the first change before writing settings.json
+    FLUSH_DELAY = 1.0
+    # Format of settings.json; files without 'settings_version' are version 0
+    SETTINGS_VERSION = 1
+
+    def __init__(self, write_behind=True):
         # Get Data directory using path_utils
         data_dir = get_data_directory()
         
@@ -19,15 +26,29 @@ class SettingsManager:
         
         self.settings = {
             'music_folder': '',
-            'volume': 0.5,
+            'volume': 50,
             'last_played': None,
             'language': 'en_US',
             'theme': 'light',
-            'emotion_tags': {},  # Store emotion tags persistently
             'window_position': None,
-            'last_playlist': None
+            'last_playlist': None,
+            'settings_version': self.SETTINGS_VERSION
         }
+        # Write-behind state: setters mark settings dirty and a timer flushes them
+        self.write_behind = write_behind
+        self._dirty = False
+        self._flush_timer = None
+        self._lock = threading.RLock()
+        self.save_requests = 0
+        self.flush_count = 0
+        atexit.register(self.close)
+        
+        # Emotion tags live in the shared tag store (Data/tags.db); opening it
+        # first imports any emotion_tags still present in settings.json
+        self.tag_store = get_tag_store()
+        
         self.load_settings()
+        self.settings.pop('emotion_tags', None)
         self.apply_settings()
 
     def load_settings(self):
@@ -38,11 +59,12 @@ class SettingsManager:
                     saved_settings = json.load(f)
                     # Update settings while preserving defaults
                     self.settings.update(saved_settings)
+                    self._migrate(saved_settings.get('settings_version', 0))
                     
                 # Verify music folder still exists
                 if self.settings['music_folder'] and not os.path.exists(self.settings['music_folder']):
                     self.settings['music_folder'] = ''
-                    
+
             except Exception as e:
                 print(f"Error loading settings: {e}")
                 # Create backup of corrupted settings
@@ -53,27 +75,87 @@ class SettingsManager:
                     except Exception as be:
                         print(f"Error creating settings backup: {be}")
 
+    def _migrate(self, version):
+        """Bring settings loaded from an older settings.json up to date, once"""
+        if version < 1:
+            # Version 1 stores the volume in percent; older files saved the
+            # default as the fraction 0.5, which would start the player muted
+            volume = self.settings.get('volume')
+            if isinstance(volume, (int, float)) and volume <= 1.0:
+                self.settings['volume'] = volume * 100
+        if version < self.SETTINGS_VERSION:
+            self.settings['settings_version'] = self.SETTINGS_VERSION
+            # Written out so the next start does not migrate again
+            self.save_settings()
+
     def save_settings(self):
-        """Save settings with backup"""
-        try:
-            # Create settings directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
+        """Save settings, or schedule a coalesced flush in write-behind mode"""
+        if not self.write_behind:
+            self.flush(force=True)
+            return
             
-            # Create backup of existing settings
-            if os.path.exists(self.settings_file):
-                backup_file = f"{self.settings_file}.backup"
-                shutil.copy2(self.settings_file, backup_file)
-            
-            # Save new settings
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=4)
+        with self._lock:
+            self.save_requests += 1
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.FLUSH_DELAY, self._flush_from_timer)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._flush_timer = None
+        self.flush()
+
+    def flush(self, force=False):
+        """Write settings atomically (temp file plus rename) with backup"""
+        with self._lock:
+            if not (self._dirty or force):
+                return
+            try:
+                # Create settings directory if it doesn't exist
+                os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
                 
-        except Exception as e:
-            print(f"Error saving settings: {e}")
-            messagebox.showerror(
-                "Error",
-                "Failed to save settings. Please check application permissions."
-            )
+                # Create backup of existing settings
+                if os.path.exists(self.settings_file):
+                    backup_file = f"{self.settings_file}.backup"
+                    shutil.copy2(self.settings_file, backup_file)
+                
+                # Save new settings next to the old file, then swap them
+                temp_file = f"{self.settings_file}.tmp"
+                with open(temp_file, 'w') as f:
+                    json.dump(self.settings, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.settings_file)
+                
+                self._dirty = False
+                self.flush_count += 1
+                
+            except Exception as e:
+                print(f"Error saving settings: {e}")
+                # Only the caller's thread may show a dialog
+                if threading.current_thread() is threading.main_thread():
+                    messagebox.showerror(
+                        "Error",
+                        "Failed to save settings. Please check application permissions."
+                    )
+
+    @property
+    def coalesced_saves(self):
+        """Number of save requests that did not need a file write of their own"""
+        return max(0, self.save_requests - self.flush_count)
+
+    def close(self):
+        """Flush pending changes; call at shutdown"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self.flush()
+        if self.save_requests:
+            print(f"Settings: {self.save_requests} saves written in {self.flush_count} flushes "
+                  f"({self.coalesced_saves} coalesced)")
 
     def apply_settings(self):
         """Apply settings on startup"""
@@ -89,7 +171,7 @@ class SettingsManager:
             self.save_settings()
 
     def get_volume(self):
-        return self.settings.get('volume', 0.5)
+        return self.settings.get('volume', 50)
 
     def set_volume(self, volume):
         self.settings['volume'] = volume
@@ -118,46 +200,38 @@ class SettingsManager:
 
     def get_emotion_tags(self):
         """Get saved emotion tags for songs"""
-        return self.settings.get('emotion_tags', {})
+        return {
+            path: self.tag_store.EMOTION_NAMES[emotion_numbers[0]].capitalize()
+            for path, emotion_numbers in self.tag_store.get_all_tags().items()
+        }
 
     def save_emotion_tag(self, song_path, emotion):
         """Save emotion tag for a song"""
-        if 'emotion_tags' not in self.settings:
-            self.settings['emotion_tags'] = {}
-        self.settings['emotion_tags'][song_path] = emotion
-        self.save_settings()
+        self.tag_store.set_emotion(song_path, emotion)
 
     def load_emotion_tags(self):
         """Load emotion tags and return them"""
-        return self.settings.get('emotion_tags', {})
+        return self.get_emotion_tags()
 
     def clear_invalid_tags(self):
         """Clear tags for songs that no longer exist"""
-        if 'emotion_tags' in self.settings:
-            valid_tags = {
-                path: emotion 
-                for path, emotion in self.settings['emotion_tags'].items() 
-                if os.path.exists(path)
-            }
-            self.settings['emotion_tags'] = valid_tags
-            self.save_settings()
+        invalid = [path for path in self.tag_store.get_all_tags() if not os.path.exists(path)]
+        self.tag_store.remove_paths(invalid)
 
     def set_emotion_tag(self, song_path, emotion):
         """Set and persist emotion tag for a song"""
-        if 'emotion_tags' not in self.settings:
-            self.settings['emotion_tags'] = {}
-        
-        self.settings['emotion_tags'][song_path] = emotion
-        self.save_settings()
+        self.tag_store.set_emotion(song_path, emotion)
 
     def get_emotion_tag(self, song_path):
         """Get emotion tag for a song"""
-        return self.settings.get('emotion_tags', {}).get(song_path, "Untagged")
+        emotion_number = self.tag_store.get_primary(song_path)
+        if emotion_number == self.tag_store.UNTAGGED:
+            return "Untagged"
+        return self.tag_store.EMOTION_NAMES[emotion_number].capitalize()
 
     def get_songs_by_emotion(self, emotion):
         """Get all songs tagged with specific emotion"""
-        tags = self.settings.get('emotion_tags', {})
-        return [song for song, tag in tags.items() if tag == emotion]
+        return list(self.tag_store.get_paths(self.tag_store.emotion_number(emotion)))
 
 class SettingsWindow(ctk.CTkToplevel):
     def __init__(self, parent, settings_manager, language_manager, playlist_manager):
@@ -312,6 +386,8 @@ class SettingsWindow(ctk.CTkToplevel):
         
     def check_camera_permission(self):
         """Check camera permission and show result."""
+        # The camera module pulls in OpenCV; only load it when asked
+        from camera_manager import CameraManager
         if CameraManager.verify_camera_access():
             messagebox.showinfo(
                 self.language_manager.get_text("camera_access"),
@@ -0,0 +1,195 @@
+import string
+import sys
+from array import array
+from collections.abc import Mapping
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class SongView(Mapping):
+    """One row of a SongTable that reads like the song dicts the playlist used to hold.
+
+    Views are created on access and hold nothing but the table and the row;
+    song['path'], song['title'], song.get(...) and the rest work as before.
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, key):
+        return self.table.field(self.row, key)
+
+    def __iter__(self):
+        return iter(SongTable.FIELDS)
+
+    def __len__(self):
+        return len(SongTable.FIELDS)
+
+    def __repr__(self):
+        return f"SongView({dict(self)!r})"
+
+
+class SongTable:
+    """Columnar storage for the songs of the playlist.
+
+    One column per field instead of one dict per song: song ids in an int64
+    array, paths and titles in lists of interned strings, and the emotion
+    tags as a bit mask per song (bit n set for emotion number n) in a byte
+    array, with a dict from path to row. Indexing returns a SongView, so code
+    written for the old list of dicts keeps working. Rows are only ever
+    appended; removing or inserting songs (edited()) and loading a new
+    library make a new table, so views handed out earlier keep pointing at
+    the songs they were made for.
+    """
+
+    FIELDS = ('id', 'path', 'title', 'emotions', 'emotion_numbers')
+
+    def __init__(self, emotion_names):
+        self.emotion_names = emotion_names  # {emotion number: name}
+        self.ids = array('q')
+        self.paths = []
+        self.titles = []
+        self.emotion_bits = bytearray()
+        self.rows = {}  # {path: row}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [SongView(self, row) for row in range(*index.indices(len(self.paths)))]
+        if index < 0:
+            index += len(self.paths)
+        if not 0 <= index < len(self.paths):
+            raise IndexError("song table index out of range")
+        return SongView(self, index)
+
+    def __iter__(self):
+        for row in range(len(self.paths)):
+            yield SongView(self, row)
+
+    def append(self, song_id, song_path, title, mask=0):
+        """Add a song and return its row"""
+        row = len(self.paths)
+        song_path = sys.intern(song_path)
+        self.ids.append(song_id)
+        self.paths.append(song_path)
+        self.titles.append(sys.intern(title))
+        self.emotion_bits.append(mask)
+        self.rows[song_path] = row
+        return row
+
+    def edited(self, removed_paths=(), added=()):
+        """Copy of the table without removed_paths and with added songs in title order.
+
+        added holds (id, path, title, mask) tuples. Unchanged runs of rows are
+        copied as slices, so apart from list copies the cost is in the rows
+        after the first change. Returns the new table and the first row that
+        differs from this one.
+        """
+        removed = {self.rows[song_path] for song_path in removed_paths if song_path in self.rows}
+        added = sorted(
+            (song for song in added if song[1] not in self.rows),
+            key=lambda song: title_key(song[2])
+        )
+        # (row, 0, song) inserts a song before old row `row`, (row, 1, None) drops the row
+        edits = sorted(
+            [(self._title_position(song[2]), 0, song) for song in added] + [(row, 1, None) for row in removed],
+            key=lambda edit: edit[:2]
+        )
+
+        table = SongTable(self.emotion_names)
+        start = 0
+        for row, kind, song in edits:
+            if row > start:
+                table._extend(self, start, row)
+                start = row
+            if kind == 0:
+                song_id, song_path, title, mask = song
+                table.ids.append(song_id)
+                table.paths.append(sys.intern(song_path))
+                table.titles.append(sys.intern(title))
+                table.emotion_bits.append(mask)
+            else:
+                start = row + 1
+        if start < len(self.paths):
+            table._extend(self, start, len(self.paths))
+
+        # Rows before the first edit did not move; a dict copy keeps the
+        # stored hashes, so only the moved paths are looked up again
+        first_changed = edits[0][0] if edits else len(self.paths)
+        table.rows = dict(self.rows)
+        for row in removed:
+            del table.rows[self.paths[row]]
+        for row in range(first_changed, len(table.paths)):
+            table.rows[table.paths[row]] = row
+        return table, first_changed
+
+    def _extend(self, other, start, stop):
+        """Append rows start:stop of another table, without the path index"""
+        self.ids.extend(other.ids[start:stop])
+        self.paths.extend(other.paths[start:stop])
+        self.titles.extend(other.titles[start:stop])
+        self.emotion_bits.extend(other.emotion_bits[start:stop])
+
+    def _title_position(self, title):
+        """Row before which a song with this title belongs, after equal titles.
+
+        Titles are in LibraryIndex.get_songs order, so they are compared like
+        SQLite's NOCASE collation does.
+        """
+        key = title_key(title)
+        low, high = 0, len(self.titles)
+        while low < high:
+            middle = (low + high) // 2
+            if key < title_key(self.titles[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def get_row(self, song_path):
+        """Get the row of a path, or None"""
+        return self.rows.get(song_path)
+
+    def get(self, song_path):
+        """Get the view of a path, or None"""
+        row = self.rows.get(song_path)
+        return SongView(self, row) if row is not None else None
+
+    def set_mask(self, row, mask):
+        self.emotion_bits[row] = mask
+
+    def emotion_numbers(self, row):
+        """Emotion numbers of a row, lowest first"""
+        mask = self.emotion_bits[row]
+        return [number for number in range(1, 8) if mask & (1 << number)]
+
+    def field(self, row, key):
+        if key == 'path':
+            return self.paths[row]
+        if key == 'title':
+            return self.titles[row]
+        if key == 'id':
+            return self.ids[row]
+        if key == 'emotion_numbers':
+            return self.emotion_numbers(row)
+        if key == 'emotions':
+            return [self.emotion_names[number] for number in self.emotion_numbers(row) if number in self.emotion_names]
+        raise KeyError(key)
+
+
+def emotion_mask(emotion_numbers):
+    """Bit mask of emotion numbers, as stored in SongTable.emotion_bits"""
+    mask = 0
+    for number in emotion_numbers:
+        mask |= 1 << number
+    return mask
+
+
+def title_key(title):
+    """Sort key of a title that matches SQLite's COLLATE NOCASE, which only folds ASCII letters"""
+    return title.translate(_ASCII_LOWER)
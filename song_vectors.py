@@ -0,0 +1,147 @@
+import math
+import os
+import threading
+import warnings
+import numpy as np
+from path_utils import get_song_vectors_path
+
+class SongVectors:
+    """Memory-mapped matrix of song feature vectors for "more like this".
+
+    Row i holds the vector of the song with library index id i, so a lookup
+    is a plain row index. Vectors combine the audio features of the
+    auto-tagger with measured loudness and duration; every column is
+    standardized over the library and weighted, and every row scaled to unit
+    length, so the cosine similarity of two songs is the dot product of their
+    rows. Songs without audio features keep an all-zero row and are never
+    returned. The matrix is a float32 .npy file in the Data folder that is
+    mapped, not read, when the player starts.
+    """
+
+    # (column, weight) in vector order; tempo and duration are compared on a
+    # log scale so a 10% difference counts the same everywhere
+    COLUMNS = (
+        ('tempo', 1.0),
+        ('pulse', 0.5),
+        ('centroid', 1.0),
+        ('energy', 0.75),
+        ('mode', 1.0),
+        ('loudness', 0.5),
+        ('duration', 0.25)
+    )
+    LOG_COLUMNS = ('tempo', 'centroid', 'duration')
+
+    def __init__(self, vectors_path=None):
+        self.vectors_path = vectors_path or get_song_vectors_path()
+        self.matrix = None
+        self.valid = None
+        # Held while the matrix is swapped for a rebuilt one
+        self.lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self.matrix = None
+        self.valid = None
+        if not os.path.exists(self.vectors_path):
+            return
+        try:
+            self.matrix = np.load(self.vectors_path, mmap_mode='r')
+            self.valid = np.any(self.matrix != 0, axis=1)
+        except Exception as e:
+            print(f"Error opening song vectors: {e}")
+            self.matrix = None
+            self.valid = None
+
+    def build_matrix(self, rows):
+        """Turn (id, tempo, pulse, centroid, energy, mode, loudness, duration) rows into a matrix"""
+        if not rows:
+            return np.zeros((0, len(self.COLUMNS)), dtype=np.float32)
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        values = np.array(
+            [[math.nan if value is None else value for value in row[1:]] for row in rows],
+            dtype=np.float64
+        )
+        for column, (name, _) in enumerate(self.COLUMNS):
+            if name in self.LOG_COLUMNS:
+                # Zero means "not found" for these (no beat, silence)
+                values[:, column] = np.log(np.where(values[:, column] > 0, values[:, column], math.nan))
+
+        # Standardize; missing values become the mean, i.e. zero. A column
+        # missing everywhere (no metadata yet) warns about an empty mean
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0)
+        mean = np.nan_to_num(mean)
+        std = np.where(np.nan_to_num(std) > 0, std, 1.0)
+        vectors = np.nan_to_num((values - mean) / std)
+        vectors *= np.array([weight for _, weight in self.COLUMNS])
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+        matrix = np.zeros((int(ids.max()) + 1, len(self.COLUMNS)), dtype=np.float32)
+        matrix[ids] = vectors
+        return matrix
+
+    def rebuild(self, library_index):
+        """Recompute every vector from the library index and swap in the new file"""
+        matrix = self.build_matrix(library_index.get_vector_rows())
+        if not len(matrix):
+            with self.lock:
+                self.matrix = None
+                self.valid = None
+                if os.path.exists(self.vectors_path):
+                    os.remove(self.vectors_path)
+            return 0
+
+        temp_path = self.vectors_path + ".tmp"
+        out = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32, shape=matrix.shape)
+        out[:] = matrix
+        out.flush()
+        del out
+
+        with self.lock:
+            # Windows cannot replace a file that is still mapped
+            self.matrix = None
+            self.valid = None
+            try:
+                os.replace(temp_path, self.vectors_path)
+            except OSError as e:
+                print(f"Error saving song vectors: {e}")
+            self._open()
+        print(f"Built feature vectors for {len(matrix)} song ids")
+        return len(matrix)
+
+    def similar(self, song_id, candidate_ids=None, k=10):
+        """Get the k songs most like a song, best first.
+
+        With candidate_ids (an int array) only those songs are compared and
+        positions in candidate_ids are returned; otherwise song ids over the
+        whole library. The song itself and songs without a vector are left out.
+        """
+        with self.lock:
+            matrix = self.matrix
+            valid = self.valid
+        if matrix is None or song_id is None or not 0 <= song_id < len(matrix) or not valid[song_id]:
+            return []
+
+        query = np.asarray(matrix[song_id])
+        if candidate_ids is None:
+            scores = matrix @ query
+            usable = valid.copy()
+            usable[song_id] = False
+        else:
+            candidate_ids = np.asarray(candidate_ids)
+            in_range = candidate_ids < len(matrix)
+            rows = np.where(in_range, candidate_ids, 0)
+            scores = matrix[rows] @ query
+            usable = in_range & valid[rows] & (candidate_ids != song_id)
+
+        scores[~usable] = -np.inf
+        k = min(k, int(usable.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+        return top[np.argsort(-scores[top])].tolist()
@@ -0,0 +1,318 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from path_utils import get_data_directory, get_emotions_file_path, get_tag_store_path
+
+class TagStore:
+    """Single transactional store for song emotion tags.
+
+    Replaces emotions.json (EmotionManager), song_tags.json (PlaylistManager)
+    and the emotion_tags section of settings.json (SettingsManager). Tags live
+    in SQLite with WAL and are mirrored in memory together with an inverted
+    index from emotion number to paths, so reads never touch the database.
+    Writes inside batch() are committed once when the outermost batch exits.
+    """
+
+    # Emotion class numbers
+    UNTAGGED = 0
+    NEUTRAL = 1
+    HAPPY = 2
+    SAD = 3
+
+    EMOTION_NAMES = {
+        UNTAGGED: 'untagged',
+        NEUTRAL: 'neutral',
+        HAPPY: 'happy',
+        SAD: 'sad'
+    }
+    EMOTION_NUMBERS = {name: number for number, name in EMOTION_NAMES.items()}
+
+    # Tag sources: set by the user, or guessed by the audio auto-tagger
+    MANUAL = 'manual'
+    SUGGESTED = 'suggested'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tags (
+            path TEXT NOT NULL,
+            emotion INTEGER NOT NULL,
+            source TEXT NOT NULL DEFAULT 'manual',
+            confidence REAL NOT NULL DEFAULT 1.0,
+            PRIMARY KEY (path, emotion, source)
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, store_path=None):
+        self.store_path = store_path or get_tag_store_path()
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._listeners = []
+        self._library_paths = {}  # Registered library songs, as an ordered set
+
+        self.conn = sqlite3.connect(self.store_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+        self._migrate_json()
+        self._load()
+
+    @classmethod
+    def emotion_number(cls, emotion):
+        """Convert an emotion name in any case to its number"""
+        if isinstance(emotion, int):
+            return emotion
+        return cls.EMOTION_NUMBERS.get(str(emotion).strip().lower(), cls.UNTAGGED)
+
+    def _load(self):
+        """Mirror the manual tags in memory and build the inverted index"""
+        self.tags = {}
+        self.index = {number: {} for number in self.EMOTION_NAMES}
+        self.suggestions = {}  # {path: (emotion number, confidence)}
+
+        # Paths are interned so the playlist's song table shares these strings
+        for song_path, emotion in self.conn.execute(
+            "SELECT path, emotion FROM tags WHERE source = 'manual' ORDER BY rowid"
+        ):
+            song_path = sys.intern(song_path)
+            self.tags.setdefault(song_path, []).append(emotion)
+            self.index.setdefault(emotion, {})[song_path] = None
+        for song_path, emotion, confidence in self.conn.execute(
+            "SELECT path, emotion, confidence FROM tags WHERE source = 'suggested'"
+        ):
+            self.suggestions[sys.intern(song_path)] = (emotion, confidence)
+        self.register_songs(list(self._library_paths))
+
+    def _migrate_json(self):
+        """Import the three legacy JSON tag files once"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+
+        data_dir = get_data_directory()
+        rows = []
+
+        # EmotionManager: {path: {"name": "Happy", "number": 2}}
+        for song_path, data in self._read_json(get_emotions_file_path()).items():
+            if isinstance(data, dict) and data.get('number'):
+                rows.append((song_path, int(data['number'])))
+
+        # PlaylistManager: {path: {"emotions": [...], "emotion_numbers": [...]}}
+        for song_path, data in self._read_json(os.path.join(data_dir, "song_tags.json")).items():
+            if isinstance(data, dict):
+                rows.extend((song_path, int(number)) for number in data.get('emotion_numbers', []) if number)
+
+        # SettingsManager: {"emotion_tags": {path: "Happy"}}
+        settings = self._read_json(os.path.join(data_dir, "settings.json"))
+        for song_path, emotion in (settings.get('emotion_tags') or {}).items():
+            number = self.emotion_number(emotion)
+            if number:
+                rows.append((song_path, number))
+
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO tags (path, emotion) VALUES (?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', '1')")
+        if rows:
+            print(f"Migrated {len(rows)} emotion tags into {self.store_path}")
+
+    @staticmethod
+    def _read_json(file_path):
+        if not os.path.exists(file_path):
+            return {}
+        try:
+            with open(file_path, 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"Error reading {file_path}: {e}")
+            return {}
+
+    @contextmanager
+    def batch(self):
+        """Group writes into a single transaction"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except Exception:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.conn.rollback()
+                    self._load()
+                raise
+            else:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.conn.commit()
+
+    def _commit(self):
+        if self._batch_depth == 0:
+            self.conn.commit()
+
+    def add_listener(self, callback):
+        """Call callback(path) whenever the tags of a song change"""
+        self._listeners.append(callback)
+
+    def _notify(self, song_path):
+        for callback in self._listeners:
+            try:
+                callback(song_path)
+            except Exception as e:
+                print(f"Error in tag listener: {e}")
+
+    def get_tags(self, song_path):
+        """Get the emotion numbers of a song in the order they were added"""
+        return self.tags.get(song_path, [])
+
+    def get_primary(self, song_path):
+        """Get the first emotion number of a song, or UNTAGGED"""
+        tags = self.tags.get(song_path)
+        return tags[0] if tags else self.UNTAGGED
+
+    def get_paths(self, emotion_number):
+        """Get the ordered set of paths tagged with an emotion number.
+
+        UNTAGGED only covers library songs registered with register_songs.
+        """
+        return self.index.get(emotion_number, {})
+
+    def get_all_tags(self):
+        return self.tags
+
+    def register_songs(self, song_paths):
+        """Add library songs so untagged ones show up in the UNTAGGED bucket"""
+        untagged = self.index[self.UNTAGGED]
+        for song_path in song_paths:
+            self._library_paths[song_path] = None
+            if song_path not in self.tags:
+                untagged[song_path] = None
+
+    def unregister_songs(self, song_paths):
+        """Forget library songs that were deleted; their tags are kept"""
+        untagged = self.index[self.UNTAGGED]
+        for song_path in song_paths:
+            self._library_paths.pop(song_path, None)
+            untagged.pop(song_path, None)
+
+    def reset_songs(self, song_paths):
+        """Replace the registered library songs"""
+        self._library_paths = {}
+        self.index[self.UNTAGGED] = {}
+        self.register_songs(song_paths)
+
+    def add_tag(self, song_path, emotion):
+        """Add an emotion to a song, keeping its other emotions"""
+        number = self.emotion_number(emotion)
+        if not number or number in self.get_tags(song_path):
+            return
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO tags (path, emotion) VALUES (?, ?)", (song_path, number))
+            self._commit()
+            self.tags.setdefault(song_path, []).append(number)
+            self.index[self.UNTAGGED].pop(song_path, None)
+            self.index.setdefault(number, {})[song_path] = None
+        self._notify(song_path)
+
+    def remove_tag(self, song_path, emotion):
+        """Remove one emotion from a song"""
+        number = self.emotion_number(emotion)
+        tags = self.tags.get(song_path)
+        if not tags or number not in tags:
+            return
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM tags WHERE path = ? AND emotion = ? AND source = 'manual'", (song_path, number)
+            )
+            self._commit()
+            tags.remove(number)
+            self.index.get(number, {}).pop(song_path, None)
+            if not tags:
+                del self.tags[song_path]
+                if song_path in self._library_paths:
+                    self.index[self.UNTAGGED][song_path] = None
+        self._notify(song_path)
+
+    def set_emotion(self, song_path, emotion):
+        """Replace all emotions of a song with a single one"""
+        number = self.emotion_number(emotion)
+        if self.tags.get(song_path) == [number]:
+            return
+        with self._lock:
+            self.conn.execute("DELETE FROM tags WHERE path = ? AND source = 'manual'", (song_path,))
+            if number:
+                self.conn.execute("INSERT INTO tags (path, emotion) VALUES (?, ?)", (song_path, number))
+            self._commit()
+
+            for old_number in self.tags.pop(song_path, ()):
+                self.index.get(old_number, {}).pop(song_path, None)
+            if number:
+                self.tags[song_path] = [number]
+                self.index[self.UNTAGGED].pop(song_path, None)
+                self.index.setdefault(number, {})[song_path] = None
+            elif song_path in self._library_paths:
+                self.index[self.UNTAGGED][song_path] = None
+        self._notify(song_path)
+
+    def set_emotions(self, song_paths, emotion):
+        """Tag many songs with one emotion in a single commit"""
+        with self.batch():
+            for song_path in song_paths:
+                self.set_emotion(song_path, emotion)
+
+    def remove_paths(self, song_paths):
+        """Drop every tag of the given songs"""
+        with self.batch():
+            for song_path in song_paths:
+                if song_path in self.tags:
+                    self.set_emotion(song_path, self.UNTAGGED)
+
+    def clear(self):
+        """Remove all manual tags"""
+        self.remove_paths(list(self.tags))
+
+    def get_suggestion(self, song_path):
+        """Get the auto-tagger's (emotion number, confidence) for a song, or None"""
+        return self.suggestions.get(song_path)
+
+    def set_suggestions(self, suggestions):
+        """Store (path, emotion number, confidence) guesses of the auto-tagger.
+
+        Suggestions are kept apart from manual tags: they never show up in
+        get_tags() or the inverted index until accept_suggestion() is called.
+        """
+        with self.batch():
+            for song_path, number, confidence in suggestions:
+                self.conn.execute("DELETE FROM tags WHERE path = ? AND source = 'suggested'", (song_path,))
+                if number:
+                    self.conn.execute(
+                        "INSERT INTO tags (path, emotion, source, confidence) VALUES (?, ?, 'suggested', ?)",
+                        (song_path, number, confidence)
+                    )
+                    self.suggestions[song_path] = (number, confidence)
+                else:
+                    self.suggestions.pop(song_path, None)
+
+    def accept_suggestion(self, song_path):
+        """Turn a song's suggestion into its manual tag; manual tags are never replaced"""
+        suggestion = self.suggestions.get(song_path)
+        if suggestion is not None and not self.get_tags(song_path):
+            self.set_emotion(song_path, suggestion[0])
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+def get_tag_store():
+    """Get the tag store shared by all managers in this process"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = TagStore()
+        return _shared_store
@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import HistoryManager
+
+
+def days_ago(days):
+    return (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+class HistoryJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.temp_dir.name, 'Data')
+        self.history = HistoryManager(self.data_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def reopen(self):
+        self.history = HistoryManager(self.data_dir)
+        return self.history
+
+    def write_journal(self, entries, tail=""):
+        with open(self.history.journal_file, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.write(tail)
+
+    def test_plays_are_replayed_from_the_journal(self):
+        self.history.add_to_history('a', 'A')
+        self.history.add_to_history('a', 'A')
+        self.history.add_to_history('b', 'B')
+        history = self.reopen()
+        self.assertEqual(history.get_play_count('a'), 2)
+        self.assertEqual(history.get_total_counts(), {'a': 2, 'b': 1})
+        self.assertEqual([(entry['path'], entry['play_count']) for entry in history.get_history()],
+                         [('a', 2), ('b', 1)])
+
+    def test_compaction_covers_the_journal_up_to_its_offset(self):
+        self.history.add_to_history('a', 'A')
+        self.history.compact()
+        self.assertEqual(self.history.journal_offset, os.path.getsize(self.history.journal_file))
+        self.history.add_to_history('a', 'A')
+
+        history = self.reopen()
+        self.assertEqual(history.get_play_count('a'), 2)
+        self.assertEqual(history.appends_since_compaction, 1)
+
+    def test_compacts_every_few_plays(self):
+        self.history.COMPACT_EVERY = 3
+        for _ in range(4):
+            self.history.add_to_history('a', 'A')
+        self.assertEqual(self.history.appends_since_compaction, 1)
+        with open(self.history.counts_file) as f:
+            self.assertEqual(json.load(f)['daily_counts'][days_ago(0)], {'a': 3})
+
+    def test_truncated_journal_is_replayed_from_the_start(self):
+        self.history.add_to_history('a', 'A')
+        self.history.add_to_history('b', 'B')
+        self.history.compact()
+        self.write_journal([{'path': 'c', 'title': 'C', 'date': days_ago(0), 'time': '10:00:00'}])
+        self.assertEqual(self.reopen().get_total_counts(), {'c': 1})
+
+    def test_torn_line_is_skipped_and_ended(self):
+        entry = {'path': 'a', 'title': 'A', 'date': days_ago(0), 'time': '10:00:00'}
+        self.write_journal([entry], tail='{"path": "b", "ti')
+        history = self.reopen()
+        self.assertEqual(history.get_total_counts(), {'a': 1})
+
+        history.add_to_history('c', 'C')
+        history = self.reopen()
+        self.assertEqual(history.get_total_counts(), {'a': 1, 'c': 1})
+
+    def test_old_days_fold_into_totals(self):
+        self.write_journal([
+            {'path': 'a', 'title': 'A', 'date': days_ago(400), 'time': '10:00:00'},
+            {'path': 'a', 'title': 'A', 'date': days_ago(HistoryManager.ROLLING_DAYS + 1), 'time': '10:00:00'},
+            {'path': 'a', 'title': 'A', 'date': days_ago(1), 'time': '10:00:00'},
+        ])
+        history = self.reopen()
+        self.assertEqual(list(history.daily_counts), [days_ago(1)])
+        self.assertEqual(history.total_counts, {'a': 2})
+        self.assertEqual(history.get_total_counts(), {'a': 3})
+
+        history.compact()
+        history = self.reopen()
+        self.assertEqual(history.get_total_counts(), {'a': 3})
+        self.assertEqual(history.appends_since_compaction, 0)
+
+    def test_legacy_history_is_migrated(self):
+        with open(self.history.legacy_file, 'w') as f:
+            json.dump({'history': [{'path': 'a', 'title': 'A', 'date': days_ago(0), 'play_count': 3}]}, f)
+        self.assertEqual(self.reopen().get_play_count('a'), 3)
+        self.assertEqual(self.reopen().get_play_count('a'), 3)
+
+    def test_clear_history(self):
+        self.history.add_to_history('a', 'A')
+        self.history.clear_history()
+        self.assertEqual(self.history.get_history(), [])
+        self.assertEqual(self.reopen().get_total_counts(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from library_index import FolderScan, LibraryIndex
+
+
+class CancelAfter:
+    """Stand-in for a threading.Event that reports set after n checks"""
+
+    def __init__(self, checks):
+        self.checks = checks
+
+    def is_set(self):
+        self.checks -= 1
+        return self.checks < 0
+
+    def set(self):
+        self.checks = 0
+
+
+class CancelledScanTest(unittest.TestCase):
+    SONGS = ('top.mp3', 'a/x.mp3', 'a/deeper/z.mp3', 'b/y.mp3')
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.temp_dir.name, 'lib')
+        for song in self.SONGS:
+            path = os.path.join(self.root, song)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'wb').close()
+        self.library_index = LibraryIndex(os.path.join(self.temp_dir.name, 'Data', 'library.db'))
+
+    def tearDown(self):
+        self.library_index.close()
+        self.temp_dir.cleanup()
+
+    def indexed_titles(self):
+        return sorted(title for _, _, title in self.library_index.get_songs(self.root))
+
+    def expected_titles(self):
+        return sorted(os.path.splitext(os.path.basename(song))[0] for song in self.SONGS)
+
+    def test_rescan_after_cancel_indexes_every_song(self):
+        # Cancel once the root has been listed and its subdirectories queued
+        stats = self.library_index.refresh(self.root, cancel_event=CancelAfter(1))
+        self.assertTrue(stats['cancelled'])
+        # What was listed is kept, but the root waits for its subtree
+        self.assertEqual(self.indexed_titles(), ['top'])
+        self.assertEqual(self.library_index.get_directories(self.root), [])
+
+        stats = self.library_index.refresh(self.root)
+        self.assertFalse(stats['cancelled'])
+        self.assertEqual(self.indexed_titles(), self.expected_titles())
+
+    def test_cancelled_folder_scan_then_new_scan(self):
+        scan = FolderScan(self.library_index, self.root)
+        scan.cancel_event = CancelAfter(2)
+        scan._run()
+        self.assertTrue(scan.cancelled)
+
+        scan = FolderScan(self.library_index, self.root)
+        scan._run()
+        kind, rows = scan.queue.get_nowait()
+        while kind == 'songs':
+            kind, rows = scan.queue.get_nowait()
+        self.assertEqual(kind, 'done')
+        self.assertEqual(sorted(title for _, _, title in rows), self.expected_titles())
+        self.assertEqual(self.indexed_titles(), self.expected_titles())
+
+    def test_cancelled_scan_keeps_finished_subtrees(self):
+        for checks in range(1, 6):
+            index_path = os.path.join(self.temp_dir.name, 'Data', f'cancel-{checks}.db')
+            library_index = LibraryIndex(index_path)
+            library_index.refresh(self.root, cancel_event=CancelAfter(checks))
+
+            # A directory is only stored once every subdirectory below it is
+            stored = set(library_index.get_directories(self.root))
+            for directory in stored:
+                for entry in os.scandir(directory):
+                    if entry.is_dir():
+                        self.assertIn(entry.path, stored)
+
+            kept = library_index.count_songs(self.root)
+            stats = library_index.refresh(self.root)
+            self.assertEqual(stats['added'], len(self.SONGS) - kept)
+            self.assertEqual(library_index.count_songs(self.root), len(self.SONGS))
+            library_index.close()
+
+    def test_subfolder_indexed_as_own_library(self):
+        subfolder = os.path.join(self.root, 'a')
+        self.library_index.refresh(self.root)
+        self.library_index.refresh(subfolder)
+        self.assertEqual(sorted(title for _, _, title in self.library_index.get_songs(subfolder)), ['x', 'z'])
+
+        self.library_index.refresh(self.root)
+        self.assertEqual(self.indexed_titles(), self.expected_titles())
+        self.assertEqual(self.library_index.count_songs(self.root), len(self.SONGS))
+
+    def test_cancelled_delta_rescan_keeps_parent_changed(self):
+        # The folder watcher rescans only the directories it saw change
+        self.library_index.refresh(self.root)
+        new_song = os.path.join(self.root, 'c', 'w.mp3')
+        os.makedirs(os.path.dirname(new_song))
+        open(new_song, 'wb').close()
+
+        stats = self.library_index.refresh(self.root, cancel_event=CancelAfter(1), directories=[self.root])
+        self.assertTrue(stats['cancelled'])
+
+        # A mtime poll must still see the root as changed
+        self.library_index.refresh(self.root)
+        self.assertEqual(self.indexed_titles(), sorted(self.expected_titles() + ['w']))
+
+
+if __name__ == '__main__':
+    unittest.main()
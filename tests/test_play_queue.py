@@ -0,0 +1,95 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from play_queue import PlayQueue
+
+
+class PlayQueueTest(unittest.TestCase):
+    SONGS = ['a', 'b', 'c', 'd', 'e']
+
+    def setUp(self):
+        random.seed(7)
+        self.play_queue = PlayQueue()
+        self.play_queue.set_songs(self.SONGS)
+
+    def play_all(self):
+        played = []
+        song_path = self.play_queue.next()
+        while song_path is not None and len(played) <= 2 * len(self.SONGS):
+            played.append(song_path)
+            song_path = self.play_queue.next()
+        return played
+
+    def test_plays_in_library_order_and_stops(self):
+        self.assertEqual(self.play_all(), self.SONGS)
+        self.assertIsNone(self.play_queue.peek_next())
+
+    def test_repeat_all_wraps_around(self):
+        self.play_queue.set_repeat(PlayQueue.REPEAT_ALL)
+        played = [self.play_queue.next() for _ in range(7)]
+        self.assertEqual(played, self.SONGS + ['a', 'b'])
+
+    def test_repeat_one_repeats_on_track_end_but_next_skips(self):
+        self.play_queue.set_repeat(PlayQueue.REPEAT_ONE)
+        self.assertEqual(self.play_queue.next(), 'a')
+        self.assertEqual(self.play_queue.peek_next(), 'a')
+        self.assertEqual(self.play_queue.next(), 'b')
+        self.assertEqual(self.play_queue.peek_next(), 'b')
+
+    def test_cycle_repeat(self):
+        modes = [self.play_queue.cycle_repeat() for _ in range(3)]
+        self.assertEqual(modes, [PlayQueue.REPEAT_ALL, PlayQueue.REPEAT_ONE, PlayQueue.REPEAT_OFF])
+
+    def test_shuffle_plays_every_song_once_from_the_current_one(self):
+        self.play_queue.set_current('c')
+        self.play_queue.set_shuffle(True)
+        played = ['c'] + self.play_all()
+        self.assertEqual(sorted(played), self.SONGS)
+
+    def test_shuffle_keeps_songs_appended_while_scanning(self):
+        self.play_queue.set_shuffle(True)
+        self.play_queue.append(['f', 'g', 'a'])
+        self.assertEqual(sorted(self.play_all()), self.SONGS + ['f', 'g'])
+
+    def test_play_next_comes_before_the_order(self):
+        self.play_queue.next()
+        self.play_queue.play_next('e')
+        self.assertEqual(self.play_queue.peek_next(), 'e')
+        self.assertEqual(self.play_all(), ['e', 'b', 'c', 'd', 'e'])
+
+    def test_previous_walks_back_through_played_songs(self):
+        self.play_queue.next()
+        self.play_queue.next()
+        self.play_queue.set_current('e')
+        self.assertEqual(self.play_queue.previous(), 'b')
+        self.assertEqual(self.play_queue.previous(), 'a')
+        self.assertEqual(self.play_queue.current(), 'a')
+
+    def test_previous_steps_back_in_the_order_without_history(self):
+        self.play_queue.set_songs(self.SONGS)
+        self.play_queue.cursor = 2
+        self.assertEqual(self.play_queue.previous(), 'b')
+
+    def test_remove_keeps_order_and_position(self):
+        self.play_queue.next()
+        self.play_queue.next()
+        self.play_queue.play_next('d')
+        self.play_queue.remove(['a', 'd', 'x'])
+        self.assertEqual(self.play_queue.paths, ['b', 'c', 'e'])
+        self.assertEqual(self.play_queue.positions, {'b': 0, 'c': 1, 'e': 2})
+        self.assertEqual(self.play_all(), ['c', 'e'])
+
+    def test_remove_while_shuffled(self):
+        self.play_queue.set_shuffle(True)
+        first = self.play_queue.next()
+        self.play_queue.remove([song for song in self.SONGS if song not in (first, 'a', 'e')])
+        rest = self.play_all()
+        self.assertEqual(sorted([first] + rest), sorted({first, 'a', 'e'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings
+from settings import SettingsManager
+
+
+class SettingsMigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.temp_dir.name, 'Data')
+        self.settings_file = os.path.join(self.data_dir, 'settings.json')
+        os.makedirs(self.data_dir)
+        patches = (
+            mock.patch.object(settings, 'get_data_directory', return_value=self.data_dir),
+            mock.patch.object(settings, 'get_tag_store', return_value=None)
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_settings(self, saved):
+        with open(self.settings_file, 'w') as f:
+            json.dump(saved, f)
+
+    def read_settings(self):
+        with open(self.settings_file) as f:
+            return json.load(f)
+
+    def test_fractional_volume_is_migrated_and_saved(self):
+        self.write_settings({'volume': 0.5, 'theme': 'dark'})
+        manager = SettingsManager(write_behind=False)
+        self.assertEqual(manager.get_volume(), 50)
+        saved = self.read_settings()
+        self.assertEqual(saved['volume'], 50)
+        self.assertEqual(saved['settings_version'], SettingsManager.SETTINGS_VERSION)
+        self.assertEqual(saved['theme'], 'dark')
+
+    def test_migration_runs_once(self):
+        self.write_settings({'volume': 0.5})
+        SettingsManager(write_behind=False).set_volume(1)
+        manager = SettingsManager(write_behind=False)
+        self.assertEqual(manager.get_volume(), 1)
+        self.assertEqual(self.read_settings()['volume'], 1)
+
+    def test_current_file_is_not_rewritten(self):
+        self.write_settings({'volume': 0.8, 'settings_version': SettingsManager.SETTINGS_VERSION})
+        manager = SettingsManager(write_behind=False)
+        self.assertEqual(manager.get_volume(), 0.8)
+        self.assertEqual(manager.flush_count, 0)
+
+    def test_new_install_starts_at_the_current_version(self):
+        manager = SettingsManager(write_behind=False)
+        self.assertEqual(manager.get_volume(), 50)
+        self.assertEqual(manager.settings['settings_version'], SettingsManager.SETTINGS_VERSION)
+        self.assertFalse(os.path.exists(self.settings_file))
+
+    def test_write_behind_coalesces_until_close(self):
+        manager = SettingsManager()
+        manager.set_volume(30)
+        manager.set_language('fr_FR')
+        self.assertFalse(os.path.exists(self.settings_file))
+        manager.close()
+        self.assertEqual(self.read_settings()['language'], 'fr_FR')
+        self.assertEqual((manager.flush_count, manager.coalesced_saves), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from song_table import SongTable, emotion_mask, title_key
+
+EMOTION_NAMES = {1: 'Neutral', 2: 'Happy', 3: 'Sad'}
+
+
+def make_table(titles):
+    table = SongTable(EMOTION_NAMES)
+    for song_id, title in enumerate(sorted(titles, key=title_key)):
+        table.append(song_id, f"/music/{title}.mp3", title)
+    return table
+
+
+class SongTableTest(unittest.TestCase):
+    def test_views_read_like_song_dicts(self):
+        table = SongTable(EMOTION_NAMES)
+        table.append(7, '/music/a.mp3', 'A', emotion_mask([3, 1]))
+        song = table[0]
+        self.assertEqual(song['path'], '/music/a.mp3')
+        self.assertEqual(song['id'], 7)
+        self.assertEqual(song['emotion_numbers'], [1, 3])
+        self.assertEqual(song['emotions'], ['Neutral', 'Sad'])
+        self.assertIsNone(song.get('artist'))
+        self.assertEqual(table[-1]['title'], 'A')
+        with self.assertRaises(IndexError):
+            table[1]
+
+    def test_set_mask(self):
+        table = make_table(['a'])
+        table.set_mask(0, emotion_mask([2]))
+        self.assertEqual(table[0]['emotions'], ['Happy'])
+
+    def test_edited_removes_and_inserts_in_title_order(self):
+        table = make_table(['apple', 'cherry', 'melon', 'plum'])
+        new_table, first_changed = table.edited(
+            ['/music/melon.mp3', '/music/missing.mp3'],
+            [(10, '/music/Banana.mp3', 'Banana', 0), (11, '/music/zucchini.mp3', 'zucchini', 0),
+             (12, '/music/plum.mp3', 'plum', 0)]
+        )
+        self.assertEqual(new_table.titles, ['apple', 'Banana', 'cherry', 'plum', 'zucchini'])
+        self.assertEqual(first_changed, 1)
+        self.assertEqual(
+            new_table.rows,
+            {path: row for row, path in enumerate(new_table.paths)}
+        )
+        self.assertEqual(new_table.get('/music/zucchini.mp3')['id'], 11)
+
+    def test_edited_keeps_earlier_views(self):
+        table = make_table(['a', 'b', 'c'])
+        song = table[2]
+        new_table, _ = table.edited(['/music/a.mp3'])
+        self.assertEqual(song['title'], 'c')
+        self.assertEqual(new_table[1]['title'], 'c')
+        self.assertEqual(table.get_row('/music/a.mp3'), 0)
+        self.assertIsNone(new_table.get_row('/music/a.mp3'))
+
+    def test_edited_without_changes(self):
+        table = make_table(['a', 'b'])
+        new_table, first_changed = table.edited()
+        self.assertEqual(first_changed, 2)
+        self.assertEqual(new_table.paths, table.paths)
+
+    def test_insertion_after_equal_titles(self):
+        table = SongTable(EMOTION_NAMES)
+        table.append(0, '/music/b1.mp3', 'b')
+        table.append(1, '/music/b2.mp3', 'b')
+        new_table, first_changed = table.edited(added=[(5, '/music/other-b.mp3', 'B', 0)])
+        self.assertEqual(first_changed, 2)
+        self.assertEqual(new_table[2]['id'], 5)
+
+    def test_title_order_matches_sqlite_nocase(self):
+        titles = ['Éclair', 'eclair', 'Zebra', 'apple', 'Ápple', 'ß', 'straße', 'Ω', 'ω', '_x', '10', '9']
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE songs (title TEXT COLLATE NOCASE)")
+        conn.executemany("INSERT INTO songs VALUES (?)", [(title,) for title in titles])
+        expected = [title for title, in conn.execute("SELECT title FROM songs ORDER BY title, rowid")]
+        conn.close()
+        self.assertEqual(sorted(titles, key=title_key), expected)
+
+        table = make_table([])
+        new_table, _ = table.edited(added=[(i, f"/music/{i}.mp3", title, 0) for i, title in enumerate(titles)])
+        self.assertEqual(new_table.titles, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
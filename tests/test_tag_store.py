@@ -0,0 +1,135 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tag_store
+from tag_store import TagStore
+
+
+class TagStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.temp_dir.name, 'Data')
+        os.makedirs(self.data_dir)
+        patches = (
+            mock.patch.object(tag_store, 'get_data_directory', return_value=self.data_dir),
+            mock.patch.object(tag_store, 'get_emotions_file_path',
+                              return_value=os.path.join(self.data_dir, 'emotions.json'))
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.store = self.open_store()
+
+    def tearDown(self):
+        self.store.conn.close()
+        self.temp_dir.cleanup()
+
+    def open_store(self):
+        return TagStore(os.path.join(self.data_dir, 'tags.db'))
+
+    def reopen_store(self):
+        self.store.conn.close()
+        self.store = self.open_store()
+
+    def test_tags_survive_a_reopen(self):
+        self.store.add_tag('a', 'Happy')
+        self.store.add_tag('a', TagStore.SAD)
+        self.store.add_tag('a', 'happy')
+        self.store.set_emotion('b', 'neutral')
+        self.reopen_store()
+        self.assertEqual(self.store.get_tags('a'), [TagStore.HAPPY, TagStore.SAD])
+        self.assertEqual(self.store.get_primary('b'), TagStore.NEUTRAL)
+        self.assertEqual(list(self.store.get_paths(TagStore.HAPPY)), ['a'])
+
+    def test_untagged_covers_registered_songs_only(self):
+        self.store.register_songs(['a', 'b', 'c'])
+        self.store.add_tag('b', 'sad')
+        self.store.add_tag('z', 'sad')
+        self.assertEqual(list(self.store.get_paths(TagStore.UNTAGGED)), ['a', 'c'])
+
+        self.store.remove_tag('b', 'sad')
+        self.store.remove_tag('z', 'sad')
+        self.assertEqual(set(self.store.get_paths(TagStore.UNTAGGED)), {'a', 'b', 'c'})
+        self.assertEqual(list(self.store.get_paths(TagStore.SAD)), [])
+
+        self.store.unregister_songs(['a'])
+        self.store.reset_songs(['c', 'd'])
+        self.assertEqual(list(self.store.get_paths(TagStore.UNTAGGED)), ['c', 'd'])
+
+    def test_set_emotion_replaces_tags(self):
+        self.store.register_songs(['a'])
+        self.store.add_tag('a', 'happy')
+        self.store.add_tag('a', 'sad')
+        self.store.set_emotion('a', 'neutral')
+        self.assertEqual(self.store.get_tags('a'), [TagStore.NEUTRAL])
+        self.assertNotIn('a', self.store.get_paths(TagStore.HAPPY))
+        self.store.set_emotion('a', TagStore.UNTAGGED)
+        self.assertEqual(self.store.get_tags('a'), [])
+        self.assertIn('a', self.store.get_paths(TagStore.UNTAGGED))
+
+    def test_listeners_hear_changes(self):
+        changed = []
+        self.store.add_listener(changed.append)
+        self.store.set_emotions(['a', 'b'], 'happy')
+        self.store.clear()
+        self.assertEqual(changed, ['a', 'b', 'a', 'b'])
+        self.assertEqual(self.store.get_all_tags(), {})
+
+    def test_failed_batch_rolls_back(self):
+        self.store.add_tag('a', 'happy')
+        with self.assertRaises(RuntimeError):
+            with self.store.batch():
+                self.store.set_emotion('a', 'sad')
+                self.store.add_tag('b', 'sad')
+                raise RuntimeError("interrupted")
+        self.assertEqual(self.store.get_tags('a'), [TagStore.HAPPY])
+        self.assertEqual(self.store.get_tags('b'), [])
+        self.reopen_store()
+        self.assertEqual(self.store.get_tags('a'), [TagStore.HAPPY])
+        self.assertEqual(self.store.get_tags('b'), [])
+
+    def test_suggestions_stay_apart_from_manual_tags(self):
+        self.store.set_suggestions([('a', TagStore.SAD, 0.9), ('b', TagStore.HAPPY, 0.7)])
+        self.assertEqual(self.store.get_tags('a'), [])
+        self.assertEqual(self.store.get_suggestion('a'), (TagStore.SAD, 0.9))
+
+        self.store.add_tag('b', 'neutral')
+        self.store.accept_suggestion('a')
+        self.store.accept_suggestion('b')
+        self.assertEqual(self.store.get_tags('a'), [TagStore.SAD])
+        self.assertEqual(self.store.get_tags('b'), [TagStore.NEUTRAL])
+
+        self.store.set_suggestions([('a', TagStore.UNTAGGED, 0.0)])
+        self.reopen_store()
+        self.assertIsNone(self.store.get_suggestion('a'))
+        self.assertEqual(self.store.get_suggestion('b'), (TagStore.HAPPY, 0.7))
+
+    def test_legacy_json_files_are_migrated_once(self):
+        self.store.conn.close()
+        os.remove(os.path.join(self.data_dir, 'tags.db'))
+        with open(os.path.join(self.data_dir, 'emotions.json'), 'w') as f:
+            json.dump({'a': {'name': 'Happy', 'number': 2}}, f)
+        with open(os.path.join(self.data_dir, 'song_tags.json'), 'w') as f:
+            json.dump({'a': {'emotion_numbers': [3]}, 'b': {'emotion_numbers': [1]}}, f)
+        with open(os.path.join(self.data_dir, 'settings.json'), 'w') as f:
+            json.dump({'emotion_tags': {'c': 'Sad', 'd': 'unknown'}}, f)
+
+        self.store = self.open_store()
+        self.assertEqual(self.store.get_tags('a'), [TagStore.HAPPY, TagStore.SAD])
+        self.assertEqual(self.store.get_tags('b'), [TagStore.NEUTRAL])
+        self.assertEqual(self.store.get_tags('c'), [TagStore.SAD])
+        self.assertEqual(self.store.get_tags('d'), [])
+
+        self.store.remove_tag('a', 'happy')
+        self.reopen_store()
+        self.assertEqual(self.store.get_tags('a'), [TagStore.SAD])
+
+
+if __name__ == '__main__':
+    unittest.main()
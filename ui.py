@@ -1,13 +1,18 @@
 import customtkinter as ctk
+import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
-from PIL import Image
+import queue
 import time
 import threading
-from emotion_manager import EmotionManager
-from camera_manager import CameraManager
+from virtual_list import VirtualList
 
 class PlayerUI:
+    # Folder scan polling interval and messages handled per tick
+    SCAN_POLL_MS = 50
+    SCAN_MESSAGES_PER_POLL = 20
+    WATCH_POLL_MS = 250
+
     def __init__(self, root, player, playlist_manager, history_manager, settings_manager, emotion_manager, language_manager):
         self.root = root
         self.player = player
@@ -30,6 +35,14 @@ class PlayerUI:
         self._setup_ui()
         self._load_saved_settings()
         
+        # The player prefetches and queues the next song for gapless playback
+        self.player.next_song_provider = self._get_next_song
+        self.player.subscribe(self.player.TRACK_CHANGED, self._on_track_changed)
+        self.player.subscribe(self.player.TRACK_ENDED, self._on_track_ended)
+        self.player.subscribe(self.player.POSITION_CHANGED, self._on_position_changed)
+        self.player.subscribe(self.player.ERROR, self._on_player_error)
+        self.root.after(self.player.POLL_INTERVAL_MS, self._poll_player)
+        
     def _setup_ui(self):
         # Create main frame
         self.main_frame = ctk.CTkFrame(self.root)
@@ -67,6 +80,16 @@ class PlayerUI:
         )
         self.current_song_label.pack(pady=10)
         
+        # Progress of the current song
+        self.progress_bar = ctk.CTkProgressBar(current_song_frame, width=400)
+        self.progress_bar.pack(pady=(0, 5))
+        self.progress_bar.set(0)
+        # Click to seek
+        self.progress_bar.bind("<Button-1>", self._seek_to_click)
+        
+        self.time_label = ctk.CTkLabel(current_song_frame, text="0:00 / 0:00")
+        self.time_label.pack()
+        
         # Control buttons frame
         self.controls_frame = ctk.CTkFrame(player_frame, fg_color="#2B2B2B")
         self.controls_frame.pack(pady=10)
@@ -104,6 +127,28 @@ class PlayerUI:
         )
         self.next_button.pack(side="left", padx=5)
         
+        # Shuffle and repeat buttons
+        self.shuffle_button = ctk.CTkButton(
+            self.controls_frame,
+            text="🔀",
+            width=40,
+            command=self._toggle_shuffle,
+            fg_color="#404040",
+            hover_color="#505050"
+        )
+        self.shuffle_button.pack(side="left", padx=5)
+        
+        self.repeat_button = ctk.CTkButton(
+            self.controls_frame,
+            text="🔁",
+            width=40,
+            command=self._cycle_repeat,
+            fg_color="#404040",
+            hover_color="#505050"
+        )
+        self.repeat_button.pack(side="left", padx=5)
+        self._update_queue_buttons()
+        
         # Volume slider frame
         volume_frame = ctk.CTkFrame(player_frame, fg_color="#2B2B2B")
         volume_frame.pack(pady=10)
@@ -169,103 +214,306 @@ class PlayerUI:
         )
         self.emotion_filter.pack(side="right", padx=5)
 
-        # Create scrollable frame for playlist
-        self.playlist_scrollable = ctk.CTkScrollableFrame(playlist_frame)
-        self.playlist_scrollable.pack(fill="both", expand=True, padx=5, pady=5)
+        # Folder scan progress
+        self.scan_status_label = ctk.CTkLabel(controls_frame, text="")
+        self.scan_status_label.pack(side="left", padx=5)
 
-        # Initialize empty list to store song buttons
-        self.playlist_buttons = []
+        # Virtualized playlist: only the visible rows have widgets
+        self.current_filter = "All"
+        self.playlist_view = VirtualList(
+            playlist_frame,
+            create_row=self._create_playlist_row,
+            update_row=self._update_playlist_row
+        )
+        self.playlist_view.pack(fill="both", expand=True, padx=5, pady=5)
         
         # Add songs from playlist
         self._refresh_playlist()
 
     def _filter_playlist(self, emotion):
-        # Clear existing buttons
-        for button in self.playlist_buttons:
-            button.destroy()
-        self.playlist_buttons.clear()
+        self.current_filter = emotion
+        self._refresh_playlist()
 
-        # Add new buttons for each song that matches the filter
-        playlist = self.playlist_manager.get_playlist()
-        for song in playlist:
-            song_emotion = self.emotion_manager.get_emotion(song['path'])
-            song_emotion_number = self.emotion_manager.get_emotion_number(song['path'])
-            
-            # Skip if doesn't match filter
-            if emotion != "All":
-                if emotion == "Untagged" and song_emotion_number != 0:
-                    continue
-                elif emotion == "Happy" and song_emotion_number != 2:
-                    continue
-                elif emotion == "Sad" and song_emotion_number != 3:
-                    continue
-                elif emotion == "Neutral" and song_emotion_number != 1:
-                    continue
+    def _get_filtered_playlist(self):
+        if self.current_filter == "All":
+            return self.playlist_manager.get_playlist()
             
-            # Create frame for song row
-            song_frame = ctk.CTkFrame(self.playlist_scrollable)
-            song_frame.pack(fill="x", padx=5, pady=2)
-            
-            # Create button for song
-            btn = ctk.CTkButton(
-                song_frame,
-                text=song['title'],
-                command=lambda s=song: self._play_song(s),
-                anchor="w",
-                height=30
-            )
-            btn.pack(side="left", fill="x", expand=True)
+        # Inverted index lookup: cost follows the result size, not the library size
+        songs = self.emotion_manager.get_songs_by_emotion(self.current_filter)
+        return self.playlist_manager.get_songs_by_paths(songs)
+
+    def _refresh_playlist(self):
+        # Rows are recycled, so this only re-binds the visible ones
+        self.playlist_view.set_items(self._get_filtered_playlist())
+
+    def _create_playlist_row(self, parent, row_height):
+        # Create frame for song row
+        row = ctk.CTkFrame(parent, height=row_height)
+        row.song = None
+        
+        # Create button for song
+        row.button = ctk.CTkButton(
+            row,
+            text="",
+            command=lambda r=row: r.song is not None and self._play_song(r.song),
+            anchor="w",
+            height=row_height - 4
+        )
+        row.button.pack(side="left", fill="x", expand=True, pady=2)
+        
+        # Right click queues the song after the current one
+        row.menu = tk.Menu(row, tearoff=0)
+        row.menu.add_command(
+            label=self.language_manager.get_text("play_next"),
+            command=lambda r=row: r.song is not None and self._queue_play_next(r.song)
+        )
+        row.menu.add_command(
+            label=self.language_manager.get_text("accept_suggestion"),
+            command=lambda r=row: r.song is not None and self._accept_suggestion(r.song)
+        )
+        row.button.bind("<Button-3>", lambda event, r=row: r.menu.tk_popup(event.x_root, event.y_root))
+        
+        # Add emotion label with number
+        row.emotion_label = ctk.CTkLabel(row, text="", width=100)
+        row.emotion_label.pack(side="right", padx=5)
+        row.text_color = row.emotion_label.cget("text_color")
+        return row
+
+    def _update_playlist_row(self, row, song):
+        row.song = song
+        
+        # Format display text
+        emotion, emotion_number = self.emotion_manager.get_emotion_data(song['path'])
+        emotion_display = ""
+        suggested = False
+        if emotion != "Untagged":
+            emotion_display = f"{emotion} ({emotion_number})"
+        else:
+            # Untagged songs show the auto-tagger's guess, if any
+            suggestion = self.playlist_manager.tag_store.get_suggestion(song['path'])
+            if suggestion is not None:
+                suggested_number, confidence = suggestion
+                emotion_display = f"{self.emotion_manager.get_emotion_name(suggested_number).capitalize()}? {confidence:.0%}"
+                suggested = True
             
-            # Create label for emotion
-            emotion_label = ctk.CTkLabel(
-                song_frame,
-                text=song_emotion if song_emotion != "Untagged" else "",
-                width=80
-            )
-            emotion_label.pack(side="right", padx=5)
+        # Artist comes from the metadata cache, never from the file
+        title = song['title']
+        artist = self.playlist_manager.get_cached_metadata(song['path']).get('artist')
+        if artist:
+            title = f"{artist} - {title}"
             
-            self.playlist_buttons.append(song_frame)
+        row.button.configure(text=title)
+        row.emotion_label.configure(text=emotion_display, text_color="gray60" if suggested else row.text_color)
 
-    def _refresh_playlist(self):
-        # Clear existing buttons
-        for button in self.playlist_buttons:
-            button.destroy()
-        self.playlist_buttons.clear()
+    def _start_folder_scan(self, folder):
+        """Scan the music folder in the background and fill the playlist as songs arrive"""
+        scan = self.playlist_manager.start_folder_scan(folder)
+        self.emotion_manager.reset_songs(())
+        self._refresh_playlist()
+        self._update_scan_status(scanning=True)
+        self.root.after(self.SCAN_POLL_MS, self._poll_folder_scan, scan)
 
-        # Add new buttons for each song
-        playlist = self.playlist_manager.get_playlist()
-        for song in playlist:
-            # Create frame for song row
-            song_frame = ctk.CTkFrame(self.playlist_scrollable)
-            song_frame.pack(fill="x", padx=5, pady=2)
+    def _poll_folder_scan(self, scan):
+        # A newer scan replaced this one; drop its results
+        if scan is not self.playlist_manager.folder_scan:
+            return
             
-            # Create button for song
-            btn = ctk.CTkButton(
-                song_frame,
-                text=song['title'],
-                command=lambda s=song: self._play_song(s),
-                anchor="w",
-                height=30
-            )
-            btn.pack(side="left", fill="x", expand=True)
+        changed = False
+        finished = False
+        for _ in range(self.SCAN_MESSAGES_PER_POLL):
+            try:
+                kind, payload = scan.queue.get_nowait()
+            except queue.Empty:
+                break
+                
+            if kind == 'songs':
+                songs = self.playlist_manager.append_songs(payload)
+                self.emotion_manager.register_songs(song['path'] for song in songs)
+                changed = True
+            elif kind == 'done':
+                finished = True
+                # The refresh changed the library; take the final sorted order
+                if payload is not None:
+                    self.playlist_manager.replace_songs(payload)
+                    self.emotion_manager.reset_songs(row[1] for row in payload)
+                    changed = True
+                break
+            elif kind == 'error':
+                finished = True
+                break
+                
+        if changed:
+            self._refresh_playlist()
             
-            # Add emotion label with number
-            emotion = self.emotion_manager.get_emotion(song['path'])
-            emotion_number = self.emotion_manager.get_emotion_number(song['path'])
+        if finished:
+            self.playlist_manager.cancel_folder_scan()
+            self._update_scan_status(scanning=False)
+            self.player.update_next()
+            self._start_metadata_ingest()
+            self._start_folder_watch()
+        else:
+            self._update_scan_status(scanning=True)
+            self.root.after(self.SCAN_POLL_MS, self._poll_folder_scan, scan)
+
+    def _start_folder_watch(self):
+        """Apply files added, deleted or renamed in the music folder as they happen"""
+        watcher = self.playlist_manager.start_folder_watch()
+        if watcher is not None:
+            self.root.after(self.WATCH_POLL_MS, self._poll_folder_watch, watcher)
+
+    def _poll_folder_watch(self, watcher):
+        # A newer folder replaced this one; drop its results
+        if watcher is not self.playlist_manager.folder_watcher:
+            return
+
+        for _ in range(self.SCAN_MESSAGES_PER_POLL):
+            try:
+                kind, payload = watcher.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'changes':
+                self._apply_library_changes(*payload)
+            else:
+                self.playlist_manager.cancel_folder_watch()
+                return
+
+        self.root.after(self.WATCH_POLL_MS, self._poll_folder_watch, watcher)
+
+    def _apply_library_changes(self, added, removed):
+        first_changed = self.playlist_manager.apply_library_changes(added, removed)
+        if first_changed is None:
+            return
+        self.emotion_manager.unregister_songs(removed)
+        self.emotion_manager.register_songs(row[1] for row in added)
+
+        # Only rows from the first change on are re-bound
+        if self.current_filter == "All":
+            self.playlist_view.update_items(self.playlist_manager.get_playlist(), first_changed)
+        else:
+            self._refresh_playlist()
+        self._update_scan_status(scanning=False)
+        self.player.update_next()
+
+        # New songs need metadata, loudness and features; unless that chain is
+        # already running, start it again, it skips songs done before
+        playlist_manager = self.playlist_manager
+        jobs = (playlist_manager.metadata_ingestor, playlist_manager.loudness_analyzer, playlist_manager.auto_tagger)
+        if added and all(job is None for job in jobs):
+            self._start_metadata_ingest()
+
+    def _start_metadata_ingest(self):
+        """Read tags for the library on a process pool and show them as they arrive"""
+        ingestor = self.playlist_manager.start_metadata_ingest()
+        if ingestor is not None:
+            self.root.after(self.SCAN_POLL_MS, self._poll_metadata_ingest, ingestor)
+
+    def _poll_metadata_ingest(self, ingestor):
+        # A newer folder replaced this one; drop its results
+        if ingestor is not self.playlist_manager.metadata_ingestor:
+            return
             
-            # Format display text
-            emotion_display = ""
-            if emotion != "Untagged":
-                emotion_display = f"{emotion} ({emotion_number})"
+        changed = False
+        finished = False
+        for _ in range(self.SCAN_MESSAGES_PER_POLL):
+            try:
+                kind, payload = ingestor.queue.get_nowait()
+            except queue.Empty:
+                break
                 
-            emotion_label = ctk.CTkLabel(
-                song_frame,
-                text=emotion_display,
-                width=100
-            )
-            emotion_label.pack(side="right", padx=5)
+            if kind == 'metadata':
+                self.playlist_manager.update_metadata(payload)
+                changed = True
+            else:
+                finished = True
+                break
+                
+        if changed:
+            self.playlist_view.refresh()
             
-            self.playlist_buttons.append(song_frame)
+        if finished:
+            self.playlist_manager.cancel_metadata_ingest()
+            # Durations are known now, so overly long songs can be skipped
+            self._start_loudness_analysis()
+        else:
+            self.root.after(self.SCAN_POLL_MS, self._poll_metadata_ingest, ingestor)
+
+    def _start_loudness_analysis(self):
+        """Measure song loudness in the background for volume normalization"""
+        analyzer = self.playlist_manager.start_loudness_analysis()
+        if analyzer is not None:
+            self.root.after(self.SCAN_POLL_MS, self._poll_loudness_analysis, analyzer)
+
+    def _poll_loudness_analysis(self, analyzer):
+        # A newer folder replaced this one; drop its results
+        if analyzer is not self.playlist_manager.loudness_analyzer:
+            return
+
+        finished = False
+        for _ in range(self.SCAN_MESSAGES_PER_POLL):
+            try:
+                kind, payload = analyzer.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'gains':
+                self.playlist_manager.update_track_gains(payload)
+                if self.player.current_song in payload:
+                    self.player.update_track_gain()
+            else:
+                finished = True
+                break
+
+        if finished:
+            self.playlist_manager.cancel_loudness_analysis()
+            self._start_auto_tagging()
+        else:
+            self.root.after(self.SCAN_POLL_MS, self._poll_loudness_analysis, analyzer)
+
+    def _start_auto_tagging(self):
+        """Suggest emotions for untagged songs from their audio in the background"""
+        tagger = self.playlist_manager.start_auto_tagging()
+        if tagger is not None:
+            self.root.after(self.SCAN_POLL_MS, self._poll_auto_tagging, tagger)
+
+    def _poll_auto_tagging(self, tagger):
+        # A newer folder replaced this one; drop its results
+        if tagger is not self.playlist_manager.auto_tagger:
+            return
+
+        changed = False
+        finished = False
+        for _ in range(self.SCAN_MESSAGES_PER_POLL):
+            try:
+                kind, payload = tagger.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'suggestions':
+                self.playlist_manager.apply_suggestions(payload)
+                changed = True
+            else:
+                finished = True
+                break
+
+        if changed:
+            self.playlist_view.refresh()
+
+        if finished:
+            self.playlist_manager.cancel_auto_tagging()
+            # Features of the new songs are in the index now
+            self.playlist_manager.start_vector_build()
+        else:
+            self.root.after(self.SCAN_POLL_MS, self._poll_auto_tagging, tagger)
+
+    def _update_scan_status(self, scanning):
+        count = len(self.playlist_manager.get_playlist())
+        key = "scanning_songs" if scanning else "songs_in_library"
+        try:
+            self.scan_status_label.configure(text=self.language_manager.get_text(key).format(count=count))
+        except Exception:
+            # Label destroyed by a UI rebuild
+            pass
 
     def _tag_emotion(self):
         # Create emotion tagging dialog
@@ -324,7 +572,7 @@ class PlayerUI:
         )
         songs_label.pack(pady=5)
         
-        songs_frame = ctk.CTkScrollableFrame(dialog)
+        songs_frame = ctk.CTkFrame(dialog)
         songs_frame.pack(fill="both", expand=True, padx=20, pady=10)
         
         # Add select all checkbox
@@ -337,33 +585,55 @@ class PlayerUI:
         )
         select_all_cb.pack(pady=5, anchor="w")
         
-        # Add checkboxes for each song
-        song_vars = {}
-        song_checkboxes = []
-        for song in self.playlist_manager.get_playlist():
-            var = ctk.BooleanVar()
-            checkbox = ctk.CTkCheckBox(
-                songs_frame,
-                text=song['title'],
-                variable=var,
-                font=("Arial", 11)
+        # Selection is kept by path; checkbox rows are recycled by the virtual list
+        playlist = self.playlist_manager.get_playlist()
+        selected_paths = set()
+        
+        def toggle_song(row):
+            if row.song is None:
+                return
+            if row.checkbox.get():
+                selected_paths.add(row.song['path'])
+            else:
+                selected_paths.discard(row.song['path'])
+                
+        def create_song_row(parent, row_height):
+            row = ctk.CTkFrame(parent, height=row_height, fg_color="transparent")
+            row.song = None
+            row.checkbox = ctk.CTkCheckBox(
+                row,
+                text="",
+                font=("Arial", 11),
+                command=lambda r=row: toggle_song(r)
             )
-            checkbox.pack(pady=2, anchor="w")
-            song_vars[song['path']] = var
-            song_checkboxes.append(checkbox)
+            row.checkbox.pack(pady=2, anchor="w")
+            return row
+            
+        def update_song_row(row, song):
+            row.song = song
+            row.checkbox.configure(text=song['title'])
+            if song['path'] in selected_paths:
+                row.checkbox.select()
+            else:
+                row.checkbox.deselect()
+                
+        songs_list = VirtualList(songs_frame, create_song_row, update_song_row, row_height=28)
+        songs_list.pack(fill="both", expand=True)
+        songs_list.set_items(playlist)
             
         # Select all functionality
         def toggle_select_all():
-            for checkbox in song_checkboxes:
-                checkbox.select() if select_all_var.get() else checkbox.deselect()
+            if select_all_var.get():
+                selected_paths.update(playlist.paths)
+            else:
+                selected_paths.clear()
+            songs_list.refresh()
                 
         select_all_cb.configure(command=toggle_select_all)
             
         def apply_emotions():
-            emotion = emotion_var.get()
-            for song_path, var in song_vars.items():
-                if var.get():
-                    self.emotion_manager.set_emotion(song_path, emotion)
+            # One batched commit for all selected songs
+            self.emotion_manager.set_emotions(list(selected_paths), emotion_var.get())
             dialog.destroy()
             self._refresh_playlist()
             
@@ -378,55 +648,109 @@ class PlayerUI:
         confirm_button.pack(pady=15, padx=20, fill="x")
 
     def _play_song(self, song):
-        success = self.player.play(song['path'], song['title'])
-        if success:
-            # Update UI
-            self.current_song_label.configure(text=song['title'])
+        # The labels and the play queue follow in _on_track_changed
+        return self.player.play(song['path'], song['title'])
+
+    def _on_track_changed(self, song_path, song_title):
+        self._sync_play_queue(song_path)
+        self.current_song_label.configure(text=song_title or os.path.basename(song_path))
+        self.play_button.configure(text="⏸")
+        self._on_position_changed(0, self.player.get_song_length())
+        # The player already recorded the play in the history journal
+        self._refresh_history()
+
+    def _on_track_ended(self, song_path):
+        self.play_button.configure(text="▶")
+        self._on_position_changed(0, 0)
+
+    def _on_position_changed(self, seconds, length):
+        self.progress_bar.set(min(seconds / length, 1) if length else 0)
+        self.time_label.configure(text=f"{self._format_time(seconds)} / {self._format_time(length)}")
+
+    def _seek_to_click(self, event):
+        length = self.player.get_song_length()
+        width = self.progress_bar.winfo_width()
+        if length and width and self.player.seek(length * min(max(event.x / width, 0), 1)):
             self.play_button.configure(text="⏸")
-            # Add to history
-            self.history_manager.add_to_history(song['path'], song['title'])
-            self._refresh_history()
-            return True
-        return False
+
+    def _on_player_error(self, song_path, message):
+        self.current_song_label.configure(text=f"{os.path.basename(song_path)}: {message}")
+
+    @staticmethod
+    def _format_time(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        return f"{minutes}:{seconds:02d}"
+
+    def _sync_play_queue(self, current_song):
+        """Move the play queue to the song the player is on"""
+        play_queue = self.playlist_manager.play_queue
+        if current_song is None or play_queue.current() == current_song:
+            return
+        if play_queue.peek_next() == current_song:
+            # The player advanced to the song the queue predicted
+            play_queue.next()
+        else:
+            play_queue.set_current(current_song)
+
+    def _get_next_song(self, current_song):
+        # The player asks right after a gapless track change, before
+        # _poll_player has seen it
+        self._sync_play_queue(current_song)
+        next_path = self.playlist_manager.play_queue.peek_next()
+        if next_path is None:
+            return None
+        return self.playlist_manager.get_song(next_path)
 
     def _play_next(self):
-        playlist = self.playlist_manager.get_playlist()
-        current_song = self.player.current_song
-        
-        # Find current song index
-        current_index = -1
-        for i, song in enumerate(playlist):
-            if song['path'] == current_song:
-                current_index = i
-                break
-        
-        # Play next song if available
-        if current_index >= 0 and current_index + 1 < len(playlist):
-            next_song = playlist[current_index + 1]
-            self._play_song(next_song)
+        next_path = self.playlist_manager.play_queue.next()
+        if next_path is not None:
+            self._play_song(self.playlist_manager.get_song(next_path))
+
+    def _poll_player(self):
+        """Let the player report track changes and the position"""
+        try:
+            self.player.poll()
+        except Exception as e:
+            print(f"Error polling player: {e}")
+        self.root.after(self.player.POLL_INTERVAL_MS, self._poll_player)
 
     def _play_previous(self):
-        playlist = self.playlist_manager.get_playlist()
-        current_song = self.player.current_song
-        
-        # Find current song index
-        current_index = -1
-        for i, song in enumerate(playlist):
-            if song['path'] == current_song:
-                current_index = i
-                break
-        
-        # Play previous song if available
-        if current_index > 0:
-            prev_song = playlist[current_index - 1]
-            self._play_song(prev_song)
+        prev_path = self.playlist_manager.play_queue.previous()
+        if prev_path is not None:
+            self._play_song(self.playlist_manager.get_song(prev_path))
+
+    def _toggle_shuffle(self):
+        play_queue = self.playlist_manager.play_queue
+        play_queue.set_shuffle(not play_queue.shuffle)
+        self._update_queue_buttons()
+        self.player.update_next()
+
+    def _cycle_repeat(self):
+        self.playlist_manager.play_queue.cycle_repeat()
+        self._update_queue_buttons()
+        self.player.update_next()
+
+    def _update_queue_buttons(self):
+        play_queue = self.playlist_manager.play_queue
+        self.shuffle_button.configure(fg_color="#1F6AA5" if play_queue.shuffle else "#404040")
+        self.repeat_button.configure(
+            text="🔂" if play_queue.repeat == play_queue.REPEAT_ONE else "🔁",
+            fg_color="#404040" if play_queue.repeat == play_queue.REPEAT_OFF else "#1F6AA5"
+        )
+
+    def _accept_suggestion(self, song):
+        # The tag store notifies the playlist; redraw the row
+        self.playlist_manager.accept_suggestion(song['path'])
+        self.playlist_view.refresh()
+
+    def _queue_play_next(self, song):
+        self.playlist_manager.play_queue.play_next(song['path'])
+        self.player.update_next()
 
     def _play_pause(self):
         if self.player.current_song is None:
-            # If no song is playing, play the first song in playlist
-            playlist = self.playlist_manager.get_playlist()
-            if playlist:
-                self._play_song(playlist[0])
+            # If no song is playing, start the play queue
+            self._play_next()
         elif self.player.playing:
             self.player.pause()
             self.play_button.configure(text="▶")
@@ -452,60 +776,57 @@ class PlayerUI:
         )
         clear_button.pack(pady=5)
 
-        # Create scrollable frame for history
-        self.history_scrollable = ctk.CTkScrollableFrame(history_frame)
-        self.history_scrollable.pack(fill="both", expand=True, padx=5, pady=5)
-
-        # Initialize empty list to store history buttons
-        self.history_buttons = []
+        # Virtualized history: the journal can hold years of plays
+        self.history_view = VirtualList(
+            history_frame,
+            create_row=self._create_history_row,
+            update_row=self._update_history_row
+        )
+        self.history_view.pack(fill="both", expand=True, padx=5, pady=5)
         
         # Add history entries
         self._refresh_history()
 
     def _refresh_history(self):
-        # Clear existing entries
-        for widget in self.history_scrollable.winfo_children():
-            widget.destroy()
-        self.history_buttons = []
-            
-        # Add new entries for each history item
+        # Show newest first
         history_entries = self.history_manager.get_history()
-        for entry in reversed(history_entries):  # Show newest first
-            song_name = entry.get('title', os.path.basename(entry['path']))
-            date_str = entry.get('date', '')
-            time_str = entry.get('time', '')
-            play_count = entry.get('play_count', 1)
-            
-            # Create frame for history entry
-            entry_frame = ctk.CTkFrame(self.history_scrollable)
-            entry_frame.pack(fill="x", padx=5, pady=2)
-            
-            # Create play button
-            btn = ctk.CTkButton(
-                entry_frame,
-                text=song_name,
-                command=lambda s=entry: self._play_song({
-                    'path': s['path'],
-                    'title': s.get('title', os.path.basename(s['path']))
-                }),
-                anchor="w",
-                height=30
-            )
-            btn.pack(side="left", fill="x", expand=True)
-            
-            # Create info label
-            info_text = f"{date_str} {time_str}"
-            if play_count > 1:
-                info_text += f" (Played {play_count}x)"
-            
-            info_label = ctk.CTkLabel(
-                entry_frame,
-                text=info_text,
-                width=150
-            )
-            info_label.pack(side="right", padx=5)
+        history_entries.reverse()
+        self.history_view.set_items(history_entries)
+
+    def _create_history_row(self, parent, row_height):
+        # Create frame for history entry
+        row = ctk.CTkFrame(parent, height=row_height)
+        row.entry = None
+        
+        # Create play button
+        row.button = ctk.CTkButton(
+            row,
+            text="",
+            command=lambda r=row: r.entry is not None and self._play_song({
+                'path': r.entry['path'],
+                'title': r.entry.get('title', os.path.basename(r.entry['path']))
+            }),
+            anchor="w",
+            height=row_height - 4
+        )
+        row.button.pack(side="left", fill="x", expand=True, pady=2)
+        
+        # Create info label
+        row.info_label = ctk.CTkLabel(row, text="", width=150)
+        row.info_label.pack(side="right", padx=5)
+        return row
+
+    def _update_history_row(self, row, entry):
+        row.entry = entry
+        song_name = entry.get('title', os.path.basename(entry['path']))
+        play_count = entry.get('play_count', 1)
+        
+        info_text = f"{entry.get('date', '')} {entry.get('time', '')}"
+        if play_count > 1:
+            info_text += f" (Played {play_count}x)"
             
-            self.history_buttons.append(entry_frame)
+        row.button.configure(text=song_name)
+        row.info_label.configure(text=info_text)
 
     def _clear_history(self):
         self.history_manager.clear_history()
@@ -596,15 +917,13 @@ class PlayerUI:
             self.settings_manager.set_music_folder(folder)
             if label_widget:
                 label_widget.configure(text=folder)
-            if self.playlist_manager.load_folder(folder):
-                self._refresh_playlist()
+            self._start_folder_scan(folder)
 
     def _load_saved_settings(self):
         # Load saved music folder
         folder = self.settings_manager.get_music_folder()
         if folder and os.path.exists(folder):
-            self.playlist_manager.load_folder(folder)
-            self._refresh_playlist()
+            self._start_folder_scan(folder)
         
         # Load saved volume
         volume = self.settings_manager.get_volume()
@@ -633,12 +952,29 @@ class PlayerUI:
                 frame,
                 self.root,
                 self.playlist_manager,
-                self.language_manager
+                self.language_manager,
+                self._play_song,
+                self.player.current_song
             )
         except Exception as e:
             print(f"Error processing captured frame: {e}")
             messagebox.showerror("Error", str(e))
 
+    def process_detected_emotion(self, emotion_number):
+        """Show recommendations for the emotion voted on by the camera"""
+        try:
+            self.emotion_manager.process_emotion(
+                emotion_number,
+                self.root,
+                self.playlist_manager,
+                self.language_manager,
+                self._play_song,
+                self.player.current_song
+            )
+        except Exception as e:
+            print(f"Error processing detected emotion: {e}")
+            messagebox.showerror("Error", str(e))
+
     def process_captured_image(self, image_path):
         """Process the captured image from camera"""
         try:
@@ -650,7 +986,9 @@ class PlayerUI:
                 image_path,
                 self.root,
                 self.playlist_manager,
-                self.language_manager
+                self.language_manager,
+                self._play_song,
+                self.player.current_song
             )
         except Exception as e:
             print(f"Error processing captured image: {e}")
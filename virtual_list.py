@@ -0,0 +1,169 @@
+import sys
+import customtkinter as ctk
+
+class VirtualList(ctk.CTkFrame):
+    """Scrollable list that only creates widgets for the visible rows.
+
+    A fixed pool of row widgets (visible rows plus a small overscan) is created
+    once and re-bound to different items while scrolling, so refreshing the
+    list costs the same for ten songs as for a hundred thousand.
+
+    create_row(parent, row_height) must return a widget with the given height,
+    and update_row(row, item) re-binds that widget to an item.
+    """
+
+    def __init__(self, master, create_row, update_row, row_height=34, overscan=2, **kwargs):
+        super().__init__(master, **kwargs)
+
+        self.create_row = create_row
+        self.update_row = update_row
+        self.row_height = row_height
+        self.overscan = overscan
+        self.items = []
+        self.rows = []
+        self.scroll_offset = 0  # in unscaled pixels
+
+        # Scrollbar on the right, viewport on the left
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.viewport.bind("<Configure>", self._on_resize)
+        self._bind_mousewheel(self.viewport)
+
+    def set_items(self, items):
+        """Show a new sequence of items; the sequence is not copied"""
+        self.items = items
+        self.scroll_offset = min(self.scroll_offset, self._max_offset())
+        self.refresh()
+
+    def refresh(self):
+        """Re-bind the visible rows after the items changed in place"""
+        self.scroll_offset = min(self.scroll_offset, self._max_offset())
+        self._layout_rows()
+        self._update_scrollbar()
+
+    def update_items(self, items, first_changed=0):
+        """Show items that only differ from the current ones from index first_changed on.
+
+        Visible rows above first_changed keep their widgets as they are; when
+        the change is below the viewport only the scrollbar moves.
+        """
+        self.items = items
+        offset = min(self.scroll_offset, self._max_offset())
+        if offset != self.scroll_offset:
+            # The list got shorter than the scrolled-to position
+            self.scroll_offset = offset
+            self._layout_rows()
+        else:
+            first = self._first_index()
+            for slot, row in enumerate(self.rows):
+                index = first + slot
+                if index < first_changed:
+                    continue
+                if index < len(self.items):
+                    self.update_row(row, self.items[index])
+                    row.place(x=0, y=slot * self.row_height - (self.scroll_offset - first * self.row_height), relwidth=1.0)
+                else:
+                    row.place_forget()
+        self._update_scrollbar()
+
+    def refresh_item(self, index):
+        """Re-bind a single row if the item at index is currently visible"""
+        first = self._first_index()
+        slot = index - first
+        if 0 <= slot < len(self.rows) and index < len(self.items):
+            self.update_row(self.rows[slot], self.items[index])
+
+    def scroll_to(self, index):
+        """Scroll so that the item at index is visible"""
+        top = index * self.row_height
+        bottom = top + self.row_height
+        height = self._viewport_height()
+        if top < self.scroll_offset:
+            self.scroll_offset = top
+        elif bottom > self.scroll_offset + height:
+            self.scroll_offset = bottom - height
+        self.refresh()
+
+    def _scaling(self):
+        try:
+            return self._get_widget_scaling()
+        except Exception:
+            return 1.0
+
+    def _viewport_height(self):
+        """Viewport height in unscaled pixels"""
+        return max(self.viewport.winfo_height() / self._scaling(), self.row_height)
+
+    def _max_offset(self):
+        return max(0, len(self.items) * self.row_height - self._viewport_height())
+
+    def _first_index(self):
+        return int(self.scroll_offset // self.row_height)
+
+    def _ensure_pool(self):
+        """Grow the row pool to cover the viewport plus overscan"""
+        needed = int(self._viewport_height() // self.row_height) + 1 + self.overscan
+        while len(self.rows) < needed:
+            row = self.create_row(self.viewport, self.row_height)
+            self._bind_mousewheel(row)
+            for child in row.winfo_children():
+                self._bind_mousewheel(child)
+            self.rows.append(row)
+
+    def _layout_rows(self):
+        self._ensure_pool()
+        first = self._first_index()
+        shift = self.scroll_offset - first * self.row_height
+
+        for slot, row in enumerate(self.rows):
+            index = first + slot
+            if index < len(self.items):
+                self.update_row(row, self.items[index])
+                row.place(x=0, y=slot * self.row_height - shift, relwidth=1.0)
+            else:
+                row.place_forget()
+
+    def _update_scrollbar(self):
+        total = len(self.items) * self.row_height
+        if total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        start = self.scroll_offset / total
+        end = (self.scroll_offset + self._viewport_height()) / total
+        self.scrollbar.set(start, min(end, 1.0))
+
+    def _scroll_to_offset(self, offset):
+        offset = max(0, min(offset, self._max_offset()))
+        if offset != self.scroll_offset:
+            self.scroll_offset = offset
+            self._layout_rows()
+        self._update_scrollbar()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self._scroll_to_offset(float(value) * len(self.items) * self.row_height)
+        elif action == 'scroll':
+            step = self._viewport_height() if unit == 'pages' else self.row_height
+            self._scroll_to_offset(self.scroll_offset + int(value) * step)
+
+    def _on_mousewheel(self, event):
+        if sys.platform.startswith("win"):
+            delta = -int(event.delta / 40)
+        elif sys.platform == "darwin":
+            delta = -event.delta
+        else:
+            delta = -1 if event.num == 4 else 1
+        self._on_scrollbar('scroll', delta, 'units')
+
+    def _bind_mousewheel(self, widget):
+        if sys.platform.startswith("linux"):
+            widget.bind("<Button-4>", self._on_mousewheel, add="+")
+            widget.bind("<Button-5>", self._on_mousewheel, add="+")
+        else:
+            widget.bind("<MouseWheel>", self._on_mousewheel, add="+")
+
+    def _on_resize(self, event=None):
+        self.refresh()